@@ -0,0 +1,13 @@
+"""Development server: `python backend` from ai-generation/replicate (or `python .` from here).
+
+Started from this file rather than from app.py because spawned thumbnail
+workers re-run the parent's __main__ script unless it is a package's
+__main__.py; this way they import only thumbnails.py.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from app import app  # noqa: E402
+
+app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
@@ -1,10 +1,29 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, send_file, Response
 from flask_cors import CORS
 import os
 import replicate
+from replicate.exceptions import ReplicateError
 from urllib.parse import urlparse
 import urllib.request
 import requests
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import tempfile
+import hashlib
+from collections import OrderedDict
+import sys
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sequence import FilenameSequence
+from model_registry import load_registry, ValidationError
+from image_store import ImageStore
+from scheduler import Scheduler
+import thumbnails
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import logging
 from flask.logging import default_handler
@@ -18,484 +37,171 @@ CORS(app, resources={r"/api/*": {"origins": ["http://192.168.0.66:3000", "http:/
 # Replicate API token
 os.environ["REPLICATE_API_TOKEN"] = ""
 
-model_params = {
-    "asiryan-juggernaut-xl-v7": {
-        "model_id": "asiryan/juggernaut-xl-v7:6a52feace43ce1f6bbc2cdabfc68423cb2319d7444a1a1dae529c5e88b976382",
-        "input": {
-            "seed": None,
-            "width": None,
-            "height": None,
-            "prompt": None,
-            "strength": None,
-            "scheduler": None,
-            "num_outputs": None,
-            "guidance_scale": None,
-            "negative_prompt": None,
-            "num_inference_steps": None
-        }
-    },
-    "datacte-flux-aesthetic-anime": {
-        "model_id": "datacte/flux-aesthetic-anime:2c3677b83922a0ac99493467805fb0259f55c4f4f7b1988b1dd1d92f083a8304",
-        "input": {
-            "prompt": None,
-            "model": None,
-            "go_fast": None,
-            "lora_scale": None,
-            "megapixels": None,
-            "num_outputs": None,
-            "aspect_ratio": None,
-            "output_format": None,
-            "guidance_scale": None,
-            "output_quality": None,
-            "prompt_strength": None,
-            "extra_lora_scale": None,
-            "num_inference_steps": None,
-            "disable_safety_checker": None
-        }
-    },
-    "datacte-flux-synthetic-anime": {
-        "model_id": "datacte/flux-synthetic-anime:01c7749152b789eef876573153fa36f6013a2d7185ad38588fae19743ebca6e0",
-        "input": {
-            "model": None,
-            "prompt": None,
-            "go_fast": None,
-            "lora_scale": None,
-            "megapixels": None,
-            "num_outputs": None,
-            "aspect_ratio": None,
-            "output_format": None,
-            "guidance_scale": None,
-            "output_quality": None,
-            "prompt_strength": None,
-            "extra_lora_scale": None,
-            "num_inference_steps": None,
-            "disable_safety_checker": None
-        }
-    },
-    "datacte-mobius": {
-        "model_id": "datacte/mobius:197f2145583f80c7c3ec520d2a1080aa7986601e1612e417ccd6e4f50fe0624f",
-        "input": {
-            "seed": None,
-            "width": None,
-            "height": None,
-            "prompt": None,
-            "scheduler": None,
-            "num_outputs": None,
-            "guidance_scale": None,
-            "negative_prompt": None,
-            "num_inference_steps": None,
-            "disable_safety_checker": None
-        }
-    },
-    "datacte-prometheusv1": {
-        "model_id": "datacte/prometheusv1:a40536dd5f61e7c3c43060dff5b9b488a749dec1cb283a904dd82032fc717295",
-        "input": {
-            "seed": None,
-            "image": None,
-            "width": None,
-            "height": None,
-            "prompt": None,
-            "scheduler": None,
-            "num_outputs": None,
-            "guidance_scale": None,
-            "negative_prompt": None,
-            "prompt_strength": None,
-            "num_inference_steps": None,
-            "disable_safety_checker": None
-        }
-    },
-    "datacte-proteus-v0.5": {
-        "model_id": "datacte/proteus-v0.3:b28b79d725c8548b173b6a19ff9bffd16b9b80df5b18b8dc5cb9e1ee471bfa48",
-        "input": {
-            "seed": None,
-            "image": None,
-            "width": None,
-            "height": None,
-            "prompt": None,
-            "scheduler": None,
-            "num_outputs": None,
-            "guidance_scale": None,
-            "negative_prompt": None,
-            "prompt_strength": None,
-            "num_inference_steps": None,
-            "disable_safety_checker": None
-        }
-    },
-    "dreamshaper-xl-turbo": {
-        "model_id": "lucataco/dreamshaper-xl-turbo:0a1710e0187b01a255302738ca0158ff02a22f4638679533e111082f9dd1b615",
-        "input": {
-            "width": None,
-            "height": None,
-            "prompt": None,
-            "scheduler": None,
-            "num_outputs": None,
-            "guidance_scale": None,
-            "apply_watermark": None,
-            "negative_prompt": None,
-            "num_inference_steps": None,
-            "disable_safety_checker": None
-        }
-    },
-    "flux-schnell": {
-        "model_id": "black-forest-labs/flux-schnell",
-        "input": {
-            "seed": None,
-            "prompt": None,
-            "num_inference_steps": None,
-            "megapixels": None,
-            "output_quality": None,
-            "num_outputs": None,
-            "output_format": None,
-            "aspect_ratio": None,
-            "go_fast": None,
-            "disable_safety_checker": None
-        }
-    },
-    "flux-dev": {
-        "model_id": "black-forest-labs/flux-dev",
-        "input": {
-            "seed": None,
-            "prompt": None,
-            "prompt_strength": None,
-            "num_inference_steps": None,
-            "guidance": None,
-            "megapixels": None,
-            "output_quality": None,
-            "num_outputs": None,
-            "output_format": None,
-            "aspect_ratio": None,
-            "go_fast": None,
-            "disable_safety_checker": None
-        }
-    },
-    "flux-1.1-pro": {
-        "model_id": "black-forest-labs/flux-1.1-pro",
-        "input": {
-            "seed": None,
-            "prompt": None,
-            "aspect_ratio": None,
-            "height": None,
-            "width": None,
-            "image_prompt": None,
-            "output_format": None,
-            "output_quality": None,
-            "safety_tolerance": None,
-            "prompt_upsampling": None
-        }
-    },
-    "flux-1.1-pro-ultra": {
-        "model_id": "black-forest-labs/flux-1.1-pro-ultra",
-        "input": {
-            "seed": None,
-            "raw": None,
-            "prompt": None,
-            "aspect_ratio": None,
-            "output_format": None,
-            "safety_tolerance": None,
-            "image_prompt": None,
-            "image_prompt_strength": None
-        }
-    },
-    "kandinsky-2.2": {
-        "model_id": "ai-forever/kandinsky-2.2:ad9d7879fbffa2874e1d909d1d37d9bc682889cc65b31f7bb00d2362619f194a",
-        "input": {
-            "seed": None,
-            "prompt": None,
-            "num_inference_steps": None,
-            "num_inference_steps_prior": None,
-            "output_format": None,
-            "width": None,
-            "height": None
-        }
-    },
-    "latent-consistency-model": {
-        "model_id": "fofr/latent-consistency-model:683d19dc312f7a9f0428b04429a9ccefd28dbf7785fef083ad5cf991b65f406f",
-        "input": {
-            "image": None,
-            "width": None,
-            "height": None,
-            "prompt": None,
-            "num_images": None,
-            "guidance_scale": None,
-            "archive_outputs": None,
-            "prompt_strength": None,
-            "sizing_strategy": None,
-            "lcm_origin_steps": None,
-            "canny_low_threshold": None,
-            "num_inference_steps": None,
-            "canny_high_threshold": None,
-            "control_guidance_end": None,
-            "control_guidance_start": None,
-            "controlnet_conditioning_scale": None
-        }
-    },
-    "material-diffusion": {
-        "model_id": "tstramer/material-diffusion:a42692c54c0f407f803a0a8a9066160976baedb77c91171a01730f9b0d7beeff",
-        "input": {
-            "seed": None,
-            "width": None,
-            "height": None,
-            "prompt": None,
-            "init_image": None,
-            "scheduler": None,
-            "num_outputs": None,
-            "guidance_scale": None,
-            "prompt_strength": None,
-            "num_inference_steps": None
-        }
-    },
-    "open-dalle-v1.1": {
-        "model_id": "lucataco/open-dalle-v1.1:1c7d4c8dec39c7306df7794b28419078cb9d18b9213ab1c21fdc46a1deca0144",
-        "input": {
-            "seed": None,
-            "width": None,
-            "height": None,
-            "prompt": None,
-            "negative_prompt": None,
-            "scheduler": None,
-            "num_outputs": None,
-            "guidance_scale": None,
-            "prompt_strength": None,
-            "num_inference_steps": None,
-            "apply_watermark": None,
-            "disable_safety_checker": None
-        }
-    },
-    "photon": {
-        "model_id": "luma/photon",
-        "input": {
-            "seed": None,
-            "prompt": None,
-            "aspect_ratio": None,
-            "image_reference_url": None,
-            "style_reference_url": None,
-            "character_reference_url": None,
-            "image_reference_weight": None,
-            "style_reference_weight": None
-        }
-    },
-    "photon-flash": {
-        "model_id": "luma/photon-flash",
-        "input": {
-            "seed": None,
-            "prompt": None,
-            "aspect_ratio": None,
-            "image_reference_url": None,
-            "style_reference_url": None,
-            "character_reference_url": None,
-            "image_reference_weight": None,
-            "style_reference_weight": None
-        }
-    },
-    "pixart-xl-2": {
-        "model_id": "lucataco/pixart-xl-2:816c99673841b9448bc2539834c16d40e0315bbf92fef0317b57a226727409bb",
-        "input": {
-            "prompt": None,
-            "guidance_scale": None,
-            "num_inference_steps": None,
-            "style": None,
-            "width": None,
-            "height": None,
-            "scheduler": None,
-            "num_outputs": None
-        }
-    },
-    "playground-v2.5-1024px-aesthetic": {
-        "model_id": "playgroundai/playground-v2.5-1024px-aesthetic:a45f82a1382bed5c7aeb861dac7c7d191b0fdf74d8d57c4a0e6ed7d4d0bf7d24",
-        "input": {
-            "width": None,
-            "height": None,
-            "prompt": None,
-            "scheduler": None,
-            "num_outputs": None,
-            "guidance_scale": None,
-            "apply_watermark": None,
-            "negative_prompt": None,
-            "prompt_strength": None,
-            "num_inference_steps": None,
-            "disable_safety_checker": None
-        }
-    },
-    "realvisxl-v3-multi-controlnet-lora": {
-        "model_id": "fofr/realvisxl-v3-multi-controlnet-lora:90a4a3604cd637cb9f1a2bdae1cfa9ed869362ca028814cdce310a78e27daade",
-        "input": {
-            "prompt": None,
-            "negative_prompt": None,
-            "seed": None,
-            "width": None,
-            "height": None,
-            "image": None,
-            "refine": None,
-            "scheduler": None,
-            "lora_scale": None,
-            "num_outputs": None,
-            "controlnet_1": None,
-            "controlnet_1_image": None,
-            "controlnet_1_conditioning_scale": None,
-            "controlnet_1_start": None,
-            "controlnet_1_end": None,
-            "controlnet_2": None,
-            "controlnet_2_image": None,
-            "controlnet_2_conditioning_scale": None,
-            "controlnet_2_start": None,
-            "controlnet_2_end": None,
-            "controlnet_3": None,
-            "controlnet_3_image": None,
-            "controlnet_3_conditioning_scale": None,
-            "controlnet_3_start": None,
-            "controlnet_3_end": None,
-            "guidance_scale": None,
-            "apply_watermark": None,
-            "prompt_strength": None,
-            "sizing_strategy": None,
-            "num_inference_steps": None
-        }
-    },
-    "sana": {
-        "model_id": "nvidia/sana:c6b5d2b7459910fec94432e9e1203c3cdce92d6db20f714f1355747990b52fa6",
-        "input": {
-            "prompt": None,
-            "negative_prompt": None,
-            "guidance_scale": None,
-            "pag_guidance_scale": None,
-            "num_inference_steps": None,
-            "model_variant": None,
-            "width": None,
-            "height": None
-        }
-    },
-    "sdxl": {
-        "model_id": "stability-ai/sdxl:7762fd07cf82c948538e41f63f77d685e02b063e37e496e96eefd46c929f9bdc",
-        "input": {
-            "seed": None,
-            "mask": None,
-            "prompt": None,
-            "negative_prompt": None,
-            "prompt_strength": None,
-            "guidance_scale": None,
-            "high_noise_frac": None,
-            "num_inference_steps": None,
-            "refine": None,
-            "scheduler": None,
-            "lora_scale": None,
-            "num_outputs": None,
-            "width": None,
-            "height": None,
-            "apply_watermark": None
-        }
-    },
-    "stable-diffusion": {
-        "model_id": "stability-ai/stable-diffusion:ac732df83cea7fff18b8472768c88ad041fa750ff7682a21affe81863cbe77e4",
-        "input": {
-            "width": None,
-            "height": None,
-            "prompt": None,
-            "negative_prompt": None,
-            "scheduler": None,
-            "num_outputs": None,
-            "guidance_scale": None,
-            "num_inference_steps": None
-        }
-    },
-    "stable-diffusion-3": {
-        "model_id": "stability-ai/stable-diffusion-3",
-        "input": {
-            "cfg": None,
-            "steps": None,
-            "prompt": None,
-            "aspect_ratio": None,
-            "output_format": None,
-            "output_quality": None,
-            "negative_prompt": None,
-            "prompt_strength": None
-        }
-    },
-    "stable-diffusion-3.5-medium": {
-        "model_id": "stability-ai/stable-diffusion-3.5-medium",
-        "input": {
-            "seed": None,
-            "cfg": None,
-            "steps": None,
-            "prompt": None,
-            "aspect_ratio": None,
-            "output_format": None,
-            "output_quality": None,
-            "prompt_strength": None
-        }
-    },
-    "stable-diffusion-3.5-large": {
-        "model_id": "stability-ai/stable-diffusion-3.5-large",
-        "input": {
-        "prompt": None,
-        "aspect_ratio": None,
-        "cfg_scale": None,
-        "steps": None,
-        "seed": None,
-        "negative_prompt": None,
-        "output_format": None,
-        "output_quality": None,
-        }
-    },
-    "stable-diffusion-3.5-large-turbo": {
-        "model_id": "stability-ai/stable-diffusion-3.5-large-turbo",
-        "input": {
-            "seed": None,
-            "cfg": None,
-            "steps": None,
-            "prompt": None,
-            "aspect_ratio": None,
-            "output_format": None,
-            "output_quality": None,
-            "prompt_strength": None
-        }
-    },
-    "sticker-maker": {
-        "model_id": "fofr/sticker-maker:4acb778eb059772225ec213948f0660867b2e03f277448f18cf1800b96a65a1a",
-        "input": {
-            "prompt": None,
-            "negative_prompt": None,
-            "steps": None,
-            "width": None,
-            "height": None,
-            "output_format": None,
-            "output_quality": None,
-            "number_of_images": None
-        }
-    }
-}
+# Anything with replicate's run(model_id, input=...) works here, e.g. a fake client in tests.
+replicate_client = replicate
+
+# Generation jobs are tracked in a local SQLite table.
+JOBS_DB = os.getenv("JOBS_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.db"))
+JOB_RETENTION_SECONDS = 24 * 3600
+SSE_HEARTBEAT_SECONDS = 15
+
+# Every Replicate call goes through one scheduler: GENERATE_WORKERS calls at a time, paced by a token
+# bucket for the account (Replicate allows 600 prediction creates a minute) and optionally one per model
+# (MODEL_RATE_PER_MINUTE, or rate_per_minute in models.json). 429s are retried with backoff.
+GENERATE_WORKERS = int(os.getenv("GENERATE_WORKERS", "4"))
+REPLICATE_RATE_PER_MINUTE = float(os.getenv("REPLICATE_RATE_PER_MINUTE", "600"))
+REPLICATE_BURST = int(os.getenv("REPLICATE_BURST", "10"))
+MODEL_RATE_PER_MINUTE = float(os.getenv("MODEL_RATE_PER_MINUTE", "0"))
+RATE_LIMIT_RETRIES = 5
+# Interactive jobs are dispatched ahead of batch predictions.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# /api/generate/batch runs at most this many predictions at once, whatever the request asks for.
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+BATCH_MAX_PREDICTIONS = 32
+
+SAVE_DIR = os.getenv("SAVE_DIR", "/var/www/images/saved_images/")
+# Kept outside SAVE_DIR so serve_image can never hand it out.
+SEQUENCE_DB = os.getenv("SEQUENCE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sequence.db"))
+# Content-addressed copies of every saved image; the SAVE_DIR names are hard links into it.
+OBJECT_DIR = os.getenv("OBJECT_DIR", os.path.join(os.path.dirname(SAVE_DIR.rstrip('/')), "objects"))
+IMAGES_DB = os.getenv("IMAGES_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "images.db"))
+IMAGES_MAX_PER_PAGE = 200
+
+# Gallery-sized WebP/AVIF variants, keyed by source hash and encoded in a process pool (needs Pillow).
+VARIANT_DIR = os.getenv("VARIANT_DIR", os.path.join(os.path.dirname(SAVE_DIR.rstrip('/')), "variants"))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+THUMBNAIL_FORMATS = thumbnails.available_formats()
+VARIANT_MAX_AGE = 365 * 24 * 3600
+
+# Seeded generations are deterministic, so identical requests reuse the stored output URLs.
+# Replicate deletes outputs after about an hour, hence the short TTL.
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(45 * 60)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+
+# save_images downloads in parallel over one pooled session, streaming each file to disk.
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_TIMEOUT = (5, 30)  # connect, read (seconds)
+DOWNLOAD_MAX_SECONDS = 120
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# Model ids, output kinds and typed parameter schemas live in ../models.json.
+models = load_registry()
+
+def rate_limited(e):
+    return isinstance(e, ReplicateError) and e.status == 429
+
+scheduler = Scheduler(GENERATE_WORKERS, REPLICATE_RATE_PER_MINUTE, REPLICATE_BURST,
+                      key_rates={name: spec.rate_per_minute for name, spec in models.items() if spec.rate_per_minute},
+                      default_key_rate=MODEL_RATE_PER_MINUTE or None,
+                      retry_on=rate_limited, max_retries=RATE_LIMIT_RETRIES)
+
+download_session = requests.Session()
+download_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=DOWNLOAD_WORKERS))
+download_session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=DOWNLOAD_WORKERS))
+download_executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix='download')
+filename_sequence = FilenameSequence(SAVE_DIR, SEQUENCE_DB)
+image_store = ImageStore(SAVE_DIR, OBJECT_DIR, IMAGES_DB)
+thumbnail_executor = None
+thumbnail_lock = threading.Lock()
+# In-flight renders by content hash, so requests for a variant that is still rendering start no more renders.
+variant_renders = {}
+variant_renders_lock = threading.Lock()
+
+def thumbnail_pool():
+    global thumbnail_executor
+    with thumbnail_lock:
+        if thumbnail_executor is None:
+            thumbnail_executor = thumbnails.start_pool(THUMBNAIL_WORKERS)
+        return thumbnail_executor
+
+def render_variants(sha256, object_path):
+    """Queue every size/format variant of an image; returns the Future, or None without Pillow.
+
+    While a render of the same content is still running, its Future is returned instead of starting another.
+    """
+    if not THUMBNAIL_FORMATS:
+        return None
+    with variant_renders_lock:
+        future = variant_renders.get(sha256)
+        if future is not None:
+            return future
+        future = thumbnail_pool().submit(thumbnails.render_variants, object_path, VARIANT_DIR, sha256,
+                                         THUMBNAIL_FORMATS)
+        variant_renders[sha256] = future
+
+    def finish(done):
+        with variant_renders_lock:
+            if variant_renders.get(sha256) is done:
+                del variant_renders[sha256]
+        if done.exception():
+            app.logger.error(f"Rendering variants of {object_path} failed: {done.exception()}")
+
+    future.add_done_callback(finish)
+    return future
+
+def download_to_temp(url, save_dir):
+    """Stream url into a hidden temp file in save_dir and return (path, sha256); nothing is left behind on failure."""
+    fd, temp_path = tempfile.mkstemp(dir=save_dir, prefix='.download-')
+    deadline = time.monotonic() + DOWNLOAD_MAX_SECONDS
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, 'wb') as file, download_session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                file.write(chunk)
+                digest.update(chunk)
+                if time.monotonic() > deadline:
+                    raise requests.Timeout(f"Download took longer than {DOWNLOAD_MAX_SECONDS}s")
+        return temp_path, digest.hexdigest()
+    except BaseException:
+        os.remove(temp_path)
+        raise
 
 def save_images(data):
     urls = data.get('urls', [])
     model_name = data.get('metadata', {}).get('model', 'unknown-model')
-    save_dir = '/var/www/images/saved_images/'
+    save_dir = SAVE_DIR
     if not os.path.exists(save_dir):
         os.makedirs(save_dir)
 
-    existing_files = [f for f in os.listdir(save_dir) if f.startswith('output_')]
-    existing_numbers = [int(f.split('_')[1]) for f in existing_files if f.split('_')[1].isdigit()]
-    next_number = max(existing_numbers, default=0) + 1
+    futures = [download_executor.submit(download_to_temp, url, save_dir) for url in urls]
 
-    saved_files = []
-    
-    for url in urls:
+    downloaded = []
+    failed = []
+    for url, future in zip(urls, futures):
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            
-            parsed_url = urlparse(url)
-            file_extension = os.path.splitext(parsed_url.path)[1].lower()
-            
-            filename = f"output_{next_number:04d}_{model_name}{file_extension}"
-            with open(os.path.join(save_dir, filename), 'wb') as file:
-                file.write(response.content)
-            
-            saved_files.append(filename)
-            next_number += 1
-
-        except requests.RequestException as e:
+            downloaded.append((url, *future.result()))
+        except (requests.RequestException, OSError) as e:
             print(f"Failed to download image {url}: {e}")
+            failed.append({"url": url, "error": str(e)})
+
+    # Images already in the store keep their existing name; only new content gets a number.
+    existing = {sha256: image_store.find(sha256) for _, _, sha256 in downloaded}
+    new_count = len({sha256 for sha256, filename in existing.items() if filename is None})
+    # One block of numbers per call, in request order, so concurrent saves never collide.
+    next_number = filename_sequence.allocate(new_count)
+    saved_files = []
+    for url, temp_path, sha256 in downloaded:
+        if existing[sha256]:
+            os.remove(temp_path)
+            saved_files.append(existing[sha256])
+            continue
+
+        parsed_url = urlparse(url)
+        file_extension = os.path.splitext(parsed_url.path)[1].lower()
+
+        filename = f"output_{next_number:04d}_{model_name}{file_extension}"
+        os.chmod(temp_path, 0o644)
+        image_store.add(temp_path, sha256, filename, data.get('metadata', {}))
+        render_variants(sha256, image_store.object_path(sha256, file_extension))
+        existing[sha256] = filename
 
-    return {"saved": saved_files, "metadata": data.get('metadata', {})}
+        saved_files.append(filename)
+        next_number += 1
+
+    return {"saved": saved_files, "failed": failed, "metadata": data.get('metadata', {})}
 
 @app.errorhandler(Exception)
 def handle_exception(e):
@@ -508,66 +214,361 @@ def log_request_info():
     app.logger.debug('Request URL: %s', request.url)
     app.logger.debug('Headers: %s', request.headers)
 
+def build_input(model_name, data):
+    """Validated Replicate input for a request; raises ValidationError before anything is sent."""
+    # 'model' in a request names the registry entry, not the input of the same name.
+    # The web UI's variant picker (model_variant) is what asks for the trigger word.
+    return models[model_name].build_input({k: v for k, v in data.items() if k != 'model'},
+                                          add_trigger_word='model_variant' in data)
+
+def format_output(model_name, output):
+    if models[model_name].output == 'url':
+        # For models that return a URL
+        return str(output)  # Convert to string if it's not already
+    # For models that return bytes or a list of bytes
+    if isinstance(output, list):
+        return [str(item) for item in output]
+    # Assuming single image output
+    return str(output)
+
+jobs_local = threading.local()
+job_updates = threading.Condition()
+
+def jobs_db():
+    conn = getattr(jobs_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(JOBS_DB, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        jobs_local.conn = conn
+    return conn
+
+def init_jobs_db():
+    with jobs_db() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                model TEXT,
+                status TEXT,
+                input TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL,
+                started_at REAL,
+                finished_at REAL
+            )
+        ''')
+        # Jobs that were in flight when the server stopped will never finish.
+        conn.execute("UPDATE jobs SET status = 'failed', error = 'Interrupted by a server restart', finished_at = ? "
+                     "WHERE status IN ('queued', 'running')", (time.time(),))
+
+def update_job(job_id, **fields):
+    assignments = ', '.join(f"{name} = ?" for name in fields)
+    with jobs_db() as conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+    with job_updates:
+        job_updates.notify_all()
+
+def get_job(job_id):
+    row = jobs_db().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job['input'] = json.loads(job['input'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+class ResultCache:
+    """Thread-safe LRU of prediction results with a TTL, plus hit/miss counters."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counts = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'bypassed': 0}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] >= self.ttl:
+                del self.entries[key]
+                self.counts['expirations'] += 1
+                entry = None
+            if entry is None:
+                self.counts['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counts['hits'] += 1
+            return entry[1]
+
+    def put(self, key, result):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counts['evictions'] += 1
+
+    def bypass(self):
+        with self.lock:
+            self.counts['bypassed'] += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counts['hits'] + self.counts['misses']
+            return {**self.counts, 'entries': len(self.entries), 'max_entries': self.max_entries,
+                    'ttl_seconds': self.ttl, 'hit_rate': self.counts['hits'] / lookups if lookups else 0.0}
+
+result_cache = ResultCache(RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_MAX_ENTRIES)
+
+def result_fingerprint(model_name, filtered_params):
+    """Cache key for a request, or None when it has no seed and so is not reproducible."""
+    if filtered_params.get('seed') in (None, ''):
+        return None
+    canonical = json.dumps({"model_id": models[model_name].model_id, "input": filtered_params},
+                           sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def cached_result(model_name, filtered_params, use_cache):
+    key = result_fingerprint(model_name, filtered_params)
+    if key is None:
+        return None
+    if not use_cache:
+        result_cache.bypass()
+        return None
+    result = result_cache.get(key)
+    return {**result, "cached": True} if result else None
+
+def call_model(model_name, filtered_params):
+    """Run the prediction on Replicate and cache the result if the request is seeded."""
+    output = replicate_client.run(models[model_name].model_id, input=filtered_params)
+    result = {"url": format_output(model_name, output)}
+    key = result_fingerprint(model_name, filtered_params)
+    if key:
+        result_cache.put(key, result)
+    return result
+
+def schedule_model(model_name, filtered_params, priority):
+    """Queue call_model on the rate-limited scheduler; returns a Future."""
+    return scheduler.submit(call_model, model_name, filtered_params, key=model_name, priority=priority)
+
+def predict(model_name, filtered_params, use_cache=True, priority=PRIORITY_BATCH):
+    return (cached_result(model_name, filtered_params, use_cache)
+            or schedule_model(model_name, filtered_params, priority).result())
+
+def run_job(job_id, model_name, filtered_params):
+    """Runs on a scheduler worker; a rate-limited attempt is retried and marks the job running again."""
+    update_job(job_id, status='running', started_at=time.time())
+    # submit_job has already checked the cache.
+    return call_model(model_name, filtered_params)
+
+def finish_job(job_id, future):
+    try:
+        result = future.result()
+    except Exception as e:
+        cleaned_error = str(e).replace('\n', ' ')
+        app.logger.error(f"Replicate API call failed for job {job_id}: {cleaned_error}")
+        update_job(job_id, status='failed', error=cleaned_error, finished_at=time.time())
+        return
+    update_job(job_id, status='succeeded', result=json.dumps(result), finished_at=time.time())
+
+def submit_job(model_name, filtered_params, use_cache=True):
+    """Record a job and queue it; returns (job_id, status). Cache hits are stored as already succeeded."""
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    result = cached_result(model_name, filtered_params, use_cache)
+    with jobs_db() as conn:
+        conn.execute('DELETE FROM jobs WHERE finished_at < ?', (now - JOB_RETENTION_SECONDS,))
+        if result:
+            conn.execute('INSERT INTO jobs (id, model, status, input, result, created_at, started_at, finished_at) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         (job_id, model_name, 'succeeded', json.dumps(filtered_params), json.dumps(result), now, now, now))
+            return job_id, 'succeeded'
+        conn.execute('INSERT INTO jobs (id, model, status, input, created_at) VALUES (?, ?, ?, ?, ?)',
+                     (job_id, model_name, 'queued', json.dumps(filtered_params), now))
+    future = scheduler.submit(run_job, job_id, model_name, filtered_params, key=model_name,
+                              priority=PRIORITY_INTERACTIVE)
+    future.add_done_callback(lambda done: finish_job(job_id, done))
+    return job_id, 'queued'
+
 @app.route('/api/generate', methods=['POST'])
 def generate_image():
     data = request.json
     model_name = data.get('model')
     app.logger.debug(f"Received model name: {model_name}")
-    app.logger.debug(f"Available models: {list(model_params.keys())}")
     
-    if model_name not in model_params:
+    if model_name not in models:
         return jsonify({"error": "Invalid model"}), 400
 
-    model_config = model_params[model_name]
-    input_params = model_params[model_name]["input"].copy()
-
-    if model_name in ["datacte-flux-aesthetic-anime", "datacte-flux-synthetic-anime"] and 'model_variant' in data:
-        data['model'] = data['model_variant']  # Map model_variant to model for these specific models
-        if 'prompt' in data and 'syntheticanim' not in data['prompt'].lower():
-            data['prompt'] = "syntheticanim, " + data['prompt']
-
-    # Update with provided data, but only if the key exists in input_params
-    for key, value in data.items():
-        if key in input_params:
-            # Special handling for 'material-diffusion' model's width and height
-            if model_name in ['material-diffusion', 'datacte-mobius', 'kandinsky-2.2'] and key in ['width', 'height']:
-                try:
-                    input_params[key] = int(value)
-                except ValueError:
-                    # If conversion fails, use the default value
-                    input_params[key] = int(input_params[key] or model_config["input"].get(key, 0))
-            else:
-                input_params[key] = value
-
-    # Filter out None values
-    filtered_params = {k: v for k, v in input_params.items() if v is not None}
-
+    try:
+        filtered_params = build_input(model_name, data)
+    except ValidationError as e:
+        return jsonify({"error": str(e), "details": e.errors}), 400
     app.logger.debug(f"Sending to Replicate: {filtered_params}")
 
+    job_id, status = submit_job(model_name, filtered_params, use_cache=not data.get('bypass_cache'))
+    return jsonify({
+        "job_id": job_id,
+        "status": status,
+        "status_url": f"/api/jobs/{job_id}",
+        "events_url": f"/api/jobs/{job_id}/events"
+    }), 202
+
+@app.route('/api/generate/batch', methods=['POST'])
+def generate_batch():
+    """Run one prompt across several models and parameter variants concurrently.
+
+    Body: {"prompt": ..., "models": [...], "variants": [{...}, ...], "concurrency": N, ...shared params}.
+    Streams one NDJSON line per prediction as it finishes, then a summary line.
+    """
+    data = request.json
+    model_names = data.get('models') or []
+    variants = data.get('variants') or [{}]
+    unknown = [m for m in model_names if m not in models]
+    if not model_names or unknown:
+        return jsonify({"error": f"Invalid models: {unknown}" if unknown else "No models given"}), 400
+    if len(model_names) * len(variants) > BATCH_MAX_PREDICTIONS:
+        return jsonify({"error": f"A batch is limited to {BATCH_MAX_PREDICTIONS} predictions"}), 400
     try:
-        output = replicate.run(model_params[model_name]["model_id"], input=filtered_params)
-        
-        if model_name in ["sana", "photon-flash", "photon", "flux-1.1-pro", "flux-1.1-pro-ultra"]:
-            # For models that return a URL
-            url_output = str(output)  # Convert to string if it's not already
-            return jsonify({"url": url_output})
-        else:
-            # For models that return bytes or a list of bytes
-            if isinstance(output, list):
-                return jsonify({"url": [str(item) for item in output]})
-            else:
-                # Assuming single image output
-                return jsonify({"url": str(output)})
-        
-    except Exception as e:
-        error_message = str(e)
-        cleaned_error = error_message.replace('\n', ' ')
-        app.logger.error(f"Replicate API call failed: {cleaned_error}")
-        return jsonify({"error": cleaned_error}), 500
+        concurrency = max(1, min(int(data.get('concurrency', BATCH_MAX_CONCURRENCY)), BATCH_MAX_CONCURRENCY))
+    except (TypeError, ValueError):
+        return jsonify({"error": "concurrency must be an integer"}), 400
+
+    use_cache = not data.get('bypass_cache')
+    shared = {k: v for k, v in data.items() if k not in ('models', 'variants', 'concurrency', 'bypass_cache')}
+    predictions = []
+    try:
+        for model_name in model_names:
+            for variant_index, variant in enumerate(variants):
+                filtered_params = build_input(model_name, {**shared, **variant})
+                predictions.append((model_name, variant_index, filtered_params))
+    except ValidationError as e:
+        return jsonify({"error": str(e), "details": e.errors}), 400
+    app.logger.debug(f"Batch of {len(predictions)} predictions, concurrency {concurrency}")
+
+    def timed_predict(model_name, filtered_params):
+        started = time.monotonic()
+        try:
+            return predict(model_name, filtered_params, use_cache), None, time.monotonic() - started
+        except Exception as e:
+            return None, str(e).replace('\n', ' '), time.monotonic() - started
+
+    def stream():
+        started = time.monotonic()
+        latencies = {}
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch')
+        try:
+            futures = {executor.submit(timed_predict, model_name, params): (index, model_name, variant_index)
+                       for index, (model_name, variant_index, params) in enumerate(predictions)}
+            for future in as_completed(futures):
+                index, model_name, variant_index = futures[future]
+                result, error, latency = future.result()
+                latencies.setdefault(model_name, []).append(latency)
+                line = {"index": index, "model": model_name, "variant": variant_index, "latency": round(latency, 3)}
+                if error:
+                    app.logger.error(f"Batch prediction {index} ({model_name}) failed: {error}")
+                    line.update(status="failed", error=error)
+                else:
+                    line.update(status="succeeded", url=result["url"], cached=result.get("cached", False))
+                yield json.dumps(line) + "\n"
+            yield json.dumps({
+                "done": True,
+                "count": len(predictions),
+                "elapsed": round(time.monotonic() - started, 3),
+                "latency_by_model": {m: {"mean": round(sum(v) / len(v), 3), "max": round(max(v), 3)}
+                                     for m, v in latencies.items()}
+            }) + "\n"
+        finally:
+            # A client that disconnects mid-stream should not leave queued predictions running.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return Response(stream(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+@app.route('/api/scheduler/stats')
+def scheduler_stats():
+    return jsonify(scheduler.stats())
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/events')
+def job_events(job_id):
+    """Server-Sent Events stream of a job's status; ends after it succeeds or fails."""
+    if get_job(job_id) is None:
+        return jsonify({"error": "Unknown job"}), 404
+
+    def stream():
+        last_status = None
+        last_sent = time.monotonic()
+        while True:
+            job = get_job(job_id)
+            if job['status'] != last_status:
+                last_status = job['status']
+                last_sent = time.monotonic()
+                yield f"event: status\ndata: {json.dumps(job)}\n\n"
+                if last_status in ('succeeded', 'failed'):
+                    return
+            elif time.monotonic() - last_sent >= SSE_HEARTBEAT_SECONDS:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            with job_updates:
+                job_updates.wait(timeout=1)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/images/saved_images/<filename>')
 def serve_image(filename):
-    return send_from_directory('/var/www/images/saved_images/', filename)
+    """The original image, or with ?size=thumb|medium a downscaled WebP (AVIF if the browser accepts it)."""
+    size = request.args.get('size')
+    if size in (None, '', 'full'):
+        return send_from_directory(SAVE_DIR, filename)
+    if size not in thumbnails.VARIANT_SIZES:
+        return jsonify({"error": f"size must be one of {', '.join(thumbnails.VARIANT_SIZES)} or full"}), 400
+    source = image_store.source_for(filename)
+    if not THUMBNAIL_FORMATS or source is None or not os.path.exists(source[1]):
+        return send_from_directory(SAVE_DIR, filename)
+
+    sha256, object_path = source
+    fmt = 'avif' if 'avif' in THUMBNAIL_FORMATS and 'image/avif' in request.headers.get('Accept', '') else 'webp'
+    path = thumbnails.variant_path(VARIANT_DIR, sha256, size, fmt)
+    if not os.path.exists(path):
+        # Never hold a request thread on a render: serve the original now and let the render started by
+        # save_images finish, or start one for images saved before the pipeline existed.
+        render_variants(sha256, object_path)
+        response = send_from_directory(SAVE_DIR, filename)
+        # Not cached, so the next load picks up the variant.
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    response = send_file(path, mimetype=f"image/{fmt}", max_age=VARIANT_MAX_AGE, conditional=True)
+    # Variants are keyed by content hash, so they never change.
+    response.headers['Cache-Control'] = f"public, max-age={VARIANT_MAX_AGE}, immutable"
+    response.headers['Vary'] = 'Accept'
+    return response
+
+@app.route('/api/images')
+def list_images():
+    """Newest-first saved images from the metadata index: ?page=&per_page=&model=&q=&seed="""
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = max(1, min(int(request.args.get('per_page', 50)), IMAGES_MAX_PER_PAGE))
+        seed = int(request.args['seed']) if request.args.get('seed') else None
+    except ValueError:
+        return jsonify({"error": "page, per_page and seed must be integers"}), 400
+    images, has_more = image_store.query(page, per_page, model=request.args.get('model'),
+                                         text=request.args.get('q'), seed=seed)
+    for image in images:
+        image['url'] = f"/images/saved_images/{image['filename']}"
+    return jsonify({"images": images, "page": page, "per_page": per_page, "has_more": has_more})
 
 @app.route('/api/saveImages', methods=['POST'])
 def save_images_endpoint():
@@ -578,5 +579,9 @@ def save_images_endpoint():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+init_jobs_db()
+# Index images saved before the store existed, without holding up startup.
+threading.Thread(target=image_store.import_gallery, name='import-gallery', daemon=True).start()
+
+# The development server is started by __main__.py (python backend), not from here: spawned thumbnail
+# workers re-run a __main__ script, and running this one would load the whole backend in each of them.
\ No newline at end of file
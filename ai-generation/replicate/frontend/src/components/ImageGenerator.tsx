@@ -852,6 +852,56 @@ const ModelSelector: React.FC = () => {
     // negative_prompt: string;
     [key: string]: string | number | boolean | undefined;
   } 
+
+  interface GenerationJob {
+    id: string;
+    status: 'queued' | 'running' | 'succeeded' | 'failed';
+    result: { url: string | string[] } | null;
+    error: string | null;
+  }
+
+  // Follow a generation job over Server-Sent Events, falling back to polling if the stream drops.
+  const waitForJob = (jobId: string): Promise<GenerationJob> => {
+    const jobUrl = `http://192.168.0.66:5000/api/jobs/${jobId}`;
+    return new Promise((resolve, reject) => {
+      const finish = (job: GenerationJob) => {
+        if (job.status === 'succeeded') {
+          resolve(job);
+        } else {
+          reject(new Error(job.error || 'Generation failed'));
+        }
+      };
+      const poll = () => {
+        fetch(jobUrl)
+          .then(response => {
+            if (!response.ok) {
+              throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.json();
+          })
+          .then((job: GenerationJob) => {
+            if (job.status === 'succeeded' || job.status === 'failed') {
+              finish(job);
+            } else {
+              setTimeout(poll, 2000);
+            }
+          })
+          .catch(reject);
+      };
+      const events = new EventSource(`${jobUrl}/events`);
+      events.addEventListener('status', (event) => {
+        const job: GenerationJob = JSON.parse((event as MessageEvent).data);
+        if (job.status === 'succeeded' || job.status === 'failed') {
+          events.close();
+          finish(job);
+        }
+      });
+      events.onerror = () => {
+        events.close();
+        poll();
+      };
+    });
+  };
  
   const handleSubmit = () => {
     // console.log('Selected Model (exact):', JSON.stringify(selectedModel));
@@ -886,9 +936,11 @@ const ModelSelector: React.FC = () => {
       }
       return response.json();
     })
-    .then(data => {
-      console.log('Success:', data);
-      if (data.url) {
+    .then(data => waitForJob(data.job_id))
+    .then(job => {
+      console.log('Success:', job);
+      const data = job.result;
+      if (data && data.url) {
         const imageUrls = Array.isArray(data.url) ? data.url : [data.url];
         
         return fetch('http://192.168.0.66:5000/api/saveImages', {
@@ -908,17 +960,30 @@ const ModelSelector: React.FC = () => {
           // Use the saved filenames for displaying images
           const savedFiles = saveData.saved || [];
           savedFiles.forEach((filename: string) => {
+            const imageUrl = `http://192.168.0.66:5000/images/saved_images/${filename}`;
+            // Show the downscaled WebP/AVIF preview; the link opens the full-size original.
+            const link = document.createElement('a');
+            link.href = imageUrl;
+            link.target = '_blank';
+            link.rel = 'noopener noreferrer';
             const img = document.createElement('img');
-            img.src = `http://192.168.0.66:5000/images/saved_images/${filename}`;
+            img.src = `${imageUrl}?size=medium`;
+            img.loading = 'lazy';
+            link.appendChild(img);
             
             const container = document.getElementById('imageContainer');
             if (container) {
-              container.appendChild(img);
+              container.appendChild(link);
             } else {
               console.error("Container with ID 'imageContainer' not found in the DOM");
             }
           });
           
+          const failed = saveData.failed || [];
+          if (failed.length > 0) {
+            setError(`Error: ${failed.length} of ${imageUrls.length} images could not be saved`);
+            console.error('Failed downloads:', failed);
+          }
           console.log('Images saved and displayed successfully');
         });
       }
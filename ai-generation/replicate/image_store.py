@@ -0,0 +1,204 @@
+"""Content-addressed image store with a SQLite metadata index.
+
+Each distinct image is kept once under objects/<sha[:2]>/<sha><ext>. The
+output_NNNN_<model> names in the gallery directory are hard links to those
+objects, so existing URLs keep working and identical images take no extra
+space. The index records prompt, model, parameters, seed, timestamp and
+dimensions for every saved name, so listings never touch the directory.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import threading
+import time
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS images (
+        filename TEXT PRIMARY KEY,
+        sha256 TEXT NOT NULL,
+        model TEXT,
+        prompt TEXT,
+        params TEXT,
+        seed INTEGER,
+        width INTEGER,
+        height INTEGER,
+        format TEXT,
+        bytes INTEGER,
+        created_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS images_sha256 ON images (sha256);
+    CREATE INDEX IF NOT EXISTS images_created_at ON images (created_at);
+    CREATE INDEX IF NOT EXISTS images_model_created_at ON images (model, created_at);
+    CREATE TABLE IF NOT EXISTS store_state (name TEXT PRIMARY KEY, value TEXT);
+'''
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif')
+
+
+def image_size(path):
+    """Return (width, height, format) from the file header, or (None, None, None) if unrecognised."""
+    with open(path, 'rb') as f:
+        head = f.read(32)
+        if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+            width, height = struct.unpack('>II', head[16:24])
+            return width, height, 'png'
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            width, height = struct.unpack('<HH', head[6:10])
+            return width, height, 'gif'
+        if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+            chunk = head[12:16]
+            if chunk == b'VP8 ':
+                f.seek(26)
+                width, height = struct.unpack('<HH', f.read(4))
+                return width & 0x3fff, height & 0x3fff, 'webp'
+            if chunk == b'VP8L':
+                bits = int.from_bytes(head[21:25], 'little')
+                return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1, 'webp'
+            if chunk == b'VP8X':
+                return int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1, 'webp'
+        if head.startswith(b'\xff\xd8'):
+            # Walk the JPEG segments to the first start-of-frame marker.
+            f.seek(2)
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xff:
+                    break
+                if marker[1] in (0xc0, 0xc1, 0xc2, 0xc3, 0xc5, 0xc6, 0xc7, 0xc9, 0xca, 0xcb, 0xcd, 0xce, 0xcf):
+                    f.read(3)
+                    height, width = struct.unpack('>HH', f.read(4))
+                    return width, height, 'jpeg'
+                length = struct.unpack('>H', f.read(2))[0]
+                f.seek(length - 2, os.SEEK_CUR)
+    return None, None, None
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        # Hard links need the same filesystem; fall back to a plain copy.
+        shutil.copyfile(source, target)
+
+
+class ImageStore:
+    def __init__(self, gallery_dir, object_dir, db_path):
+        self.gallery_dir = gallery_dir
+        self.object_dir = object_dir
+        self.db_path = db_path
+        self.local = threading.local()
+        os.makedirs(object_dir, exist_ok=True)
+        with self.db() as conn:
+            conn.executescript(SCHEMA)
+
+    def db(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self.local.conn = conn
+        return conn
+
+    def object_path(self, sha256, extension):
+        return os.path.join(self.object_dir, sha256[:2], sha256 + extension)
+
+    def source_for(self, filename):
+        """(sha256, object path) for a gallery filename, or None if it is not indexed."""
+        row = self.db().execute('SELECT sha256 FROM images WHERE filename = ?', (filename,)).fetchone()
+        if row is None:
+            return None
+        return row['sha256'], self.object_path(row['sha256'], os.path.splitext(filename)[1].lower())
+
+    def find(self, sha256):
+        """Gallery filename already holding this content, if any."""
+        row = self.db().execute('SELECT filename FROM images WHERE sha256 = ? ORDER BY created_at LIMIT 1',
+                                (sha256,)).fetchone()
+        if row and os.path.exists(os.path.join(self.gallery_dir, row['filename'])):
+            return row['filename']
+        return None
+
+    def add(self, source_path, sha256, filename, metadata, move=True, created_at=None):
+        """Store source_path under its hash, link it into the gallery as filename and index it.
+
+        With move=False the source stays where it is and the object is linked to it instead.
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        object_path = self.object_path(sha256, extension)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        if os.path.exists(object_path):
+            if move:
+                os.remove(source_path)
+        elif move:
+            os.replace(source_path, object_path)
+        else:
+            link_or_copy(source_path, object_path)
+        target = os.path.join(self.gallery_dir, filename)
+        if not os.path.exists(target):
+            link_or_copy(object_path, target)
+        width, height, image_format = image_size(object_path)
+        params = {k: v for k, v in metadata.items() if k not in ('model', 'prompt')}
+        try:
+            seed = int(metadata['seed'])
+        except (KeyError, TypeError, ValueError):
+            seed = None
+        with self.db() as conn:
+            conn.execute('INSERT OR REPLACE INTO images (filename, sha256, model, prompt, params, seed, width, height, '
+                         'format, bytes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (filename, sha256, metadata.get('model'), metadata.get('prompt'), json.dumps(params),
+                          seed, width, height, image_format, os.path.getsize(object_path), created_at or time.time()))
+        return filename
+
+    def query(self, page=1, per_page=50, model=None, text=None, seed=None):
+        """Newest-first page of indexed images; returns (images, has_more)."""
+        clauses = []
+        args = []
+        if model:
+            clauses.append('model = ?')
+            args.append(model)
+        if text:
+            clauses.append("prompt LIKE ? ESCAPE '\\'")
+            args.append('%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if seed is not None:
+            clauses.append('seed = ?')
+            args.append(seed)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self.db().execute(f'SELECT * FROM images {where} ORDER BY created_at DESC, filename DESC LIMIT ? OFFSET ?',
+                                 (*args, per_page + 1, (page - 1) * per_page)).fetchall()
+        images = []
+        for row in rows[:per_page]:
+            image = dict(row)
+            image['params'] = json.loads(image['params']) if image['params'] else {}
+            images.append(image)
+        return images, len(rows) > per_page
+
+    def import_gallery(self):
+        """Index output_ files saved before the store existed; runs once, later calls return immediately."""
+        conn = self.db()
+        if conn.execute("SELECT 1 FROM store_state WHERE name = 'gallery_imported'").fetchone():
+            return 0
+        known = {row[0] for row in conn.execute('SELECT filename FROM images')}
+        imported = 0
+        if os.path.isdir(self.gallery_dir):
+            for entry in os.scandir(self.gallery_dir):
+                name = entry.name
+                if name in known or not name.startswith('output_') or not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                model = os.path.splitext(name)[0].split('_', 2)[-1]
+                self.add(entry.path, file_sha256(entry.path), name, {'model': model}, move=False,
+                         created_at=entry.stat().st_mtime)
+                imported += 1
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO store_state (name, value) VALUES ('gallery_imported', ?)",
+                         (json.dumps(time.time()),))
+        return imported
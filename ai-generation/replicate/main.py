@@ -1,11 +1,43 @@
+"""Generate images on Replicate from the settings below, or run a batch of jobs concurrently.
+
+    python main.py                                   # one prompt, using the settings below
+    python main.py --model sdxl --prompt "..."
+    python main.py --jobs sweep.jsonl --workers 8    # or a .csv; rerun to resume
+
+Each job is a JSONL object or CSV row with a prompt, a model and any parameter
+overrides (flat, or under "overrides" in JSONL), plus an optional id. Finished
+jobs are appended to a JSONL manifest and skipped when the batch is run again.
+"""
 import replicate
 import os
+import sys
+import argparse
+import csv
+import hashlib
+import json
+import shutil
+import tempfile
+import time
 from pathlib import Path
 import urllib.request
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from replicate.exceptions import ReplicateError
+from sequence import FilenameSequence
+from model_registry import load_registry, ValidationError
+from scheduler import Scheduler
 
 os.environ["REPLICATE_API_TOKEN"] = ""
 
+# Batch mode paces predictions to Replicate's limit and retries 429s (see scheduler.py).
+REPLICATE_RATE_PER_MINUTE = 600
+REPLICATE_BURST = 10
+DOWNLOAD_WORKERS = 8
+DOWNLOAD_TIMEOUT = 60
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+model_name = None                                       # Uncomment one below, or pass --model
+
 # model_name = "datacte-flux-aesthetic-anime"           # 90    / $1        # Flux lora, ghibli retro anime
 # model_name = "datacte-flux-synthetic-anime"           # 19    / $1        # Flux lora, Trigger word "syntheticanime". Use "1980s anime screengrab", "VHS quality", or "syntheticanime"
 # model_name = "datacte-mobius"                         # 90    / $1
@@ -69,464 +101,234 @@ output_quality = 100
 apply_watermark = False
 disable_safety_checker = True
 
-# Define model parameters
-model_params = {
-    "datacte-flux-aesthetic-anime": {
-        "model_id": "datacte/flux-aesthetic-anime:2c3677b83922a0ac99493467805fb0259f55c4f4f7b1988b1dd1d92f083a8304",
-        "input": {
-            "model": "dev",                             # "dev" "schnell"
-            "prompt": prompt,
-            "go_fast": False,
-            "lora_scale": 1,                            # Default: 1, -1-3
-            "megapixels": "1",
-            "num_outputs": num_outputs,
-            "aspect_ratio": aspect_ratio,
-            "output_format": output_format,
-            "guidance_scale": 3.5,                      # Default: 3, 1-10
-            "output_quality": output_quality,
-            "prompt_strength": prompt_strength,
-            "extra_lora_scale": 0.8,
-            "num_inference_steps": 28,                   # Default 28, 1-50            
-            "disable_safety_checker": disable_safety_checker
-        }
-    },    
-    "datacte-flux-synthetic-anime": {
-        "model_id": "datacte/flux-synthetic-anime:01c7749152b789eef876573153fa36f6013a2d7185ad38588fae19743ebca6e0",
-        "input": {
-            "model": "dev",                             # "dev" "schnell"
-            "prompt": prompt,
-            "go_fast": False,
-            "lora_scale": 0.85,
-            "megapixels": "1",
-            "num_outputs": num_outputs,
-            "aspect_ratio": aspect_ratio,
-            "output_format": output_format,
-            "guidance_scale": 3.5,                      # Default: 3, 1-10
-            "output_quality": output_quality,
-            "prompt_strength": prompt_strength,
-            "extra_lora_scale": 0.8,
-            "num_inference_steps": 28,                   # Default 28, 1-50            
-            "disable_safety_checker": disable_safety_checker
-        }
-    },    
-    "datacte-mobius": {
-        "model_id": "datacte/mobius:197f2145583f80c7c3ec520d2a1080aa7986601e1612e417ccd6e4f50fe0624f",
-        "input": {
-            # "seed": seed,
-            "width": width,
-            "height": height,
-            "prompt": prompt,
-            "scheduler": scheduler,
-            "num_outputs": num_outputs,
-            "guidance_scale": 7,                        # Default: 7, 1-50
-            "negative_prompt": negative_prompt,
-            "num_inference_steps": 50,                   # Default 50, 1-100
-            "disable_safety_checker": disable_safety_checker
-        }
-    },
-    "datacte-prometheusv1": {
-        "model_id": "datacte/prometheusv1:a40536dd5f61e7c3c43060dff5b9b488a749dec1cb283a904dd82032fc717295",
-        "input": {
-            # "seed": seed,
-            # "image": reference_image,
-            "width": width,
-            "height": height,
-            "prompt": prompt,
-            "scheduler": scheduler,
-            "num_outputs": num_outputs,
-            "guidance_scale": 7,                        # Default: 7, 1-50
-            "negative_prompt": negative_prompt,
-            "prompt_strength": prompt_strength,                     # Default 0.8, 0-1
-            "num_inference_steps": 50,                   # Default 50, 1-100
-            "disable_safety_checker": disable_safety_checker
-        }
-    },
-    "datacte-proteus-v0.5": {
-        "model_id": "datacte/proteus-v0.3:b28b79d725c8548b173b6a19ff9bffd16b9b80df5b18b8dc5cb9e1ee471bfa48",
-        "input": {
-            # "seed": seed,
-            # "image": reference_image,
-            "width": width,
-            "height": height,
-            "prompt": prompt,
-            "scheduler": scheduler,
-            "num_outputs": num_outputs,
-            "guidance_scale": 7,                        # Default: 7, 1-50
-            "negative_prompt": negative_prompt,
-            "prompt_strength": prompt_strength,                     # Default 0.8, 0-1
-            "num_inference_steps": 50,                   # Default 50, 1-100
-            "disable_safety_checker": disable_safety_checker
-        }
-    },
-    "dreamshaper-xl-turbo": {
-        "model_id": "lucataco/dreamshaper-xl-turbo:0a1710e0187b01a255302738ca0158ff02a22f4638679533e111082f9dd1b615",
-        "input": {
-            "width": width,
-            "height": height,
-            "prompt": prompt,
-            "scheduler": scheduler,
-            "num_outputs": num_outputs,
-            "guidance_scale": 2,                    # Default 2, 1-20
-            "apply_watermark": apply_watermark,
-            "negative_prompt": negative_prompt,
-            "num_inference_steps": 7,                # Default 6, 1-50
-            "disable_safety_checker": disable_safety_checker
-        }
-    },
-    "flux-schnell": {
-        "model_id": "black-forest-labs/flux-schnell",
-        "input": {
-            # "seed": seed,
-            "prompt": prompt,                        
-            "num_inference_steps": 4,               # Default: 4, 1-4                                  
-            "megapixels": "1",                      # 0.25 or 1
-            "output_quality": output_quality,                  # Default: 80, 1-100, only for webm 
-            "num_outputs": num_outputs,
-            "output_format": output_format,  
-            "aspect_ratio": aspect_ratio,        
-            "go_fast": False,
-            "disable_safety_checker": disable_safety_checker
-        }
-    },
-    "flux-dev": {
-        "model_id": "black-forest-labs/flux-dev",
-        "input": {
-            # "seed": seed,
-            "prompt": prompt,
-            "prompt_strength": prompt_strength,                 # Default: 0.8, 0-1           
-            "num_inference_steps": 28,              # Default: 28, recommend 28-50, 1-50            
-            "guidance": 3,                          # Default: 3, 1-10            
-            "megapixels": "1",                      # 0.25 or 1
-            "output_quality": output_quality,                  # Default: 80, 1-100, only for webm
-            "num_outputs": num_outputs,
-            "output_format": output_format,
-            "aspect_ratio": aspect_ratio,            
-            "go_fast": False,
-            "disable_safety_checker": disable_safety_checker
-        }
-    },
-    "flux-1.1-pro": {
-        "model_id": "black-forest-labs/flux-1.1-pro",
-        "input": {
-            # "seed": seed,
-            "prompt": prompt,
-            "aspect_ratio": aspect_ratio,         # or custom
-            "height": height,                     # Only used when aspect_ratio=custom. Must be a multiple of 32
-            "width": width,                       # Only used when aspect_ratio=custom. Must be a multiple of 32
-            # "image_prompt": reference_image,      # reference image URL. Must be jpeg, png, gif, or webp.
-            "output_format": output_format,
-            "output_quality": output_quality,
-            "safety_tolerance": 6,                  # Default 2, 1-6 strict to permissive
-            "prompt_upsampling": True               # Automatically modify the prompt for more creative generation
-        }
-    },
-    "flux-1.1-pro-ultra": {
-        "model_id": "black-forest-labs/flux-1.1-pro-ultra",
-        "input": {
-            # "seed": seed,
-            "raw": False,                           # Generate less processed, more natural-looking images
-            "prompt": prompt,
-            "aspect_ratio": aspect_ratio,
-            "output_format": output_format,
-            "safety_tolerance": 6,                  # Default 2, 1-6 strict to permissive
-            # "image_prompt": reference_image,           # reference image URL. Must be jpeg, png, gif, or webp.
-            "image_prompt_strength": 0.1            # Default 0.1, Max 1, Blend between the prompt and the image prompt
-        }
-    },
-    "kandinsky-2.2": {
-        "model_id": "ai-forever/kandinsky-2.2:ad9d7879fbffa2874e1d909d1d37d9bc682889cc65b31f7bb00d2362619f194a",
-        "input": {
-            # "seed": seed,
-            "prompt": prompt,
-            "num_inference_steps": 75,              # Default 75, 1-500
-            "num_inference_steps_prior": 25,         # Default 25, 1-500
-            "output_format": output_format,
-            "width": width,                         # Default: 512
-            "height": height                        # Default: 512
-        }
-    },
-    "latent-consistency-model": {
-        "model_id": "fofr/latent-consistency-model:683d19dc312f7a9f0428b04429a9ccefd28dbf7785fef083ad5cf991b65f406f",
-        "input": {
-            # "image": reference_image,
-            "width": width,
-            "height": height,
-            "prompt": prompt,
-            "num_images": num_outputs,
-            "guidance_scale": 8,                    # Defaul: 8, 1-20
-            "archive_outputs": False,
-            "prompt_strength": prompt_strength,                # Default 0.8, 0-1
-            "sizing_strategy": "width/height",
-            "lcm_origin_steps": 50,                 # Default 50, 1-?
-            "canny_low_threshold": 100,             # Default 100, 1-255
-            "num_inference_steps": 8,               # Default 8, 1-50
-            "canny_high_threshold": 200,            # Default 200, 1-255
-            "control_guidance_end": 1,              # Default: 1, Max 1
-            "control_guidance_start": 0,            # Default: 1, Max 1
-            "controlnet_conditioning_scale": 2      # Default 2, 0.1-4
-        }
-    },
-    "material-diffusion": {
-        "model_id": "tstramer/material-diffusion:a42692c54c0f407f803a0a8a9066160976baedb77c91171a01730f9b0d7beeff",
-        "input": {
-            # "seed": seed,
-            "width": width,                         # Default: 512
-            "height": width,                        # Default: 512
-            "prompt": prompt,
-            # "init_image": reference_image,          # Inital image to generate variations of. Will be resized to the specified width and height
-            "scheduler": "K-LMS",                   # Default: "K-LMS" "DDIM" "PNDM"
-            "num_outputs": num_outputs,             # 1-10
-            "guidance_scale": 7.5,                  # Default: 7.5, 1-20
-            "prompt_strength": prompt_strength,                 # Default 0.8, 0-1
-            "num_inference_steps": 50               # Default 50, 1-500
-        }
-    },
-    "open-dalle-v1.1": {
-        "model_id": "lucataco/open-dalle-v1.1:1c7d4c8dec39c7306df7794b28419078cb9d18b9213ab1c21fdc46a1deca0144",
-        "input": {
-            # "seed": seed,
-            "width": width,
-            "height": height,
-            "prompt": prompt,
-            "negative_prompt": negative_prompt,
-            "scheduler": scheduler,
-            "num_outputs": num_outputs,
-            "guidance_scale": 7.5,                  # Default 7.5, 1-50
-            "prompt_strength": prompt_strength,                 # Default 0.8, 0-1
-            "num_inference_steps": 60,              # Default 60, 1-100
-            "apply_watermark": True,
-            "disable_safety_checker": disable_safety_checker
-        }
-    },
-    "photon": {
-        "model_id": "luma/photon",
-        "input": {
-            # "seed": seed,
-            "prompt": prompt,
-            "aspect_ratio": "16:9",
-            "image_reference_url": "",
-            "style_reference_url": "",
-            "character_reference_url": "",
-            "image_reference_weight": 0.85,         # Max: 1
-            "style_reference_weight": 0.85          # Max: 1
-        }
-    },
-    "photon-flash": {
-        "model_id": "luma/photon-flash",
-        "input": {
-            # "seed": seed,
-            "prompt": prompt,
-            "aspect_ratio": "16:9",
-            "image_reference_url": "",
-            "style_reference_url": "",
-            "character_reference_url": "",
-            "image_reference_weight": 0.85,         # Max: 1
-            "style_reference_weight": 0.85          # Max: 1
-        }
-    },
-    # PixArt-Alpha 1024px
-    "pixart-xl-2": {
-        "model_id": "lucataco/pixart-xl-2:816c99673841b9448bc2539834c16d40e0315bbf92fef0317b57a226727409bb",
-        "input": {
-            "prompt": prompt,
-            "guidance_scale": 4.5,                  # Default: 4.5, 1-50
-            "num_inference_steps": 14,              # Default 14, 1-100
-            "style": pixart_style,
-            "width": width,
-            "height": height,            
-            "scheduler": scheduler,
-            "num_outputs": num_outputs            
-        }
-    },
-    "playground-v2.5-1024px-aesthetic": {
-        "model_id": "playgroundai/playground-v2.5-1024px-aesthetic:a45f82a1382bed5c7aeb861dac7c7d191b0fdf74d8d57c4a0e6ed7d4d0bf7d24",
-        "input": {
-            "width": width,
-            "height": height,
-            "prompt": prompt,
-            "scheduler": scheduler,                 # Default: "DPMSolver++" "DPM++2MKarras"
-            "num_outputs": num_outputs,
-            "guidance_scale": 3,                    # Default 3, 0.1-20
-            "apply_watermark": apply_watermark,
-            "negative_prompt": negative_prompt,
-            "prompt_strength": prompt_strength,
-            "num_inference_steps": 25,
-            "disable_safety_checker": disable_safety_checker
-        }
-    },
-    "realvisxl-v3-multi-controlnet-lora": {
-        "model_id": "fofr/realvisxl-v3-multi-controlnet-lora:90a4a3604cd637cb9f1a2bdae1cfa9ed869362ca028814cdce310a78e27daade",
-        "input": {
-            "prompt": prompt,
-            "negative_prompt": negative_prompt,
-            "seed": seed,
-            "width": width,
-            "height": width,
-            # "image": reference_image,
-            "refine": "no_refiner",                           # Default: "no_refiner" "base_image_refiner"
-            "scheduler": scheduler,                     # Default: "K_EULER"
-            "lora_scale": 0.6,                          # Default: 0.6, Max: 1
-            "num_outputs": num_outputs,
-            # "controlnet_1": "none",
-            # "controlnet_1_image": reference_image,
-            # "controlnet_1_conditioning_scale": 0.8,
-            # "controlnet_1_start": 0,
-            # "controlnet_1_end": 1,            
-            # "controlnet_2": "none",
-            # "controlnet_2_image": "",
-            # "controlnet_2_conditioning_scale": 0.8,
-            # "controlnet_2_start": 0,
-            # "controlnet_2_end": 1,
-            # "controlnet_3": "none",
-            # "controlnet_3_image": "",
-            # "controlnet_3_conditioning_scale": 0.8,
-            # "controlnet_3_start": 0,
-            # "controlnet_3_end": 1,
-            "guidance_scale": 7.5,
-            "apply_watermark": apply_watermark,
-            "prompt_strength": prompt_strength,             # Default 0.8, 0-1
-            "sizing_strategy": "width_height",
-            "num_inference_steps": 30                       # Default 30, 1-500            
-        }
-    },
-    # model_variants: "1600M-1024px" "1600M-1024px-multilang" "1600M-512px" "600M-1024px-multilang" "600M-512px-multilang"
-    # 1600M variants are slower but produce higc c  her quality than 600M, 1024px variants are optimized for 1024x1024px images
-    # 512px variants are optimized for 512x512px images, 'multilang' variants can be prompted in both English and Chinese
-    "sana": {
-        "model_id": "nvidia/sana:c6b5d2b7459910fec94432e9e1203c3cdce92d6db20f714f1355747990b52fa6",
-        "input": {
-            "prompt": prompt,
-            "negative_prompt": negative_prompt,
-            "guidance_scale": 5,                    # Default: 5, 1-20      
-            "pag_guidance_scale": 2,                # Default: 2, 1-20
-            "num_inference_steps": 24,              # Default: 18
-            "model_variant": "1600M-1024px",        # Default: "1600M-1024px"
-            "width": width,                         # Default: 1024, 1-4096
-            "height": height                        # Default: 1024, 1-4096
-        }
-    },
-    "stable-diffusion": {
-        "model_id": "stability-ai/stable-diffusion:ac732df83cea7fff18b8472768c88ad041fa750ff7682a21affe81863cbe77e4",
-        "input": {
-            "width": width,
-            "height": height,
-            "prompt": prompt,
-            "negative_prompt": negative_prompt,
-            "scheduler": scheduler,
-            "num_outputs": num_outputs,
-            "guidance_scale": 7.5,                  # Default 7.5, 1-20
-            "num_inference_steps": 50               # Default 50, 1-500
-        }
-    },
-    "stable-diffusion-3": {
-        "model_id": "stability-ai/stable-diffusion-3",
-        "input": {
-            "cfg": 3.5,                             # Default: 3.5, 1-20
-            "steps": 28,                            # Default: 28, 1-28
-            "prompt": prompt,
-            "aspect_ratio": aspect_ratio,
-            "output_format": output_format,
-            "output_quality": output_quality,
-            "negative_prompt": negative_prompt,
-            "prompt_strength": prompt_strength      # Default 0.85, 0-1
-        }
-    },
-    "sdxl": {
-        "model_id": "stability-ai/sdxl:7762fd07cf82c948538e41f63f77d685e02b063e37e496e96eefd46c929f9bdc",
-        "input": {
-            # "seed": seed,    
-            # "mask": mask,    
-            "prompt": prompt,
-            "negative_prompt": negative_prompt,
-            "prompt_strength": prompt_strength,                 # Default: 0.8, 0-1
-            "guidance_scale": 7.5,                  # Default: 7.5, 1-50
-            "high_noise_frac": 0.8,                 # 0-1, For expert_ensemble_refiner, the fraction of noise to use
-            "num_inference_steps": 25,              # Max: 500
-            "refine": "expert_ensemble_refiner",    # Default: "expert_ensemble_refiner" "no_refiner" "base_image_refiner"
-            "scheduler": scheduler,
-            "lora_scale": 0.6,                      # Max: 1
-            "num_outputs": num_outputs,
-            "width": 1024,
-            "height": 1024,
-            "apply_watermark": apply_watermark
-        }
-    },
-    "stable-diffusion-3.5-medium": {
-        "model_id": "stability-ai/stable-diffusion-3.5-medium",
-        "input": {
-            # "seed": seed,
-            "cfg": 5,                               # Default 5, 1-20
-            "steps": 40,                            # Default 40, 1-50
-            "prompt": prompt,
-            "aspect_ratio": aspect_ratio,
-            "output_format": output_format,
-            "output_quality": output_quality,
-            "prompt_strength": prompt_strength                 # Default 0.85, 0-1
-        }
-    },
-    "stable-diffusion-3.5-large-turbo": {
-        "model_id": "stability-ai/stable-diffusion-3.5-large-turbo",
-        "input": {
-            # "seed": seed,
-            "cfg": 1,                               # Default 1, 1-20
-            "steps": 4,                            # Default 4, 1-10
-            "prompt": prompt,
-            "aspect_ratio": aspect_ratio,
-            "output_format": output_format,
-            "output_quality": output_quality,
-            "prompt_strength": prompt_strength                 # Default 0.85, 0-1
-        }
-    },
-    "sticker-maker": {
-        "model_id": "fofr/sticker-maker:4acb778eb059772225ec213948f0660867b2e03f277448f18cf1800b96a65a1a",
-        "input": {
-            "prompt": prompt,
-            "negative_prompt": negative_prompt,
-            "steps": 17,                            # Default: 17
-            "width": 1152,                          # Default: 1152
-            "height": 1152,                         # Default: 1152
-            "output_format": output_format,
-            "output_quality": output_quality,                  # Default 90, 1-100
-            "number_of_images": num_outputs
-        }
+def shared_settings():
+    """The settings above as model input; each model takes the ones it accepts."""
+    settings = {
+        "prompt": prompt,
+        "negative_prompt": negative_prompt,
+        "scheduler": scheduler,
+        "style": pixart_style,
+        "prompt_strength": prompt_strength,
+        "aspect_ratio": aspect_ratio,
+        "width": width,
+        "height": height,
+        "num_outputs": num_outputs,
+        "output_format": output_format,
+        "output_quality": output_quality,
+        "apply_watermark": apply_watermark,
+        "disable_safety_checker": disable_safety_checker
     }
-}
+    if seed >= 0:
+        settings["seed"] = seed
+    return settings
+
+
+def model_input(model, overrides):
+    """Values pinned per model in models.json (e.g. sticker-maker's 1152px size) beat the shared
+    settings, a job's own overrides beat both, and models.json defaults fill in the rest."""
+    data = {k: v for k, v in shared_settings().items() if k not in model.defaults}
+    data.update(overrides)
+    return model.build_input(data, apply_defaults=True)
+
+
+def read_jobs(path):
+    with open(path, newline='') as f:
+        if path.lower().endswith('.csv'):
+            # A blank cell leaves that setting as it is.
+            return [{k: v for k, v in row.items() if v != ''} for row in csv.DictReader(f)]
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def prepare_jobs(rows, default_model):
+    """Validate every job up front; returns (jobs, errors) so a bad row fails before anything is paid for."""
+    registry = load_registry()
+    jobs = []
+    errors = []
+    repeats = {}
+    for number, row in enumerate(rows, 1):
+        row = dict(row)
+        job_model = row.pop('model', None) or default_model
+        job_id = row.pop('id', None)
+        overrides = {**(row.pop('overrides', None) or {}), **row}
+        if job_model not in registry:
+            errors.append(f"job {number}: unknown model {job_model!r}" if job_model
+                          else f"job {number}: no model (set model_name or pass --model)")
+            continue
+        try:
+            job_input = model_input(registry[job_model], overrides)
+        except ValidationError as e:
+            errors.append(f"job {number}: {e}")
+            continue
+        if not job_id:
+            # Identical rows are separate jobs (e.g. unseeded repeats), so repeats are numbered.
+            canonical = json.dumps([job_model, job_input], sort_keys=True, default=str)
+            digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+            repeats[digest] = repeats.get(digest, 0) + 1
+            job_id = f"{digest}-{repeats[digest]}"
+        jobs.append({"id": str(job_id), "model": job_model, "input": job_input})
+    return jobs, errors
+
+
+def finished_jobs(manifest_path):
+    """Ids of the jobs a manifest records as succeeded."""
+    finished = set()
+    if manifest_path and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by an interrupted run
+                if entry.get("status") == "succeeded":
+                    finished.add(entry["id"])
+    return finished
+
 
-# Run the selected model
-output = replicate.run(model_params[model_name]["model_id"], input=model_params[model_name]["input"])
+def open_manifest(manifest_path):
+    """Open the manifest for appending, first ending a line that an interrupted run cut short."""
+    manifest = open(manifest_path, "a")
+    if manifest.tell():
+        with open(manifest_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                manifest.write("\n")
+    return manifest
 
-# File naming logic
-existing_files = [f for f in os.listdir('.') if f.startswith('output_') and f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp', '.gif', '.bmp', '.tiff'))]
-existing_count = len(existing_files)
 
-print(output)
-# Save the output based on model type
-if model_name in ["sana", "photon-flash", "photon", "flux-1.1-pro", "flux-1.1-pro-ultra"]:
-    output = str(output)  # Ensure it's a string URL
+def file_extension(job, ref):
+    url = ref if isinstance(ref, str) else getattr(ref, "url", "") or ""
+    extension = os.path.splitext(urlparse(url).path)[1]
+    if extension:
+        return extension
+    if job["model"] == "latent-consistency-model":
+        return ".jpg"
+    return f".{job['input'].get('output_format', output_format)}"
+
+
+def download(ref, path):
+    """Stream one output (a URL or a file-like output) to path through a temp file,
+    so an interrupted run never leaves a partial image behind."""
+    url = ref if isinstance(ref, str) else getattr(ref, "url", None)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.download-')
     try:
-        # Parse the URL to get the file extension
-        parsed_url = urlparse(output)
-        file_extension = os.path.splitext(parsed_url.path)[1]
-        
-        # Use the correct file extension for the filename
-        filename = f"output_{existing_count + 1}_{model_name}{file_extension}"
-        urllib.request.urlretrieve(output, filename)
-        print(f"Saved image from URL as {filename}")
-    except urllib.error.HTTPError as e:
-        print(f"HTTP Error for URL download: {e.code} - {e.reason}")
-    except urllib.error.URLError as e:
-        print(f"URL Error for URL download: {e.reason}")
-    except Exception as e:
-        print(f"Unexpected error for URL download: {e}")
-else:
+        with os.fdopen(fd, "wb") as file:
+            if url and url.startswith(("http://", "https://")):
+                with urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+                    shutil.copyfileobj(response, file, DOWNLOAD_CHUNK_SIZE)
+            else:
+                file.write(ref.read())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return path
+
+
+def run_jobs(jobs, workers, output_dir=".", manifest_path=None):
+    """Run predictions `workers` at a time and download every output in parallel as it arrives.
+
+    Each job is appended to the manifest once its downloads finish; returns the number that failed.
+    """
+    registry = load_registry()
+    os.makedirs(output_dir, exist_ok=True)
+    # File naming logic: numbers come from a persistent counter, seeded once from the existing output_ files
+    filename_sequence = FilenameSequence(output_dir, os.path.join(output_dir, ".output_sequence.db"))
+    predictions = Scheduler(workers, REPLICATE_RATE_PER_MINUTE, REPLICATE_BURST,
+                            retry_on=lambda e: isinstance(e, ReplicateError) and e.status == 429)
+    download_executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="download")
+    manifest = open_manifest(manifest_path) if manifest_path else None
+    counts = {"succeeded": 0, "failed": 0}
+    started = time.monotonic()
+
+    def finish(job, status, error=None):
+        counts[status] += 1
+        entry = {"id": job["id"], "model": job["model"], "status": status, "input": job["input"],
+                 "files": job.get("files", []), "error": error,
+                 "seconds": round(time.monotonic() - job["started"], 2), "finished_at": time.time()}
+        print(f"[{counts['succeeded'] + counts['failed']}/{len(jobs)}] {job['id']} {job['model']}: "
+              f"{status}{f' ({error})' if error else ''}")
+        if manifest:
+            manifest.write(json.dumps(entry, default=str) + "\n")
+            manifest.flush()
+
+    # future -> (job, filename); filename is None for the prediction itself.
+    pending = {}
+    for job in jobs:
+        job["started"] = time.monotonic()
+        future = predictions.submit(replicate.run, registry[job["model"]].model_id, input=job["input"], key=job["model"])
+        pending[future] = (job, None)
     try:
-        for index, item in enumerate(output):
-            file_extension = ".jpg" if model_name == "latent-consistency-model" else f".{output_format}"
-            filename = f"output_{existing_count + index + 1}_{model_name}{file_extension}"
-            with open(filename, "wb") as file:
-                file.write(item.read())
-            print(f"Saved image as {filename}")
-        # Update existing_count after the loop to reflect new files for the next run
-        existing_count += len(output)
-    except Exception as e:
-        print(f"Failed to write image data: {e}")
\ No newline at end of file
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, filename = pending.pop(future)
+                error = future.exception()
+                if filename is None:
+                    if error:
+                        finish(job, "failed", str(error).replace("\n", " "))
+                        continue
+                    output = future.result()
+                    print(output)
+                    # url models return one output, the others a list of them.
+                    refs = list(output) if isinstance(output, (list, tuple)) else [output]
+                    if not refs:
+                        finish(job, "failed", "no output")
+                        continue
+                    first_number = filename_sequence.allocate(len(refs))
+                    job.update(files=[], errors=[], remaining=len(refs))
+                    for index, ref in enumerate(refs):
+                        name = f"output_{first_number + index}_{job['model']}{file_extension(job, ref)}"
+                        pending[download_executor.submit(download, ref, os.path.join(output_dir, name))] = (job, name)
+                    continue
+                job["remaining"] -= 1
+                if error:
+                    job["errors"].append(f"{filename}: {error}")
+                else:
+                    job["files"].append(filename)
+                    print(f"Saved image as {filename}")
+                if job["remaining"] == 0:
+                    if job["errors"]:
+                        finish(job, "failed", "; ".join(job["errors"]))
+                    else:
+                        finish(job, "succeeded")
+    finally:
+        download_executor.shutdown(wait=False, cancel_futures=True)
+        if manifest:
+            manifest.close()
+    if len(jobs) > 1:
+        print(f"{counts['succeeded']} succeeded, {counts['failed']} failed in {time.monotonic() - started:.1f}s")
+    return counts["failed"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate images on Replicate: one prompt, or a batch of jobs.")
+    parser.add_argument("--model", default=model_name, help="model for the prompt and for jobs that do not name one")
+    parser.add_argument("--prompt", default=prompt)
+    parser.add_argument("--jobs", help=".jsonl or .csv file of jobs (prompt, model, parameter overrides, optional id)")
+    parser.add_argument("--workers", type=int, default=4, help="predictions to run at once (default 4)")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--manifest", help="JSONL record of finished jobs (default: <jobs file>.manifest.jsonl); "
+                                           "jobs it lists as succeeded are skipped")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.jobs:
+        rows = read_jobs(args.jobs)
+        manifest_path = args.manifest or os.path.splitext(args.jobs)[0] + ".manifest.jsonl"
+    else:
+        rows = [{"prompt": args.prompt}]
+        manifest_path = args.manifest
+    jobs, errors = prepare_jobs(rows, args.model)
+    if errors:
+        parser.error("invalid jobs:\n" + "\n".join(errors))
+
+    finished = finished_jobs(manifest_path)
+    remaining = [job for job in jobs if job["id"] not in finished]
+    if len(remaining) < len(jobs):
+        print(f"Skipping {len(jobs) - len(remaining)} jobs already finished in {manifest_path}")
+    sys.exit(1 if run_jobs(remaining, args.workers, args.output_dir, manifest_path) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Replicate model registry shared by backend/app.py and main.py.
+
+Every model is declared once in models.json: its Replicate id, whether it
+returns a URL or files, an optional per-model rate limit (rate_per_minute),
+and a typed schema for each input (int/float/bool/string, min/max, allowed
+options, default). load_registry() compiles each schema into a validator
+once, so bad requests are rejected locally instead of after a paid API
+round trip.
+"""
+import functools
+import json
+import os
+
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models.json')
+
+TRUE_STRINGS = {'true', '1', 'yes', 'on'}
+FALSE_STRINGS = {'false', '0', 'no', 'off'}
+
+
+class ValidationError(ValueError):
+    def __init__(self, model_name, errors):
+        self.errors = errors
+        super().__init__(f"Invalid parameters for {model_name}: {'; '.join(errors)}")
+
+
+def to_int(value):
+    if isinstance(value, bool):
+        raise ValueError("must be an integer")
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError("must be an integer")
+        return int(value)
+    if isinstance(value, str):
+        value = value.strip()
+    return int(value)
+
+
+def to_float(value):
+    if isinstance(value, bool):
+        raise ValueError("must be a number")
+    return float(value)
+
+
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in TRUE_STRINGS | FALSE_STRINGS:
+        return value.strip().lower() in TRUE_STRINGS
+    raise ValueError("must be true or false")
+
+
+def to_string(value):
+    if isinstance(value, (dict, list)):
+        raise ValueError("must be a string")
+    return str(value)
+
+
+CONVERTERS = {'int': to_int, 'float': to_float, 'bool': to_bool, 'string': to_string}
+
+
+def compile_param(spec):
+    """Build a function that coerces one value to the declared type and checks its range and options."""
+    convert = CONVERTERS[spec['type']]
+    options = frozenset(convert(option) for option in spec['options']) if 'options' in spec else None
+    low = spec.get('min')
+    high = spec.get('max')
+    choices = ', '.join(str(option) for option in spec.get('options', []))
+
+    def validate(value):
+        try:
+            value = convert(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"must be of type {spec['type']}")
+        if options is not None and value not in options:
+            raise ValueError(f"must be one of {choices}")
+        if low is not None and value < low:
+            raise ValueError(f"must be at least {low}")
+        if high is not None and value > high:
+            raise ValueError(f"must be at most {high}")
+        return value
+
+    return validate
+
+
+class ModelSpec:
+    def __init__(self, name, config):
+        self.name = name
+        self.model_id = config['model_id']
+        self.output = config.get('output', 'files')
+        self.aliases = config.get('aliases', {})
+        self.trigger_word = config.get('trigger_word')
+        self.rate_per_minute = config.get('rate_per_minute')
+        self.params = config['params']
+        self.validators = {key: compile_param(spec) for key, spec in self.params.items()}
+        self.required = [key for key, spec in self.params.items() if spec.get('required')]
+        self.defaults = {key: self.validators[key](spec['default'])
+                         for key, spec in self.params.items() if 'default' in spec}
+
+    def free_text(self, key):
+        spec = self.params[key]
+        return spec['type'] == 'string' and 'options' not in spec
+
+    def build_input(self, data, apply_defaults=False, add_trigger_word=False):
+        """Validated Replicate input from request data; unknown keys and None are ignored.
+
+        An empty string is passed through to free-text string params (an empty
+        negative_prompt, say) and means "not set" for every other param, as a
+        blank form field or CSV cell does. The model's trigger word is put in
+        front of the prompt only when add_trigger_word is set.
+
+        Raises ValidationError listing every bad or missing parameter.
+        """
+        values = dict(self.defaults) if apply_defaults else {}
+        errors = []
+        for key, value in data.items():
+            key = self.aliases.get(key, key)
+            validate = self.validators.get(key)
+            if validate is None or value is None:
+                continue
+            if value == '' and not self.free_text(key):
+                continue
+            try:
+                values[key] = validate(value)
+            except ValueError as e:
+                errors.append(f"{key} {e}")
+        errors.extend(f"{key} is required" for key in self.required if key not in values)
+        if errors:
+            raise ValidationError(self.name, errors)
+        if add_trigger_word and self.trigger_word and self.trigger_word not in values['prompt'].lower():
+            values['prompt'] = f"{self.trigger_word}, {values['prompt']}"
+        return values
+
+
+@functools.lru_cache(maxsize=None)
+def load_registry(path=REGISTRY_PATH):
+    with open(path) as f:
+        return {name: ModelSpec(name, config) for name, config in json.load(f).items()}
@@ -0,0 +1,213 @@
+"""Rate-limited, prioritised scheduler for Replicate predictions.
+
+Calls are queued with a priority (lower runs first) and a key, normally the
+model name. A call is dispatched only when a worker is free and both the
+account-wide token bucket and the bucket for its key have a token, so bursts
+are smoothed to the provider's limit instead of being rejected by it. Calls
+that still fail with a rate-limit error are put back in the queue with an
+exponential backoff, and the buckets are drained so the rest of the queue
+slows down with them.
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+WAIT_SAMPLES = 1000
+
+
+class TokenBucket:
+    """Allows `rate_per_minute` calls on average with bursts of up to `burst`. Not thread-safe on its own."""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate_per_minute = rate_per_minute
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        """Seconds until a token is available."""
+        self.refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def drain(self, now):
+        self.refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class ScheduledCall:
+    def __init__(self, fn, args, kwargs, key, priority, seq):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.priority = priority
+        self.seq = seq
+        self.future = Future()
+        self.submitted = time.monotonic()
+        self.not_before = 0.0
+        self.attempts = 0
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class Scheduler:
+    def __init__(self, workers, rate_per_minute, burst, key_rates=None, default_key_rate=None,
+                 retry_on=None, max_retries=5, backoff=2.0, max_backoff=60.0):
+        self.workers = workers
+        self.burst = burst
+        self.account = TokenBucket(rate_per_minute, burst)
+        self.key_rates = key_rates or {}
+        self.default_key_rate = default_key_rate
+        self.buckets = {}
+        self.retry_on = retry_on or (lambda e: False)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.queue = []
+        self.sequence = itertools.count()
+        self.running = 0
+        self.condition = threading.Condition()
+        self.counts = {'submitted': 0, 'completed': 0, 'failed': 0, 'rate_limited': 0, 'retried': 0,
+                       'cancelled': 0}
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.executor = None
+        self.dispatcher = None
+
+    def bucket(self, key):
+        """Token bucket for a key, or None when the key only has the account limit."""
+        if key not in self.buckets:
+            rate = self.key_rates.get(key, self.default_key_rate)
+            self.buckets[key] = TokenBucket(rate, self.burst) if rate else None
+        return self.buckets[key]
+
+    def submit(self, fn, *args, key=None, priority=0, **kwargs):
+        """Queue fn(*args, **kwargs) and return a Future for its result."""
+        with self.condition:
+            if self.dispatcher is None:
+                # Started lazily so importing the module (e.g. in a spawned worker process) starts no threads.
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='replicate')
+                self.dispatcher = threading.Thread(target=self.dispatch_loop, name='replicate-scheduler', daemon=True)
+                self.dispatcher.start()
+            call = ScheduledCall(fn, args, kwargs, key, priority, next(self.sequence))
+            heapq.heappush(self.queue, call)
+            self.counts['submitted'] += 1
+            self.condition.notify_all()
+        return call.future
+
+    def next_call(self, now):
+        """Pop the highest-priority call that may run now; otherwise return (None, seconds to wait)."""
+        wait = self.account.delay(now)
+        if wait > 0:
+            return None, wait
+        wait = None
+        for call in sorted(self.queue):
+            if call.future.cancelled():
+                self.queue.remove(call)
+                self.counts['cancelled'] += 1
+                continue
+            bucket = self.bucket(call.key)
+            delay = max(call.not_before - now, bucket.delay(now) if bucket else 0.0)
+            if delay <= 0:
+                self.queue.remove(call)
+                heapq.heapify(self.queue)
+                return call, None
+            wait = delay if wait is None else min(wait, delay)
+        heapq.heapify(self.queue)
+        return None, wait
+
+    def dispatch_loop(self):
+        with self.condition:
+            while True:
+                wait = None
+                if self.queue and self.running < self.workers:
+                    now = time.monotonic()
+                    call, wait = self.next_call(now)
+                    if call is not None:
+                        self.account.take()
+                        bucket = self.bucket(call.key)
+                        if bucket:
+                            bucket.take()
+                        call.attempts += 1
+                        self.running += 1
+                        self.waits.append(now - call.submitted)
+                        self.executor.submit(self.run, call)
+                        continue
+                self.condition.wait(wait)
+
+    def run(self, call):
+        if call.attempts == 1 and not call.future.set_running_or_notify_cancel():
+            with self.condition:
+                self.running -= 1
+                self.counts['cancelled'] += 1
+                self.condition.notify_all()
+            return
+        try:
+            result = call.fn(*call.args, **call.kwargs)
+        except Exception as e:
+            with self.condition:
+                self.running -= 1
+                limited = self.retry_on(e)
+                if limited:
+                    self.counts['rate_limited'] += 1
+                if limited and call.attempts <= self.max_retries:
+                    self.counts['retried'] += 1
+                    now = time.monotonic()
+                    delay = min(self.max_backoff, self.backoff * 2 ** (call.attempts - 1))
+                    call.not_before = now + delay * random.uniform(0.5, 1.0)
+                    self.account.drain(now)
+                    bucket = self.bucket(call.key)
+                    if bucket:
+                        bucket.drain(now)
+                    heapq.heappush(self.queue, call)
+                    self.condition.notify_all()
+                    return
+                self.counts['failed'] += 1
+                self.condition.notify_all()
+            call.future.set_exception(e)
+            return
+        with self.condition:
+            self.running -= 1
+            self.counts['completed'] += 1
+            self.condition.notify_all()
+        call.future.set_result(result)
+
+    def stats(self):
+        with self.condition:
+            now = time.monotonic()
+            queued_by_key = {}
+            for call in self.queue:
+                queued_by_key[call.key] = queued_by_key.get(call.key, 0) + 1
+            waits = sorted(self.waits)
+            buckets = {}
+            for key, bucket in [('account', self.account), *self.buckets.items()]:
+                if bucket:
+                    bucket.refill(now)
+                    buckets[key] = {'rate_per_minute': bucket.rate_per_minute, 'tokens': round(max(bucket.tokens, 0), 2)}
+            return {
+                **self.counts,
+                'queued': len(self.queue),
+                'queued_by_key': queued_by_key,
+                'running': self.running,
+                'workers': self.workers,
+                'wait_seconds': {
+                    'samples': len(waits),
+                    'mean': round(sum(waits) / len(waits), 3) if waits else 0.0,
+                    'p50': round(waits[len(waits) // 2], 3) if waits else 0.0,
+                    'p95': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+                    'max': round(waits[-1], 3) if waits else 0.0,
+                },
+                'buckets': buckets,
+            }
@@ -0,0 +1,46 @@
+"""Race-free allocator for the output_NNNN_<model> image filenames.
+
+The next number lives in a small SQLite database, so allocating one is a single
+locked read-modify-write instead of a listdir over the whole archive. The
+counter is seeded from the highest number already in the directory the first
+time it is used. Safe across threads and processes sharing the same db_path.
+"""
+import os
+import re
+import sqlite3
+
+OUTPUT_NUMBER = re.compile(r'^output_(\d+)_')
+
+
+class FilenameSequence:
+    def __init__(self, directory, db_path):
+        self.directory = directory
+        self.db_path = db_path
+
+    def highest_existing(self):
+        highest = 0
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                match = OUTPUT_NUMBER.match(entry.name)
+                if match:
+                    highest = max(highest, int(match.group(1)))
+        return highest
+
+    def allocate(self, count=1):
+        """Reserve `count` consecutive numbers and return the first one."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)')
+            # BEGIN IMMEDIATE takes the write lock up front, so two allocators cannot read the same value.
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("SELECT value FROM counters WHERE name = 'output'").fetchone()
+            last = row[0] if row else self.highest_existing()
+            conn.execute("INSERT OR REPLACE INTO counters (name, value) VALUES ('output', ?)", (last + count,))
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return last + 1
@@ -0,0 +1,19 @@
+"""Imports the backend once, pointed at a throwaway directory instead of the real gallery and databases.
+
+Test modules import `backend` from here so they all share one configuration.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix='replicate-tests-')
+atexit.register(shutil.rmtree, TEST_DIR, ignore_errors=True)
+for name, path in {'JOBS_DB': 'jobs.db', 'SEQUENCE_DB': 'sequence.db', 'IMAGES_DB': 'images.db',
+                   'SAVE_DIR': 'saved_images/', 'OBJECT_DIR': 'objects', 'VARIANT_DIR': 'variants'}.items():
+    os.environ[name] = os.path.join(TEST_DIR, path)
+os.makedirs(os.environ['SAVE_DIR'])
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+import app as backend  # noqa: E402,F401
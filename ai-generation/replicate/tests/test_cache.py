@@ -0,0 +1,134 @@
+"""The prediction result cache: LRU and TTL eviction, and caching only requests that carry a seed."""
+import time
+import unittest
+from unittest import mock
+
+from backend_env import backend
+from test_jobs import MODEL, OUTPUT_URL, FakeReplicate
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(backend.time, 'monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = backend.ResultCache(ttl=60, max_entries=2)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.put('a', {'url': 'a'})
+        self.cache.put('b', {'url': 'b'})
+        self.assertEqual(self.cache.get('a'), {'url': 'a'})
+        self.cache.put('c', {'url': 'c'})
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), {'url': 'a'})
+        self.assertEqual(self.cache.get('c'), {'url': 'c'})
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_entries_expire_after_the_ttl(self):
+        self.cache.put('a', {'url': 'a'})
+        self.clock.now += 59
+        self.assertEqual(self.cache.get('a'), {'url': 'a'})
+        self.clock.now += 1
+        self.assertIsNone(self.cache.get('a'))
+        stats = self.cache.stats()
+        self.assertEqual((stats['expirations'], stats['entries']), (1, 0))
+
+    def test_a_hit_does_not_extend_the_ttl(self):
+        self.cache.put('a', {'url': 'a'})
+        self.clock.now += 40
+        self.cache.get('a')
+        self.clock.now += 40
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_putting_again_refreshes_the_entry(self):
+        self.cache.put('a', {'url': 'old'})
+        self.clock.now += 40
+        self.cache.put('a', {'url': 'new'})
+        self.clock.now += 40
+        self.assertEqual(self.cache.get('a'), {'url': 'new'})
+        self.assertEqual(self.cache.stats()['entries'], 1)
+
+    def test_stats(self):
+        self.cache.put('a', {'url': 'a'})
+        self.cache.get('a')
+        self.cache.get('missing')
+        self.cache.bypass()
+        stats = self.cache.stats()
+        self.assertEqual({k: stats[k] for k in ('hits', 'misses', 'bypassed', 'entries', 'max_entries', 'ttl_seconds')},
+                         {'hits': 1, 'misses': 1, 'bypassed': 1, 'entries': 1, 'max_entries': 2, 'ttl_seconds': 60})
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+
+class CachedGenerationTest(unittest.TestCase):
+    def setUp(self):
+        self.client = backend.app.test_client()
+        self.fake = FakeReplicate()
+        for name, value in {'replicate_client': self.fake, 'result_cache': backend.ResultCache(60, 8)}.items():
+            patcher = mock.patch.object(backend, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def generate(self, **params):
+        response = self.client.post('/api/generate', json={'model': MODEL, 'prompt': 'a lighthouse at dusk', **params})
+        self.assertEqual(response.status_code, 202, response.get_data(as_text=True))
+        created = response.get_json()
+        # A cache hit is stored as already succeeded; anything else finishes on the scheduler.
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            job = self.client.get(created['status_url']).get_json()
+            if job['status'] in ('succeeded', 'failed'):
+                return created['status'], job
+            time.sleep(0.02)
+        self.fail("job never finished")
+
+    def test_seeded_repeat_is_served_from_the_cache(self):
+        first_status, first = self.generate(seed=7)
+        second_status, second = self.generate(seed=7)
+        self.assertEqual((first_status, second_status), ('queued', 'succeeded'))
+        self.assertEqual(first['result'], {'url': OUTPUT_URL})
+        self.assertEqual(second['result'], {'url': OUTPUT_URL, 'cached': True})
+        self.assertEqual(len(self.fake.calls), 1)
+        stats = self.client.get('/api/cache/stats').get_json()
+        self.assertEqual((stats['hits'], stats['entries']), (1, 1))
+
+    def test_different_input_is_a_different_entry(self):
+        self.generate(seed=7)
+        self.generate(seed=8)
+        self.generate(seed=7, prompt='a lighthouse at dawn')
+        self.assertEqual(len(self.fake.calls), 3)
+
+    def test_unseeded_requests_are_never_cached(self):
+        for _ in range(2):
+            status, job = self.generate()
+            self.assertEqual(status, 'queued')
+            self.assertEqual(job['result'], {'url': OUTPUT_URL})
+        self.assertEqual(len(self.fake.calls), 2)
+        stats = self.client.get('/api/cache/stats').get_json()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (0, 0, 0))
+
+    def test_bypass_cache_runs_the_prediction_again(self):
+        self.generate(seed=7)
+        status, job = self.generate(seed=7, bypass_cache=True)
+        self.assertEqual(status, 'queued')
+        self.assertNotIn('cached', job['result'])
+        self.assertEqual(len(self.fake.calls), 2)
+        self.assertEqual(self.client.get('/api/cache/stats').get_json()['bypassed'], 1)
+
+    def test_failed_prediction_is_not_cached(self):
+        self.fake.errors = [RuntimeError("out of memory")]
+        self.assertEqual(self.generate(seed=7)[1]['status'], 'failed')
+        self.assertEqual(self.generate(seed=7)[1]['status'], 'succeeded')
+        self.assertEqual(len(self.fake.calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
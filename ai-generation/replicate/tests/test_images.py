@@ -0,0 +1,96 @@
+"""Serving ?size= variants of saved images: the original until the variant is rendered, never waiting on a render."""
+import os
+import tempfile
+import unittest
+from concurrent.futures import Future
+
+from PIL import Image
+
+import image_store
+from backend_env import TEST_DIR, backend
+
+
+class FakePool:
+    """Records submissions and hands back Futures the test completes itself."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.submitted.append((fn, args, future))
+        return future
+
+
+class ServeImageTest(unittest.TestCase):
+    def setUp(self):
+        self.client = backend.app.test_client()
+        number = len(os.listdir(backend.SAVE_DIR)) + 1
+        self.filename = f'output_{number}_test.png'
+        fd, source = tempfile.mkstemp(suffix='.png', dir=TEST_DIR)
+        os.close(fd)
+        # A distinct colour per test, so no test finds variants rendered by another.
+        Image.new('RGB', (640, 480), (200, 80, number)).save(source)
+        self.sha256 = image_store.file_sha256(source)
+        backend.image_store.add(source, self.sha256, self.filename, {'model': 'test'})
+        with open(os.path.join(backend.SAVE_DIR, self.filename), 'rb') as f:
+            self.original = f.read()
+        self.patched = []
+
+    def tearDown(self):
+        for name, value in reversed(self.patched):
+            setattr(backend, name, value)
+
+    def patch(self, name, value):
+        self.patched.append((name, getattr(backend, name)))
+        setattr(backend, name, value)
+
+    def get(self, size):
+        return self.client.get(f'/images/saved_images/{self.filename}?size={size}')
+
+    def assert_original(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.original)
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        response.close()
+
+    def test_variant_is_rendered_in_the_background(self):
+        renders = []
+        render_variants = backend.render_variants
+        self.patch('render_variants', lambda *args: renders.append(render_variants(*args)) or renders[-1])
+        self.assert_original(self.get('thumb'))
+        renders[0].result(timeout=60)
+
+        response = self.get('thumb')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/webp')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertLess(len(response.data), len(self.original))
+        response.close()
+
+    def test_failed_render_serves_the_original(self):
+        failed = Future()
+        failed.set_exception(OSError("cannot identify image file"))
+        self.patch('render_variants', lambda sha256, object_path: failed)
+        self.assert_original(self.get('medium'))
+
+    def test_requests_never_wait_for_a_render(self):
+        pool = FakePool()
+        self.patch('thumbnail_pool', lambda: pool)
+        for _ in range(3):
+            self.assert_original(self.get('thumb'))
+        self.assertEqual(len(pool.submitted), 1, "each request started a render")
+        self.assertIn(self.sha256, backend.variant_renders)
+
+        fn, args, render = pool.submitted[0]
+        self.assertIs(fn, backend.thumbnails.render_variants, "workers run thumbnails.py, not the backend")
+        fn(*args)
+        render.set_result(None)
+        self.assertNotIn(self.sha256, backend.variant_renders)
+        response = self.get('thumb')
+        self.assertEqual(response.mimetype, 'image/webp')
+        response.close()
+        self.assertEqual(len(pool.submitted), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+"""Generation jobs end to end through the backend, with a fake Replicate client.
+
+backend.replicate_client is swapped for FakeReplicate, so nothing here
+touches the network; backend_env points the backend at a temporary directory.
+"""
+import json
+import threading
+import time
+import unittest
+
+from replicate.exceptions import ReplicateError
+
+from backend_env import backend
+
+MODEL = 'flux-1.1-pro'
+OUTPUT_URL = 'https://replicate.delivery/fake/output.webp'
+
+
+class FakeReplicate:
+    """Stands in for the replicate module: run() records the call, waits for release, then returns or raises."""
+
+    def __init__(self, output=OUTPUT_URL, errors=()):
+        self.output = output
+        self.errors = list(errors)
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def run(self, model_id, input):
+        self.calls.append((model_id, input))
+        if not self.release.wait(timeout=10):
+            raise TimeoutError("FakeReplicate was never released")
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.output
+
+
+class JobsTest(unittest.TestCase):
+    def setUp(self):
+        self.client = backend.app.test_client()
+        self.fake = FakeReplicate()
+        self.original_client = backend.replicate_client
+        backend.replicate_client = self.fake
+
+    def tearDown(self):
+        self.fake.release.set()
+        backend.replicate_client = self.original_client
+
+    def submit(self, **params):
+        response = self.client.post('/api/generate', json={'model': MODEL, 'prompt': 'a lighthouse at dusk', **params})
+        self.assertEqual(response.status_code, 202, response.get_data(as_text=True))
+        return response.get_json()
+
+    def wait_for(self, job_id, statuses=('succeeded', 'failed'), timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.client.get(f'/api/jobs/{job_id}').get_json()
+            if job['status'] in statuses:
+                return job
+            time.sleep(0.02)
+        self.fail(f"job {job_id} never reached {statuses}")
+
+    def test_generate_creates_a_job(self):
+        self.fake.release.clear()
+        created = self.submit()
+        self.assertEqual(created['status'], 'queued')
+        self.assertEqual(created['status_url'], f"/api/jobs/{created['job_id']}")
+        self.assertEqual(created['events_url'], f"/api/jobs/{created['job_id']}/events")
+
+        job = self.client.get(created['status_url']).get_json()
+        self.assertIn(job['status'], ('queued', 'running'))
+        self.assertEqual(job['model'], MODEL)
+        self.assertEqual(job['input'], {'prompt': 'a lighthouse at dusk'})
+        self.assertIsNone(job['result'])
+
+    def test_polling_reports_the_result(self):
+        self.fake.release.clear()
+        created = self.submit()
+        running = self.wait_for(created['job_id'], statuses=('running',))
+        self.assertIsNotNone(running['started_at'])
+
+        self.fake.release.set()
+        job = self.wait_for(created['job_id'])
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['result'], {'url': OUTPUT_URL})
+        self.assertIsNone(job['error'])
+        self.assertGreaterEqual(job['finished_at'], job['started_at'])
+        self.assertEqual(self.fake.calls, [(backend.models[MODEL].model_id, {'prompt': 'a lighthouse at dusk'})])
+
+    def test_event_stream_follows_the_job_until_it_finishes(self):
+        self.fake.release.clear()
+        created = self.submit()
+        response = self.client.get(created['events_url'], buffered=False)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+
+        events = []
+        for chunk in response.response:
+            chunk = chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+            if not chunk.startswith('event: status'):
+                continue
+            events.append(json.loads(chunk.split('data: ', 1)[1]))
+            if len(events) == 1:
+                # The prediction is held until the first event has been seen.
+                self.fake.release.set()
+        response.close()
+
+        statuses = [event['status'] for event in events]
+        self.assertIn(statuses[0], ('queued', 'running'))
+        self.assertEqual(statuses[-1], 'succeeded')
+        self.assertEqual(len(statuses), len(set(statuses)), "each status is sent once")
+        self.assertEqual(events[-1]['result'], {'url': OUTPUT_URL})
+
+    def test_failed_prediction_marks_the_job_failed(self):
+        self.fake.errors = [RuntimeError("model exploded\nwith a traceback")]
+        created = self.submit()
+        job = self.wait_for(created['job_id'])
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], "model exploded with a traceback")
+        self.assertIsNone(job['result'])
+
+    def test_event_stream_ends_on_failure(self):
+        self.fake.errors = [RuntimeError("out of memory")]
+        created = self.submit()
+        self.wait_for(created['job_id'])
+        body = self.client.get(created['events_url']).get_data(as_text=True)
+        last = json.loads(body.strip().split('data: ')[-1])
+        self.assertEqual(last['status'], 'failed')
+        self.assertEqual(last['error'], "out of memory")
+
+    def test_rate_limited_prediction_is_retried(self):
+        backoff = backend.scheduler.backoff
+        backend.scheduler.backoff = 0.01
+        try:
+            self.fake.errors = [ReplicateError(status=429, detail="throttled")]
+            created = self.submit()
+            job = self.wait_for(created['job_id'])
+        finally:
+            backend.scheduler.backoff = backoff
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(len(self.fake.calls), 2)
+
+    def test_invalid_parameters_are_rejected_before_a_job_is_created(self):
+        response = self.client.post('/api/generate', json={'model': MODEL, 'prompt': 'x', 'seed': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['details'], ['seed must be of type int'])
+        response = self.client.post('/api/generate', json={'model': 'no-such-model', 'prompt': 'x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.fake.calls, [])
+
+    def test_unknown_job(self):
+        self.assertEqual(self.client.get('/api/jobs/missing').status_code, 404)
+        self.assertEqual(self.client.get('/api/jobs/missing/events').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
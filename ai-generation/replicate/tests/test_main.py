@@ -0,0 +1,123 @@
+"""main.py batches: a rerun skips the jobs its manifest records as succeeded and runs the rest."""
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+REPLICATE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPLICATE_DIR)
+import main  # noqa: E402
+
+from test_jobs import FakeReplicate  # noqa: E402
+
+MODEL = 'sdxl'
+
+
+class FileOutput:
+    """A file-like prediction output, like replicate's FileOutput without a URL."""
+
+    def read(self):
+        return b'fake image bytes'
+
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='replicate-main-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.output_dir = os.path.join(self.directory, 'out')
+        self.jobs_path = os.path.join(self.directory, 'sweep.jsonl')
+        self.manifest_path = os.path.join(self.directory, 'sweep.manifest.jsonl')
+        self.fake = FakeReplicate(output=[FileOutput()])
+        patcher = mock.patch.object(main, 'replicate', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write_jobs(self, rows):
+        with open(self.jobs_path, 'w') as f:
+            f.writelines(json.dumps(row) + '\n' for row in rows)
+
+    def run_main(self, jobs_path=None):
+        """Run main.py on the jobs file; returns (exit code, printed output)."""
+        out = io.StringIO()
+        argv = ['main.py', '--jobs', jobs_path or self.jobs_path, '--model', MODEL, '--output-dir', self.output_dir]
+        with mock.patch.object(sys, 'argv', argv), contextlib.redirect_stdout(out), \
+                self.assertRaises(SystemExit) as exited:
+            main.main()
+        return exited.exception.code, out.getvalue()
+
+    def manifest(self):
+        with open(self.manifest_path) as f:
+            return [json.loads(line) for line in f]
+
+    def prompts_sent(self):
+        return [model_input['prompt'] for _, model_input in self.fake.calls]
+
+    def test_succeeded_jobs_are_skipped_on_the_next_run(self):
+        self.write_jobs([{'id': 'fox', 'prompt': 'a fox'}, {'id': 'owl', 'prompt': 'an owl'}])
+        self.assertEqual(self.run_main()[0], 0)
+        entries = self.manifest()
+        self.assertEqual(sorted((e['id'], e['status']) for e in entries), [('fox', 'succeeded'), ('owl', 'succeeded')])
+        for entry in entries:
+            self.assertEqual(len(entry['files']), 1)
+            self.assertTrue(os.path.exists(os.path.join(self.output_dir, entry['files'][0])))
+
+        code, printed = self.run_main()
+        self.assertEqual(code, 0)
+        self.assertIn('Skipping 2 jobs already finished', printed)
+        self.assertEqual(len(self.fake.calls), 2)
+        self.assertEqual(len(self.manifest()), 2)
+
+    def test_failed_jobs_are_run_again(self):
+        self.write_jobs([{'id': 'fox', 'prompt': 'a fox'}, {'id': 'owl', 'prompt': 'an owl'}])
+        self.fake.errors = [RuntimeError("out of memory")]
+        self.assertEqual(self.run_main()[0], 1)
+        failed = [e['id'] for e in self.manifest() if e['status'] == 'failed']
+        self.assertEqual(len(failed), 1)
+
+        self.fake.calls.clear()
+        self.assertEqual(self.run_main()[0], 0)
+        self.assertEqual(self.prompts_sent(), ['a fox' if failed == ['fox'] else 'an owl'])
+        self.assertEqual(sorted(e['id'] for e in self.manifest() if e['status'] == 'succeeded'), ['fox', 'owl'])
+
+    def test_jobs_without_an_id_resume_by_content(self):
+        self.write_jobs([{'prompt': 'a fox'}, {'prompt': 'a fox'}, {'prompt': 'an owl', 'seed': 3}])
+        self.run_main()
+        ids = sorted(e['id'] for e in self.manifest())
+        self.assertEqual(len(set(ids)), 3, "identical rows are separate, numbered jobs")
+
+        self.write_jobs([{'prompt': 'a fox'}, {'prompt': 'a fox'}, {'prompt': 'a fox'}, {'prompt': 'an owl', 'seed': 4}])
+        self.fake.calls.clear()
+        self.run_main()
+        self.assertEqual(sorted(self.prompts_sent()), ['a fox', 'an owl'],
+                         "only the third repeat and the changed row are new")
+
+    def test_csv_jobs_resume_and_blank_cells_are_unset(self):
+        csv_path = os.path.join(self.directory, 'sweep.csv')
+        with open(csv_path, 'w', newline='') as f:
+            f.write('id,prompt,seed,scheduler\nfox,a fox,,\nowl,an owl,5,K_EULER\n')
+        self.assertEqual(self.run_main(csv_path)[0], 0)
+        inputs = {model_input['prompt']: model_input for _, model_input in self.fake.calls}
+        self.assertNotIn('seed', inputs['a fox'])
+        self.assertEqual(inputs['an owl']['seed'], 5)
+
+        code, printed = self.run_main(csv_path)
+        self.assertIn('Skipping 2 jobs already finished', printed)
+        self.assertEqual(len(self.fake.calls), 2)
+
+    def test_a_line_cut_short_by_an_interrupted_run_is_ignored(self):
+        self.write_jobs([{'id': 'fox', 'prompt': 'a fox'}, {'id': 'owl', 'prompt': 'an owl'}])
+        with open(self.manifest_path, 'w') as f:
+            f.write(json.dumps({'id': 'fox', 'status': 'succeeded'}) + '\n{"id": "owl", "stat')
+        self.assertEqual(main.finished_jobs(self.manifest_path), {'fox'})
+        self.run_main()
+        self.assertEqual(self.prompts_sent(), ['an owl'])
+        self.assertEqual(main.finished_jobs(self.manifest_path), {'fox', 'owl'})
+
+
+if __name__ == '__main__':
+    unittest.main()
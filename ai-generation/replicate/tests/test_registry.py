@@ -0,0 +1,105 @@
+"""The model registry: type coercion and range checks, aliases, defaults and the trigger word."""
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+REPLICATE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPLICATE_DIR)
+from model_registry import ValidationError, load_registry  # noqa: E402
+
+from backend_env import backend  # noqa: E402
+
+ANIME = 'datacte-flux-synthetic-anime'
+
+
+class ValidationTest(unittest.TestCase):
+    def setUp(self):
+        self.sdxl = load_registry()['sdxl']
+
+    def test_values_are_coerced_to_the_declared_type(self):
+        values = self.sdxl.build_input({'prompt': 'a fox', 'width': '768', 'guidance_scale': '7',
+                                        'num_outputs': 2.0, 'apply_watermark': 'off'})
+        self.assertEqual(values, {'prompt': 'a fox', 'width': 768, 'guidance_scale': 7.0,
+                                  'num_outputs': 2, 'apply_watermark': False})
+        self.assertIsInstance(values['guidance_scale'], float)
+
+    def test_every_problem_is_reported_at_once(self):
+        with self.assertRaises(ValidationError) as caught:
+            self.sdxl.build_input({'width': 4096, 'num_outputs': 1.5, 'scheduler': 'Euler', 'apply_watermark': 'maybe'})
+        self.assertEqual(sorted(caught.exception.errors), [
+            'apply_watermark must be of type bool',
+            'num_outputs must be of type int',
+            'prompt is required',
+            'scheduler must be one of DDIM, DPMSolverMultistep, HeunDiscrete, KarrasDPM, K_EULER_ANCESTRAL, '
+            'K_EULER, PNDM',
+            'width must be at most 2048',
+        ])
+        self.assertIn('Invalid parameters for sdxl', str(caught.exception))
+
+    def test_unknown_keys_and_none_are_ignored(self):
+        self.assertEqual(self.sdxl.build_input({'prompt': 'a fox', 'steps': 9, 'width': None}), {'prompt': 'a fox'})
+
+    def test_empty_string_is_kept_for_free_text_only(self):
+        values = self.sdxl.build_input({'prompt': 'a fox', 'negative_prompt': '', 'width': '', 'scheduler': ''})
+        self.assertEqual(values, {'prompt': 'a fox', 'negative_prompt': ''})
+
+    def test_defaults_fill_in_only_when_asked(self):
+        anime = load_registry()[ANIME]
+        self.assertEqual(anime.build_input({'prompt': 'a fox'}), {'prompt': 'a fox'})
+        values = anime.build_input({'prompt': 'a fox', 'num_inference_steps': 4}, apply_defaults=True)
+        self.assertEqual(values['num_inference_steps'], 4)
+        self.assertEqual(values['lora_scale'], 0.85)
+        self.assertEqual(values['model'], 'dev')
+
+    def test_bad_schema_default_fails_at_load(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump({'broken': {'model_id': 'x/y', 'params': {'steps': {'type': 'int', 'max': 10, 'default': 50}}}}, f)
+        self.addCleanup(os.remove, f.name)
+        with self.assertRaisesRegex(ValueError, 'at most 10'):
+            load_registry(f.name)
+
+
+class AliasTest(unittest.TestCase):
+    def test_alias_is_renamed_and_validated(self):
+        registry = load_registry()
+        self.assertEqual(registry[ANIME].build_input({'prompt': 'a fox', 'model_variant': 'schnell'}),
+                         {'prompt': 'a fox', 'model': 'schnell'})
+        self.assertEqual(registry['pixart-xl-2'].build_input({'prompt': 'a fox', 'pixart_style': 'Anime'})['style'],
+                         'Anime')
+        with self.assertRaises(ValidationError) as caught:
+            registry[ANIME].build_input({'prompt': 'a fox', 'model_variant': 'pro'})
+        self.assertEqual(caught.exception.errors, ['model must be one of dev, schnell'])
+
+    def test_every_alias_points_at_a_declared_param(self):
+        for model in load_registry().values():
+            for alias, target in model.aliases.items():
+                self.assertIn(target, model.params, f"{model.name}: {alias}")
+
+
+class TriggerWordTest(unittest.TestCase):
+    def setUp(self):
+        self.anime = load_registry()[ANIME]
+
+    def test_prompt_is_left_alone_unless_asked(self):
+        self.assertEqual(self.anime.build_input({'prompt': 'a fox'})['prompt'], 'a fox')
+
+    def test_trigger_word_is_prepended_once(self):
+        self.assertEqual(self.anime.build_input({'prompt': 'a fox'}, add_trigger_word=True)['prompt'],
+                         'syntheticanim, a fox')
+        self.assertEqual(self.anime.build_input({'prompt': 'SyntheticAnime fox'}, add_trigger_word=True)['prompt'],
+                         'SyntheticAnime fox')
+
+    def test_models_without_a_trigger_word(self):
+        sdxl = load_registry()['sdxl']
+        self.assertEqual(sdxl.build_input({'prompt': 'a fox'}, add_trigger_word=True)['prompt'], 'a fox')
+
+    def test_backend_adds_it_for_the_variant_picker(self):
+        self.assertEqual(backend.build_input(ANIME, {'prompt': 'a fox', 'model_variant': 'dev'})['prompt'],
+                         'syntheticanim, a fox')
+        self.assertEqual(backend.build_input(ANIME, {'prompt': 'a fox', 'model': ANIME})['prompt'], 'a fox')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+"""The prediction scheduler: token-bucket pacing, priority order and retrying rate-limited calls."""
+import threading
+import time
+import unittest
+
+from replicate.exceptions import ReplicateError
+
+from backend_env import backend
+from test_jobs import OUTPUT_URL, FakeReplicate
+from scheduler import Scheduler, TokenBucket
+
+MODEL_ID = 'owner/model:version'
+
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.bucket = TokenBucket(rate_per_minute=60, burst=3)
+        self.start = self.bucket.updated
+
+    def take(self, count, now):
+        for _ in range(count):
+            self.assertEqual(self.bucket.delay(now), 0.0)
+            self.bucket.take()
+
+    def test_burst_then_the_steady_rate(self):
+        self.take(3, self.start)
+        self.assertAlmostEqual(self.bucket.delay(self.start), 1.0)
+        self.assertAlmostEqual(self.bucket.delay(self.start + 0.25), 0.75)
+        self.take(1, self.start + 1)
+        self.assertAlmostEqual(self.bucket.delay(self.start + 1), 1.0)
+
+    def test_an_idle_bucket_refills_only_to_its_burst(self):
+        self.take(3, self.start)
+        self.take(3, self.start + 3600)
+        self.assertGreater(self.bucket.delay(self.start + 3600), 0)
+
+    def test_drain_empties_the_bucket(self):
+        self.bucket.drain(self.start)
+        self.assertAlmostEqual(self.bucket.delay(self.start), 1.0)
+
+    def test_drain_keeps_a_deficit(self):
+        self.take(3, self.start)
+        self.bucket.take()
+        self.bucket.drain(self.start)
+        self.assertAlmostEqual(self.bucket.delay(self.start), 2.0)
+
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeReplicate()
+        self.started = []
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.fake.release.set()
+
+    def predict(self, name):
+        with self.lock:
+            self.started.append((name, time.monotonic()))
+        return self.fake.run(MODEL_ID, input={'prompt': name})
+
+    def scheduler(self, workers=4, rate_per_minute=6000, burst=10, **kwargs):
+        return Scheduler(workers, rate_per_minute, burst, retry_on=backend.rate_limited, backoff=0.01, **kwargs)
+
+    def run_all(self, scheduler, *calls):
+        futures = [scheduler.submit(self.predict, name, key=key, priority=priority) for name, key, priority in calls]
+        for future in futures:
+            self.assertEqual(future.result(timeout=10), OUTPUT_URL)
+
+    def test_account_rate_spaces_calls_after_the_burst(self):
+        self.run_all(self.scheduler(rate_per_minute=600, burst=2), *[(f"p{i}", 'm', 0) for i in range(5)])
+        times = [at for _, at in self.started]
+        self.assertLess(times[1] - times[0], 0.05, "the burst goes out at once")
+        for before, after in zip(times[1:], times[2:]):
+            self.assertGreater(after - before, 0.07)
+        self.assertGreater(times[-1] - times[0], 0.25)
+
+    def test_key_rate_holds_back_only_that_key(self):
+        scheduler = self.scheduler(burst=1, key_rates={'slow': 60})
+        self.run_all(scheduler, ('slow-1', 'slow', 0), ('slow-2', 'slow', 0), ('fast', 'fast', 0))
+        order = [name for name, _ in self.started]
+        self.assertEqual(order[-1], 'slow-2', "fast is not queued behind the slow key")
+        times = dict(self.started)
+        self.assertGreater(times['slow-2'] - times['slow-1'], 0.8)
+
+    def test_higher_priority_runs_first_and_ties_keep_their_order(self):
+        scheduler = self.scheduler(workers=1)
+        self.fake.release.clear()
+        blocker = scheduler.submit(self.predict, 'blocker')
+        while not self.fake.calls:
+            time.sleep(0.005)
+        futures = [scheduler.submit(self.predict, name, priority=priority)
+                   for name, priority in (('batch-1', 10), ('batch-2', 10), ('interactive', 0))]
+        self.fake.release.set()
+        for future in [blocker, *futures]:
+            future.result(timeout=10)
+        self.assertEqual([name for name, _ in self.started], ['blocker', 'interactive', 'batch-1', 'batch-2'])
+
+    def test_rate_limited_call_is_retried(self):
+        scheduler = self.scheduler()
+        self.fake.errors = [ReplicateError(status=429, detail="throttled")] * 2
+        self.run_all(scheduler, ('p', None, 0))
+        self.assertEqual(len(self.fake.calls), 3)
+        stats = scheduler.stats()
+        self.assertEqual((stats['rate_limited'], stats['retried'], stats['completed'], stats['failed']), (2, 2, 1, 0))
+
+    def test_retries_give_up_after_max_retries(self):
+        scheduler = self.scheduler(max_retries=1)
+        self.fake.errors = [ReplicateError(status=429, detail="throttled")] * 3
+        with self.assertRaises(ReplicateError):
+            scheduler.submit(self.predict, 'p').result(timeout=10)
+        self.assertEqual(len(self.fake.calls), 2)
+        self.assertEqual(scheduler.stats()['failed'], 1)
+
+    def test_other_errors_are_not_retried(self):
+        scheduler = self.scheduler()
+        self.fake.errors = [ReplicateError(status=422, detail="bad input")]
+        with self.assertRaises(ReplicateError):
+            scheduler.submit(self.predict, 'p').result(timeout=10)
+        self.assertEqual(len(self.fake.calls), 1)
+        self.assertEqual(scheduler.stats()['rate_limited'], 0)
+
+    def test_rate_limit_slows_the_rest_of_the_queue(self):
+        scheduler = self.scheduler(rate_per_minute=600, burst=5)
+        self.fake.errors = [ReplicateError(status=429, detail="throttled")]
+        self.run_all(scheduler, ('first', None, 0))
+        self.run_all(scheduler, ('next', None, 0))
+        times = [at for _, at in self.started]
+        self.assertGreater(times[-1] - times[1], 0.07, "the 429 drained the bucket the burst would have used")
+
+    def test_cancelled_call_never_runs(self):
+        scheduler = self.scheduler(workers=1)
+        self.fake.release.clear()
+        blocker = scheduler.submit(self.predict, 'blocker')
+        while not self.fake.calls:
+            time.sleep(0.005)
+        cancelled = scheduler.submit(self.predict, 'cancelled')
+        self.assertTrue(cancelled.cancel())
+        after = scheduler.submit(self.predict, 'after')
+        self.fake.release.set()
+        blocker.result(timeout=10)
+        after.result(timeout=10)
+        self.assertEqual([name for name, _ in self.started], ['blocker', 'after'])
+        self.assertEqual(scheduler.stats()['cancelled'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""FilenameSequence under concurrent savers: no number may be handed out twice."""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+REPLICATE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPLICATE_DIR)
+from sequence import FilenameSequence  # noqa: E402
+
+# Allocates in blocks of 1-3 and prints every number it received, one per line.
+ALLOCATOR = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+from sequence import FilenameSequence
+sequence = FilenameSequence(sys.argv[2], sys.argv[3])
+for i in range(int(sys.argv[4])):
+    count = i % 3 + 1
+    first = sequence.allocate(count)
+    print("\\n".join(str(n) for n in range(first, first + count)), flush=True)
+'''
+
+
+class FilenameSequenceTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='sequence-tests-')
+        self.db_path = os.path.join(self.directory, '.output_sequence.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def assertUniqueAndContiguous(self, numbers, start=1):
+        self.assertEqual(len(numbers), len(set(numbers)), "a number was allocated twice")
+        self.assertEqual(sorted(numbers), list(range(start, start + len(numbers))))
+
+    def test_seeds_from_existing_files(self):
+        for name in ('output_7_sdxl.png', 'output_12_flux-dev.webp', 'notes.txt'):
+            open(os.path.join(self.directory, name), 'w').close()
+        sequence = FilenameSequence(self.directory, self.db_path)
+        self.assertEqual(sequence.allocate(), 13)
+        self.assertEqual(sequence.allocate(4), 14)
+        self.assertEqual(sequence.allocate(), 18)
+
+    def test_concurrent_threads(self):
+        numbers = []
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(8)
+
+        def saver():
+            sequence = FilenameSequence(self.directory, self.db_path)
+            start.wait()
+            try:
+                for i in range(50):
+                    count = i % 3 + 1
+                    first = sequence.allocate(count)
+                    with lock:
+                        numbers.extend(range(first, first + count))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=saver) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertUniqueAndContiguous(numbers)
+
+    def test_concurrent_processes(self):
+        processes = [subprocess.Popen([sys.executable, '-c', ALLOCATOR, REPLICATE_DIR, self.directory, self.db_path, '40'],
+                                      stdout=subprocess.PIPE, text=True)
+                     for _ in range(4)]
+        numbers = []
+        for process in processes:
+            output, _ = process.communicate(timeout=60)
+            self.assertEqual(process.returncode, 0)
+            numbers.extend(int(line) for line in output.split())
+        self.assertUniqueAndContiguous(numbers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""Downscaled WebP/AVIF variants of saved images for the gallery.
+
+Variants are cached on disk as <variant_dir>/<sha[:2]>/<sha256>-<size>.<format>,
+keyed by the source image's content hash, so they never go stale and can be
+served with long-lived cache headers. Pillow is optional: without it
+available_formats() is empty and callers keep serving the originals.
+
+Renders run in the process pool from start_pool(). This module is the
+workers' whole entry point: it imports nothing from the backend, so a worker
+loads Pillow and this file and nothing else.
+"""
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+# Longest edge in pixels for each named size.
+VARIANT_SIZES = {'thumb': 256, 'medium': 768}
+SAVE_OPTIONS = {
+    'webp': {'quality': 80, 'method': 4},
+    'avif': {'quality': 60, 'speed': 8},
+}
+
+
+def available_formats():
+    if Image is None:
+        return []
+    return [fmt for fmt in ('webp', 'avif') if features.check(fmt)]
+
+
+def start_pool(workers):
+    """Process pool for render_variants.
+
+    spawn, not fork: the server process is multi-threaded. A spawned worker
+    re-runs the parent's __main__ script unless it is a package __main__.py,
+    which is why the development server starts from backend/__main__.py
+    rather than from app.py.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def variant_path(variant_dir, sha256, size, fmt):
+    return os.path.join(variant_dir, sha256[:2], f"{sha256}-{size}.{fmt}")
+
+
+def render_variants(source_path, variant_dir, sha256, formats):
+    """Write every missing size/format variant of source_path; returns the paths written.
+
+    Runs in a worker process. Each file is written to a temp name and renamed,
+    so a reader never sees a partial variant.
+    """
+    wanted = [(size, fmt) for size in VARIANT_SIZES for fmt in formats
+              if not os.path.exists(variant_path(variant_dir, sha256, size, fmt))]
+    if not wanted:
+        return []
+    os.makedirs(os.path.join(variant_dir, sha256[:2]), exist_ok=True)
+    written = []
+    with Image.open(source_path) as source:
+        source.draft('RGB', (max(VARIANT_SIZES.values()),) * 2)
+        image = source.convert('RGBA' if 'A' in source.getbands() else 'RGB')
+    for size in VARIANT_SIZES:
+        formats_needed = [fmt for variant_size, fmt in wanted if variant_size == size]
+        if not formats_needed:
+            continue
+        resized = image.copy()
+        resized.thumbnail((VARIANT_SIZES[size], VARIANT_SIZES[size]), Image.LANCZOS)
+        for fmt in formats_needed:
+            path = variant_path(variant_dir, sha256, size, fmt)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.variant-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    resized.save(f, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+                os.chmod(temp_path, 0o644)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+            written.append(path)
+    return written
@@ -1,11 +1,8 @@
 import requests
-from bs4 import BeautifulSoup
-from feedgen.feed import FeedGenerator
 from urllib.parse import urljoin, urlparse
 import time
 import random
-from datetime import datetime
-from dateutil.parser import parse as parse_date
+from datetime import datetime, timezone
 import re
 import os
 import http.server
@@ -14,15 +11,26 @@ import argparse
 import logging
 import sqlite3
 import json
-from flask import Flask, request, Response, abort
 import threading
 import socket
+import heapq
+import itertools
+import signal
+import functools
+import html
+import gzip
+import hashlib
+from email.utils import parsedate_to_datetime
+import xml.etree.ElementTree as ET
+import contextlib
+import queue
+from urllib.robotparser import RobotFileParser
+import sys
 from dotenv import load_dotenv
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium_stealth import stealth
+
+# bs4, dateutil, feedgen, flask and selenium are imported where they are used.
+# Most runs never touch selenium or flask, and importing everything up front
+# dominated startup time for cron-driven runs.
 
 # Load environment variables from .env file
 load_dotenv()
@@ -47,16 +55,688 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+# How long a site without a native feed waits before discovery runs again.
+NATIVE_FEED_RECHECK_SECONDS = 7 * 24 * 3600
+
+# Native sources that cover the whole site rather than the listing page they were found from.
+SITE_WIDE_NATIVE_KINDS = ('wordpress', 'ghost', 'sitemap')
+
+# Guards against sitemap indexes that fan out without bound.
+MAX_SITEMAPS_PER_RUN = 50
+
+ARTICLES_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        feed_key TEXT,
+        url TEXT,
+        title TEXT,
+        description TEXT,
+        pub_date TEXT,
+        scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        content_hash TEXT,
+        page_hash TEXT,
+        retry_count INTEGER DEFAULT 0,
+        next_retry_at REAL,
+        pub_ts REAL,
+        PRIMARY KEY (feed_key, url)
+    )
+'''
+
+# Columns added to the articles table after its first release; init_db migrates older databases.
+ARTICLE_COLUMNS = [
+    ('content_hash', 'TEXT'),
+    ('page_hash', 'TEXT'),
+    ('retry_count', 'INTEGER DEFAULT 0'),
+    ('next_retry_at', 'REAL'),
+    ('pub_ts', 'REAL'),
+]
+
+# Feeds are built from articles scraped in the last FEED_WINDOW_DAYS; retention never prunes inside it.
+FEED_WINDOW_DAYS = 7
+DEFAULT_RETENTION_DAYS = 90
+VACUUM_INTERVAL_SECONDS = 24 * 3600
+
+# Database used by every feed when "shared_db" is set in config.json.
+SHARED_DB_NAME = 'articles.db'
+
+# Full-text index over every feed's articles, kept next to the feed databases.
+SEARCH_DB_NAME = 'search.db'
+SEARCH_MAX_PER_PAGE = 100
+
+# Aggregate feeds: default and maximum entry count, and how many rendered bundles to keep.
+AGGREGATE_DEFAULT_LIMIT = 50
+AGGREGATE_MAX_LIMIT = 500
+AGGREGATE_CACHE_SIZE = 32
+
+# Re-scrapes of pages that keep coming back 'Untitled' wait 1h, 2h, 4h, ... up to a week.
+UNTITLED_RETRY_BASE_SECONDS = 3600
+UNTITLED_RETRY_MAX_SECONDS = 7 * 24 * 3600
+
+# Transient responses that fetch retries, and the longest it will wait before one retry.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_BACKOFF_SECONDS = 1.0
+MAX_RETRY_WAIT_SECONDS = 60
+
+# Seconds; override any of them under "timeouts" in config.json, per site or in "default".
+DEFAULT_TIMEOUTS = {
+    'connect': 5,
+    'read': 10,
+    'request': 30,
+    'feed': 900,
+}
+
+# robots.txt is re-fetched per host after a day, or after an hour if it could not be fetched at all.
+ROBOTS_TTL_SECONDS = 24 * 3600
+ROBOTS_ERROR_TTL_SECONDS = 3600
+ROBOTS_MAX_BYTES = 500 * 1024
+ROBOTS_AGENT = 'rss-generator'
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36'
+
+# A host that fails this many fetches in a row is skipped for the cooldown, then probed once.
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_COOLDOWN_SECONDS = 300
+
+def pub_timestamp(pub_date):
+    """Epoch seconds for an article's pub_date string, so feeds can be merged in date order."""
+    if not pub_date:
+        return None
+    try:
+        return datetime.strptime(pub_date, '%a, %d %b %Y %H:%M:%S GMT').replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        pass
+    try:
+        parsed = parse_date(pub_date)
+    except (ValueError, OverflowError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def content_hash(article):
+    """Fingerprint of the fields that end up in the feed."""
+    fields = (article.get('title') or '', article.get('description') or '', article.get('pub_date') or '')
+    return hashlib.sha1('\x1f'.join(fields).encode('utf-8')).hexdigest()
+
+_db_local = threading.local()
+
+def get_connection(db_path):
+    """Per-thread SQLite connection for db_path, opened once and reused for the life of the thread.
+
+    Call close_connections() before deleting a database file; a cached connection would keep writing to it.
+    """
+    connections = getattr(_db_local, 'connections', None)
+    if connections is None:
+        connections = _db_local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode = WAL')
+        connections[db_path] = conn
+    return conn
+
+def close_connections():
+    for conn in getattr(_db_local, 'connections', {}).values():
+        conn.close()
+    _db_local.connections = {}
+
+def make_soup(markup, encoding=None):
+    from bs4 import BeautifulSoup
+    if encoding:
+        return BeautifulSoup(markup, 'lxml', from_encoding=encoding)
+    return BeautifulSoup(markup, 'lxml')
+
+def parse_date(date_str, **kwargs):
+    from dateutil.parser import parse
+    return parse(date_str, **kwargs)
+
+def clean_text(text):
+    return re.sub(r'\s+', ' ', text.strip()) if text else ''
+
+def find_date(soup, date_selectors):
+    for selector in date_selectors:
+        date_elem = soup.select_one(selector)
+        if date_elem:
+            date_str = date_elem.get('datetime') or date_elem.get('content') or date_elem.text
+            if date_str:
+                return parse_date(date_str, fuzzy=True).strftime('%a, %d %b %Y %H:%M:%S GMT')
+    return None
+
+def detect_blog_type(soup, base_url):
+    if soup.find('meta', {'name': 'generator', 'content': lambda x: x and 'WordPress' in x}):
+        return 'wordpress'
+    elif soup.find('meta', {'name': 'blogger-template'}):
+        return 'blogger'
+    elif 'medium.com' in base_url or soup.find('meta', {'property': 'al:android:app_name', 'content': 'Medium'}):
+        return 'medium'
+    elif soup.find('meta', {'name': 'generator', 'content': lambda x: x and 'Ghost' in x}):
+        return 'ghost'
+    return 'generic'
+
+def auto_detect_links(soup, include_patterns, exclude_patterns):
+    links = []
+    for link in soup.find_all('a', href=True):
+        href = link.get('href', '')
+        if include_patterns and not any(p.search(href) for p in include_patterns):
+            continue
+        if any(p.search(href) for p in exclude_patterns):
+            continue
+        links.append(link)
+    return links
+
+# The extract_* functions run in the parse pool: they take raw page bytes and return
+# plain tuples plus per-phase timings, so nothing heavier than that crosses processes.
+
+def extract_article(markup, encoding, title_selector, desc_selectors, date_selectors):
+    """Parse an article page into (title or None, description, pub_date or None, timings)."""
+    started = time.perf_counter()
+    soup = make_soup(markup, encoding)
+    parsed = time.perf_counter()
+    title_elem = soup.select_one(title_selector) or soup.find('h1') or soup.title
+    description = ''
+    for selector in desc_selectors:
+        desc_elem = soup.select_one(selector)
+        if desc_elem:
+            description = clean_text(desc_elem.get('content') or desc_elem.text)
+            if len(description) > 20:
+                break
+    selected = time.perf_counter()
+    try:
+        pub_date = find_date(soup, date_selectors)
+    except Exception as e:
+        logger.warning(f"Failed to parse date: {e}")
+        pub_date = None
+    timings = {'parse': parsed - started, 'selector': selected - parsed, 'date_parse': time.perf_counter() - selected}
+    title = clean_text(title_elem.text) if title_elem else None
+    return title, description[:500], pub_date, timings
+
+def extract_listing(markup, encoding, base_url, article_selector, next_page_selector, include_patterns, exclude_patterns):
+    """Parse a listing page into (blog_type, article URLs, has_next_page, auto_detected, timings)."""
+    started = time.perf_counter()
+    soup = make_soup(markup, encoding)
+    parsed = time.perf_counter()
+    try:
+        blog_type = detect_blog_type(soup, base_url)
+    except Exception:
+        blog_type = 'generic'
+    links = soup.select(article_selector)
+    auto_detected = not links
+    if auto_detected:
+        links = auto_detect_links(soup, [re.compile(p) for p in include_patterns], [re.compile(p) for p in exclude_patterns])
+    urls = [urljoin(base_url, link.get('href')) for link in links if link.get('href')]
+    has_next_page = soup.select_one(next_page_selector) is not None
+    timings = {'parse': parsed - started, 'selector': time.perf_counter() - parsed}
+    return blog_type, urls, has_next_page, auto_detected, timings
+
+parse_pool = None
+parse_workers = 0
+PARSE_POOL_LOCK = threading.Lock()
+
+def configure_parse_pool(workers):
+    """Parse pages in `workers` processes; 0 keeps parsing in the calling thread."""
+    global parse_pool, parse_workers
+    with PARSE_POOL_LOCK:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+            parse_pool = None
+        parse_workers = workers
+
+def run_parse(fn, *args):
+    """Run an extract_* function in the parse pool if one is configured, else inline. Returns a Future."""
+    global parse_pool
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+    with PARSE_POOL_LOCK:
+        if parse_workers and parse_pool is None:
+            import multiprocessing
+            # spawn, not fork: the daemon has Flask and HTTP server threads running by now.
+            parse_pool = ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context('spawn'))
+        pool = parse_pool
+    if pool is not None:
+        try:
+            return pool.submit(fn, *args)
+        except RuntimeError as e:
+            # BrokenProcessPool or a pool shut down underneath us; parse inline from here on.
+            logger.error(f"Parse pool unavailable, parsing in-process: {e}")
+            configure_parse_pool(0)
+    job = Future()
+    try:
+        job.set_result(fn(*args))
+    except Exception as e:
+        job.set_exception(e)
+    return job
+
+def response_encoding(response):
+    # Only trust a declared charset; otherwise let the parser sniff <meta charset> from the bytes.
+    return response.encoding if 'charset' in response.headers.get('Content-Type', '').lower() else None
+
+def retry_after_seconds(response):
+    """Seconds to wait according to a Retry-After header (delta-seconds or HTTP date), or None."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def abort_response(response):
+    """Cut off a download from another thread; shutting the socket down wakes a read blocked on it."""
+    try:
+        sock = socket.socket(fileno=os.dup(response.raw.fileno()))
+    except (AttributeError, OSError, ValueError):
+        # No socket underneath (already closed, or not a network response): closing is all there is.
+        response.close()
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    finally:
+        sock.close()
+
+class RequestDeadlineExceeded(requests.Timeout):
+    """Raised when a response body is still downloading after the per-request deadline."""
+
+class CircuitOpenError(requests.RequestException):
+    """Raised by fetch instead of making a request to a host whose circuit breaker is open."""
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one host: closed, open for a cooldown, then half-open for one probe."""
+
+    def __init__(self, host, threshold=CIRCUIT_FAILURE_THRESHOLD, cooldown=CIRCUIT_COOLDOWN_SECONDS):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def is_open(self):
+        with self.lock:
+            if self.opened_at is None:
+                return False
+            return self.probing or time.monotonic() - self.opened_at < self.cooldown
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                if self.opened_at is None or self.probing:
+                    logger.warning(f"Circuit for {self.host} opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+# Shared across scrapers so feeds on the same host trip the same breaker.
+BREAKERS = {}
+BREAKERS_LOCK = threading.Lock()
+
+def get_breaker(host):
+    with BREAKERS_LOCK:
+        if host not in BREAKERS:
+            BREAKERS[host] = CircuitBreaker(host)
+        return BREAKERS[host]
+
+class RobotsRules(RobotFileParser):
+    """RobotFileParser that keeps fractional Crawl-delay values such as 0.5, which the stdlib drops."""
+
+    def parse(self, lines):
+        # Swap each delay for its index so the stdlib parser assigns it to the right group.
+        delays = []
+        numbered = []
+        for line in lines:
+            key, sep, value = line.partition(':')
+            if sep and key.strip().lower() == 'crawl-delay':
+                try:
+                    delay = float(value.split('#', 1)[0].strip())
+                except ValueError:
+                    delay = None
+                if delay is None or not 0 <= delay < 86400:
+                    # Left in, an out-of-range integer would be read by the stdlib parser as an index.
+                    continue
+                delays.append(delay)
+                line = f"{key}: {len(delays) - 1}"
+            numbered.append(line)
+        super().parse(numbered)
+        for entry in self.entries + [self.default_entry] * bool(self.default_entry):
+            if entry.delay is not None:
+                entry.delay = delays[entry.delay]
+
+# Earliest monotonic time each host may be sent its next request, shared like BREAKERS.
+HOST_NEXT_REQUEST = {}
+HOST_PACING_LOCK = threading.Lock()
+
+class ScrapeMetrics:
+    """Thread-safe per-feed counters and histograms, rendered in the Prometheus text format."""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+    COUNTERS = {
+        'rss_pages_fetched_total': "Pages fetched over HTTP.",
+        'rss_fetch_errors_total': "HTTP fetches that raised before a response arrived.",
+        'rss_http_responses_total': "HTTP responses by status code.",
+        'rss_bytes_downloaded_total': "Response body bytes downloaded.",
+        'rss_articles_added_total': "Articles scraped and written to the cache.",
+        'rss_articles_unchanged_total': "Article pages skipped because their HTML had not changed.",
+        'rss_fetch_retries_total': "Fetches retried after a transient error or 429/5xx response.",
+        'rss_circuit_rejections_total': "Fetches skipped because the host's circuit breaker was open.",
+        'rss_request_deadline_exceeded_total': "Fetches abandoned after the per-request deadline.",
+        'rss_feed_deadline_exceeded_total': "Scrapes cut off by the per-feed deadline.",
+        'rss_robots_disallowed_total': "URLs skipped because robots.txt disallows them.",
+    }
+    HISTOGRAMS = {
+        'rss_fetch_seconds': "HTTP fetch latency.",
+        'rss_parse_seconds': "HTML parse latency.",
+        'rss_db_write_seconds': "Article cache write latency.",
+        'rss_selenium_seconds': "Time spent driving Selenium per listing page.",
+        'rss_feed_render_seconds': "RSS feed render latency.",
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, config_key, value=1, **labels):
+        key = (name, (('config_key', config_key),) + tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, config_key, seconds):
+        key = (name, (('config_key', config_key),))
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [[0] * len(self.BUCKETS), 0.0, 0]
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    hist[0][i] += 1
+            hist[1] += seconds
+            hist[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, name, config_key):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, config_key, time.monotonic() - started)
+
+    @staticmethod
+    def format_labels(labels, extra=()):
+        parts = []
+        for key, value in list(labels) + list(extra):
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            parts.append(f'{key}="{value}"')
+        return '{' + ','.join(parts) + '}'
+
+    def render(self):
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {k: (list(v[0]), v[1], v[2]) for k, v in self.histograms.items()}
+        lines = []
+        for name, help_text in self.COUNTERS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{self.format_labels(labels)} {value}")
+        for name, help_text in self.HISTOGRAMS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(self.BUCKETS, buckets):
+                    lines.append(f"{name}_bucket{self.format_labels(labels, [('le', bound)])} {bucket_count}")
+                lines.append(f"{name}_bucket{self.format_labels(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{self.format_labels(labels)} {total}")
+                lines.append(f"{name}_count{self.format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+METRICS = ScrapeMetrics()
+
+def fts_query(text):
+    """Turn free text into a safe FTS5 query: every word must match; "word*" matches as a prefix."""
+    terms = [f'"{word}"{star}' for word, star in re.findall(r'(\w+)(\*?)', text)]
+    return ' '.join(terms) or None
+
+class SearchIndex:
+    """FTS5 index over title and description of every cached article, shared by all feeds.
+
+    Connections are pooled rather than per-thread so Flask's short-lived request threads
+    reuse them, along with their prepared statements.
+    """
+
+    SCHEMA = [
+        '''
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY,
+            feed_key TEXT,
+            url TEXT,
+            title TEXT,
+            description TEXT,
+            pub_date TEXT,
+            UNIQUE (feed_key, url)
+        )
+        ''',
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+            title, description, content='documents', content_rowid='id', tokenize='porter unicode61'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+            INSERT INTO documents_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+            INSERT INTO documents_fts (documents_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN
+            INSERT INTO documents_fts (documents_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO documents_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+        ''',
+    ]
+
+    # Rank inside the FTS table first and only join the page being returned.
+    SEARCH_SQL = '''
+        SELECT d.feed_key, d.url, d.title, d.description, d.pub_date, hits.score
+        FROM (
+            SELECT rowid, bm25(documents_fts, 10.0, 1.0) AS score FROM documents_fts
+            WHERE documents_fts MATCH ?
+            ORDER BY score LIMIT ? OFFSET ?
+        ) AS hits
+        JOIN documents d ON d.id = hits.rowid
+        ORDER BY hits.score
+    '''
+    FEED_SEARCH_SQL = '''
+        SELECT d.feed_key, d.url, d.title, d.description, d.pub_date, hits.score
+        FROM (
+            SELECT f.rowid, bm25(documents_fts, 10.0, 1.0) AS score
+            FROM documents_fts f JOIN documents fd ON fd.id = f.rowid
+            WHERE documents_fts MATCH ? AND fd.feed_key = ?
+            ORDER BY score LIMIT ? OFFSET ?
+        ) AS hits
+        JOIN documents d ON d.id = hits.rowid
+        ORDER BY hits.score
+    '''
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.pool = queue.LifoQueue()
+        with self.connection() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    @contextlib.contextmanager
+    def connection(self):
+        try:
+            conn = self.pool.get_nowait()
+        except queue.Empty:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, cached_statements=256)
+            conn.execute('PRAGMA journal_mode = WAL')
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.pool.put(conn)
+
+    def index(self, feed_key, articles):
+        with self.connection() as conn:
+            conn.executemany('''
+                INSERT INTO documents (feed_key, url, title, description, pub_date) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(feed_key, url) DO UPDATE SET
+                    title = excluded.title, description = excluded.description, pub_date = excluded.pub_date
+                WHERE documents.title IS NOT excluded.title
+                   OR documents.description IS NOT excluded.description
+                   OR documents.pub_date IS NOT excluded.pub_date
+            ''', [(feed_key, a['url'], a['title'], a['description'], a['pub_date']) for a in articles])
+
+    def remove(self, feed_key, urls):
+        with self.connection() as conn:
+            conn.executemany('DELETE FROM documents WHERE feed_key = ? AND url = ?', [(feed_key, url) for url in urls])
+
+    def search(self, text, page=1, per_page=20, feed_key=None):
+        """Return (results, has_more) for one page of bm25-ranked matches, titles weighted 10x."""
+        match = fts_query(text)
+        if not match:
+            return [], False
+        limit = (per_page + 1, (page - 1) * per_page)
+        with self.connection() as conn:
+            if feed_key:
+                rows = conn.execute(self.FEED_SEARCH_SQL, (match, feed_key) + limit).fetchall()
+            else:
+                rows = conn.execute(self.SEARCH_SQL, (match,) + limit).fetchall()
+        results = [{
+            'feed_key': row[0],
+            'url': row[1],
+            'title': row[2],
+            'description': row[3],
+            'pub_date': row[4],
+            # Significant digits: bm25 of a term found in most documents is tiny, and round() would zero it.
+            'score': float(f"{-row[5]:.4g}"),
+        } for row in rows[:per_page]]
+        return results, len(rows) > per_page
+
+    def rebuild(self, db_paths):
+        """Re-index every article in the given feed databases from scratch."""
+        total = 0
+        with self.connection() as conn:
+            conn.execute('DELETE FROM documents')
+            conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('delete-all')")
+            for db_path in db_paths:
+                source = sqlite3.connect(db_path)
+                try:
+                    rows = source.execute('SELECT feed_key, url, title, description, pub_date FROM articles').fetchall()
+                except sqlite3.Error as e:
+                    logger.warning(f"Skipping {db_path} while rebuilding the search index: {e}")
+                    continue
+                finally:
+                    source.close()
+                conn.executemany('INSERT OR IGNORE INTO documents (feed_key, url, title, description, pub_date) '
+                                 'VALUES (?, ?, ?, ?, ?)', rows)
+                total += len(rows)
+            conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+        logger.info(f"Rebuilt search index {self.db_path} with {total} articles from {len(db_paths)} databases")
+        return total
+
+SEARCH_INDEXES = {}
+SEARCH_INDEXES_LOCK = threading.Lock()
+
+def get_search_index(output_dir):
+    # Relative output dirs live under BASE_DIR, as they do for BlogScraper and serve_feeds.
+    output_dir = os.path.join(BASE_DIR, output_dir)
+    db_path = os.path.join(output_dir, SEARCH_DB_NAME)
+    with SEARCH_INDEXES_LOCK:
+        if db_path not in SEARCH_INDEXES:
+            os.makedirs(output_dir, exist_ok=True)
+            SEARCH_INDEXES[db_path] = SearchIndex(db_path)
+        return SEARCH_INDEXES[db_path]
+
+def imported_feed_db_paths(output_dir):
+    """Per-feed databases whose articles were already copied into the shared database."""
+    shared_path = os.path.join(output_dir, SHARED_DB_NAME)
+    if not os.path.exists(shared_path):
+        return set()
+    conn = sqlite3.connect(shared_path)
+    try:
+        rows = conn.execute("SELECT feed_key FROM feed_state WHERE name = 'feed_db_imported' AND value = 'true'").fetchall()
+    except sqlite3.Error:
+        rows = []
+    finally:
+        conn.close()
+    return {own_db_path(output_dir, config_key) for config_key, in rows}
+
+def rebuild_search_index(output_dir):
+    output_dir = os.path.join(BASE_DIR, output_dir)
+    # Old per-feed files are left in place after the import, so indexing them would index those articles twice.
+    skipped = imported_feed_db_paths(output_dir)
+    db_paths = sorted(
+        path for path in (os.path.join(output_dir, name) for name in os.listdir(output_dir)
+                          if name.endswith('.db') and name != SEARCH_DB_NAME)
+        if path not in skipped
+    )
+    return get_search_index(output_dir).rebuild(db_paths)
+
+def own_db_path(output_dir, config_key):
+    """config_key's own database file; the names of the shared and search databases are reserved."""
+    name = f"{config_key.replace('/', '-').replace('.', '-')}.db"
+    if name in (SHARED_DB_NAME, SEARCH_DB_NAME):
+        name = f"{name[:-len('.db')]}-feed.db"
+    return os.path.join(output_dir, name)
+
+def feed_db_path(output_dir, config_key, config):
+    """Database holding config_key's articles: its own file, or the shared one when shared_db is set."""
+    shared = config.get(config_key, {}).get('shared_db', config.get('default', {}).get('shared_db', False))
+    if shared:
+        return os.path.join(output_dir, SHARED_DB_NAME)
+    return own_db_path(output_dir, config_key)
+
+def iter_recent_articles(conn, config_key, limit, feed_title):
+    """Yield up to limit articles newest first, straight off the cursor."""
+    cursor = conn.execute('''
+        SELECT title, url, description, pub_date, COALESCE(pub_ts, 0) FROM articles
+        WHERE feed_key = ? ORDER BY pub_ts DESC LIMIT ?
+    ''', (config_key, limit))
+    for row in cursor:
+        yield {'title': row[0], 'url': row[1], 'description': row[2], 'pub_date': row[3], 'pub_ts': row[4],
+               'feed_title': feed_title}
 
 class BlogScraper:
-    def __init__(self, base_url, config_key, output_dir='rss_feeds', max_pages=None, delay=1.0, config_file=None, feed_title=None, feed_description=None):
+    def __init__(self, base_url, config_key, output_dir='rss_feeds', max_pages=None, delay=1.0, config_file=None, feed_title=None, feed_description=None, session=None, min_delay=None):
         self.base_url = base_url.rstrip('/')
         self.config_key = config_key
         self.domain = urlparse(base_url).netloc
         self.output_dir = os.path.join(BASE_DIR, output_dir)
         self.max_pages = max_pages
         self.delay = delay
+        self.min_delay = delay if min_delay is None else min_delay
+        self.robots = {}
+        self.session = session or requests.Session()
         self.config = self.load_config(config_file)
         self.site_config = self.config.get(self.config_key, None)
         if not self.site_config:
@@ -67,7 +747,16 @@ class BlogScraper:
         os.makedirs(self.output_dir, exist_ok=True)
         self.site_log_dir = os.path.join(LOGS_DIR, self.config_key.replace('/', '-').replace('.', '-'))
         os.makedirs(self.site_log_dir, exist_ok=True)
-        self.db_path = os.path.join(self.output_dir, f"{self.config_key.replace('/', '-').replace('.', '-')}.db")
+        self.feed_db_path = own_db_path(self.output_dir, self.config_key)
+        self.shared_db = bool(self.setting('shared_db', False))
+        self.db_path = feed_db_path(self.output_dir, self.config_key, self.config)
+        self.phase_times = {}
+        self.unchanged_articles = []
+        self.retries_left = self.setting('retry_budget', 10)
+        self.timeouts = {**DEFAULT_TIMEOUTS, **self.config.get('default', {}).get('timeouts', {}),
+                         **self.site_config.get('timeouts', {})}
+        self.feed_deadline = None
+        self.deadline_hit = False
         self.init_db()
 
     def load_config(self, config_file):
@@ -82,131 +771,869 @@ class BlogScraper:
             logger.error(f"Error loading config file {config_path}: {e}")
             raise
 
+    def db(self):
+        return get_connection(self.db_path)
+
     def init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
+        conn = self.db()
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            # auto_vacuum only changes on an empty database or through a full VACUUM, so older files are rebuilt once.
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+        with conn:
+            conn.execute(ARTICLES_TABLE_SQL.format(table='articles'))
             conn.execute('''
-                CREATE TABLE IF NOT EXISTS articles (
-                    url TEXT PRIMARY KEY,
-                    title TEXT,
-                    description TEXT,
-                    pub_date TEXT,
-                    scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                CREATE TABLE IF NOT EXISTS feed_state (
+                    feed_key TEXT,
+                    name TEXT,
+                    value TEXT,
+                    PRIMARY KEY (feed_key, name)
                 )
             ''')
+            existing = {row[1] for row in conn.execute('PRAGMA table_info(articles)')}
+            if 'feed_key' not in existing:
+                self.migrate_articles_table(conn, existing)
+            else:
+                for column, declaration in ARTICLE_COLUMNS:
+                    if column not in existing:
+                        conn.execute(f'ALTER TABLE articles ADD COLUMN {column} {declaration}')
+            conn.execute('CREATE INDEX IF NOT EXISTS articles_scraped_at ON articles (feed_key, scraped_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS articles_pub_ts ON articles (feed_key, pub_ts)')
             conn.commit()
+        if self.shared_db:
+            self.import_feed_db()
+        if not self.get_state('pub_ts_backfilled'):
+            self.backfill_pub_ts()
         logger.info(f"Initialized database at {self.db_path}")
 
+    def migrate_articles_table(self, conn, existing):
+        # Per-feed databases from before feed_key keyed articles by url alone; rebuild with the composite key.
+        for column, declaration in ARTICLE_COLUMNS:
+            if column not in existing:
+                conn.execute(f'ALTER TABLE articles ADD COLUMN {column} {declaration}')
+        conn.execute(ARTICLES_TABLE_SQL.format(table='articles_migrated'))
+        conn.execute('''
+            INSERT INTO articles_migrated (feed_key, url, title, description, pub_date, scraped_at,
+                                           content_hash, page_hash, retry_count, next_retry_at)
+            SELECT ?, url, title, description, pub_date, scraped_at,
+                   content_hash, page_hash, retry_count, next_retry_at
+            FROM articles
+        ''', (self.config_key,))
+        conn.execute('DROP TABLE articles')
+        conn.execute('ALTER TABLE articles_migrated RENAME TO articles')
+        logger.info(f"Migrated articles table in {self.db_path} to per-feed keys")
+
+    def backfill_pub_ts(self):
+        with self.db() as conn:
+            rows = conn.execute('SELECT url, pub_date FROM articles WHERE feed_key = ? AND pub_ts IS NULL',
+                                (self.config_key,)).fetchall()
+            conn.executemany('UPDATE articles SET pub_ts = ? WHERE feed_key = ? AND url = ?',
+                             [(pub_timestamp(pub_date), self.config_key, url) for url, pub_date in rows])
+        self.set_state('pub_ts_backfilled', True)
+
+    def import_feed_db(self):
+        """Copy this feed's old per-feed database into the shared one, once."""
+        if not os.path.exists(self.feed_db_path) or self.get_state('feed_db_imported'):
+            return
+        conn = self.db()
+        conn.execute('ATTACH DATABASE ? AS feed_db', (self.feed_db_path,))
+        try:
+            with conn:
+                tables = {row[0] for row in conn.execute("SELECT name FROM feed_db.sqlite_master WHERE type = 'table'")}
+                if 'articles' in tables:
+                    conn.execute('''
+                        INSERT OR IGNORE INTO articles (feed_key, url, title, description, pub_date, scraped_at)
+                        SELECT ?, url, title, description, pub_date, scraped_at FROM feed_db.articles
+                    ''', (self.config_key,))
+                if 'feed_state' in tables:
+                    conn.execute('INSERT OR IGNORE INTO feed_state SELECT * FROM feed_db.feed_state WHERE feed_key = ?',
+                                 (self.config_key,))
+        finally:
+            conn.execute('DETACH DATABASE feed_db')
+        self.set_state('feed_db_imported', True)
+        logger.info(f"Imported {self.feed_db_path} into {self.db_path}; the old file can be deleted")
+
+    def apply_retention(self):
+        """Prune articles past retention_days / retention_max_rows and reclaim free pages about once a day."""
+        days = max(self.setting('retention_days', DEFAULT_RETENTION_DAYS), FEED_WINDOW_DAYS)
+        max_rows = self.setting('retention_max_rows')
+        with self.span('db'), self.db() as conn:
+            expired = conn.execute("SELECT url FROM articles WHERE feed_key = ? AND scraped_at < datetime('now', ?)",
+                                   (self.config_key, f'-{days} days')).fetchall()
+            if max_rows:
+                expired += conn.execute('''
+                    SELECT url FROM articles WHERE feed_key = ? AND scraped_at >= datetime('now', ?)
+                    ORDER BY scraped_at DESC LIMIT -1 OFFSET ?
+                ''', (self.config_key, f'-{days} days', max_rows)).fetchall()
+            conn.executemany('DELETE FROM articles WHERE feed_key = ? AND url = ?',
+                             [(self.config_key, url) for url, in expired])
+        if expired:
+            logger.info(f"Pruned {len(expired)} articles from {self.config_key} past retention")
+            if self.setting('search_index', True):
+                get_search_index(self.output_dir).remove(self.config_key, [url for url, in expired])
+        if time.time() - self.get_state('last_vacuum_at', 0) < VACUUM_INTERVAL_SECONDS:
+            return
+        with self.span('db'):
+            conn = self.db()
+            free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if free_pages:
+                # execute() steps a row-less pragma only once, freeing a single page; executescript runs it to the end.
+                conn.executescript('PRAGMA incremental_vacuum')
+                logger.info(f"Reclaimed {free_pages} free pages in {self.db_path}")
+        self.set_state('last_vacuum_at', time.time())
+
+    def get_state(self, name, default=None):
+        with self.db() as conn:
+            row = conn.execute('SELECT value FROM feed_state WHERE feed_key = ? AND name = ?',
+                               (self.config_key, name)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_state(self, name, value):
+        with self.db() as conn:
+            conn.execute('INSERT OR REPLACE INTO feed_state (feed_key, name, value) VALUES (?, ?, ?)',
+                         (self.config_key, name, json.dumps(value)))
+            conn.commit()
+
+    def setting(self, name, default=None):
+        # Site entries override the "default" entry in config.json.
+        if name in self.site_config:
+            return self.site_config[name]
+        return self.config.get('default', {}).get(name, default)
+
     def cache_article(self, article):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute('''
-                INSERT OR REPLACE INTO articles (url, title, description, pub_date)
-                VALUES (?, ?, ?, ?)
-            ''', (article['url'], article['title'], article['description'], article['pub_date']))
+        self.cache_articles([article])
+
+    def cache_articles(self, articles):
+        with self.span('db', 'rss_db_write_seconds'), self.db() as conn:
+            # Rows whose content is unchanged are left alone; a changed page with the same
+            # content only refreshes page_hash so the next run can skip parsing it.
+            conn.executemany('''
+                INSERT INTO articles (feed_key, url, title, description, pub_date, content_hash, page_hash, pub_ts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(feed_key, url) DO UPDATE SET
+                    title = excluded.title,
+                    description = excluded.description,
+                    pub_date = excluded.pub_date,
+                    pub_ts = excluded.pub_ts,
+                    content_hash = excluded.content_hash,
+                    page_hash = COALESCE(excluded.page_hash, articles.page_hash),
+                    scraped_at = CASE WHEN articles.content_hash IS excluded.content_hash
+                                      THEN articles.scraped_at ELSE CURRENT_TIMESTAMP END,
+                    retry_count = CASE WHEN excluded.title = 'Untitled' THEN articles.retry_count ELSE 0 END,
+                    next_retry_at = CASE WHEN excluded.title = 'Untitled' THEN articles.next_retry_at ELSE NULL END
+                WHERE articles.content_hash IS NOT excluded.content_hash
+                   OR (excluded.page_hash IS NOT NULL AND articles.page_hash IS NOT excluded.page_hash)
+            ''', [(self.config_key, a['url'], a['title'], a['description'], a['pub_date'], content_hash(a), a.get('page_hash'),
+                   pub_timestamp(a['pub_date'])) for a in articles])
             conn.commit()
+        if self.setting('search_index', True):
+            try:
+                with self.span('db'):
+                    get_search_index(self.output_dir).index(self.config_key, articles)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to update search index for {self.config_key}: {e}")
+
+    def get_fingerprint(self, url):
+        """Return (page_hash, pub_date) stored for url, or None if it was never cached."""
+        with self.db() as conn:
+            return conn.execute('SELECT page_hash, pub_date FROM articles WHERE feed_key = ? AND url = ?',
+                                (self.config_key, url)).fetchone()
+
+    def get_cached_article(self, url):
+        with self.db() as conn:
+            row = conn.execute('SELECT title, url, description, pub_date FROM articles WHERE feed_key = ? AND url = ?',
+                               (self.config_key, url)).fetchone()
+        return {'title': row[0], 'url': row[1], 'description': row[2], 'pub_date': row[3]} if row else None
+
+    def title_retry_due(self, url):
+        with self.db() as conn:
+            row = conn.execute('SELECT next_retry_at FROM articles WHERE feed_key = ? AND url = ?',
+                               (self.config_key, url)).fetchone()
+        return not row or row[0] is None or row[0] <= time.time()
+
+    def schedule_title_retry(self, url):
+        with self.db() as conn:
+            row = conn.execute('SELECT retry_count FROM articles WHERE feed_key = ? AND url = ?',
+                               (self.config_key, url)).fetchone()
+            retries = (row[0] or 0) if row else 0
+            wait = min(UNTITLED_RETRY_BASE_SECONDS * 2 ** retries, UNTITLED_RETRY_MAX_SECONDS)
+            conn.execute('UPDATE articles SET retry_count = ?, next_retry_at = ? WHERE feed_key = ? AND url = ?',
+                         (retries + 1, time.time() + wait, self.config_key, url))
+            conn.commit()
+        logger.info(f"Still no title for {url}; next re-scrape in {wait / 3600:.1f}h")
+
+    @contextlib.contextmanager
+    def span(self, phase, metric=None):
+        # Accumulates wall time per phase for --profile; also feeds the matching histogram.
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self.phase_times[phase] = self.phase_times.get(phase, 0.0) + elapsed
+            if metric:
+                METRICS.observe(metric, self.config_key, elapsed)
+
+    def pause(self, seconds):
+        with self.span('delay'):
+            time.sleep(seconds)
+
+    def robots_for(self, url):
+        """Return (parser, fetched) for url's host; robots.txt is cached in memory and in feed_state.
+
+        `fetched` is False when robots.txt could not be read (network error or 5xx), in which
+        case everything is allowed but requests fall back to the conservative --delay.
+        """
+        parts = urlparse(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        entry = self.robots.get(origin)
+        if entry and time.time() - entry[2] < entry[3]:
+            return entry[0], entry[1]
+        cached = self.get_state(f'robots:{origin}')
+        if not cached or time.time() - cached['fetched_at'] >= cached['ttl']:
+            cached = self.fetch_robots(origin)
+            self.set_state(f'robots:{origin}', cached)
+        parser = RobotsRules(f"{origin}/robots.txt")
+        status = cached['status']
+        if status in (401, 403):
+            parser.disallow_all = True
+        elif status is None or status >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(cached['body'].splitlines())
+        parser.last_checked = cached['fetched_at']
+        fetched = status is not None and status < 500
+        self.robots[origin] = (parser, fetched, cached['fetched_at'], cached['ttl'])
+        return parser, fetched
+
+    def fetch_robots(self, origin):
+        url = f"{origin}/robots.txt"
+        try:
+            response = self.fetch(url, {'User-Agent': USER_AGENT}, pace=False, allow_redirects=True)
+        except requests.RequestException as e:
+            logger.warning(f"Could not fetch {url} ({e}); using --delay {self.delay}s for {origin}")
+            return {'fetched_at': time.time(), 'status': None, 'body': '', 'ttl': ROBOTS_ERROR_TTL_SECONDS}
+        body = response.content[:ROBOTS_MAX_BYTES].decode('utf-8', 'replace') if response.status_code == 200 else ''
+        ttl = ROBOTS_ERROR_TTL_SECONDS if response.status_code >= 500 else ROBOTS_TTL_SECONDS
+        logger.info(f"Fetched {url}: {response.status_code}")
+        return {'fetched_at': time.time(), 'status': response.status_code, 'body': body, 'ttl': ttl}
+
+    def allowed(self, url):
+        """False if robots.txt disallows url; set "respect_robots": false to scrape a site regardless."""
+        if self.setting('respect_robots', True) is False:
+            return True
+        parser, _ = self.robots_for(url)
+        if parser.can_fetch(ROBOTS_AGENT, url):
+            return True
+        METRICS.inc('rss_robots_disallowed_total', self.config_key)
+        logger.info(f"robots.txt disallows {url}, skipping")
+        return False
+
+    def host_delay(self, url):
+        """Seconds between requests to url's host: its Crawl-delay or Request-rate, else --min-delay.
+
+        Hosts whose robots.txt could not be read, or sites with "respect_robots": false, get --delay.
+        """
+        if self.setting('respect_robots', True) is False:
+            return self.delay
+        parser, fetched = self.robots_for(url)
+        delay = parser.crawl_delay(ROBOTS_AGENT)
+        rate = parser.request_rate(ROBOTS_AGENT)
+        if rate and rate.requests:
+            delay = max(float(delay or 0), rate.seconds / rate.requests)
+        if delay is not None:
+            return max(float(delay), self.min_delay)
+        return self.min_delay if fetched else self.delay
+
+    def throttle(self, url):
+        """Wait for url's host's next request slot; slots are shared by every scraper in the process."""
+        host = urlparse(url).netloc
+        delay = self.host_delay(url)
+        with HOST_PACING_LOCK:
+            now = time.monotonic()
+            ready = max(now, HOST_NEXT_REQUEST.get(host, now))
+            HOST_NEXT_REQUEST[host] = ready + delay
+        if ready > now:
+            self.pause(ready - now)
+
+    def fetch(self, url, headers, pace=True, **kwargs):
+        """GET url, retrying connection errors, timeouts and 429/5xx within the scrape's retry budget.
+
+        Requests are paced per host by throttle() unless pace is False. A URL that still fails
+        once its retries are used up counts as one failure toward its host's circuit breaker.
+
+        Raises CircuitOpenError without touching the network while the host's breaker is open.
+        """
+        host = urlparse(url).netloc
+        breaker = get_breaker(host)
+        if not breaker.allow():
+            METRICS.inc('rss_circuit_rejections_total', self.config_key)
+            raise CircuitOpenError(f"Circuit open for {host}, not fetching {url}")
+        max_retries = self.setting('max_retries', 3)
+        attempt = 0
+        while True:
+            if pace:
+                self.throttle(url)
+            try:
+                with self.span('network', 'rss_fetch_seconds'):
+                    response = self.session.get(url, headers=headers, stream=True,
+                                                timeout=(self.timeouts['connect'], self.timeouts['read']),
+                                                **{k: v for k, v in kwargs.items() if k != 'stream'})
+                    if not kwargs.get('stream'):
+                        self.read_body(response)
+            except Exception as e:
+                METRICS.inc('rss_fetch_errors_total', self.config_key)
+                if not self.retryable(e) or not self.take_retry(attempt, max_retries):
+                    breaker.record_failure()
+                    raise
+                wait = self.backoff(attempt)
+                logger.warning(f"Fetching {url} failed ({e}); retrying in {wait:.1f}s")
+            else:
+                METRICS.inc('rss_pages_fetched_total', self.config_key)
+                METRICS.inc('rss_http_responses_total', self.config_key, code=response.status_code)
+                if not kwargs.get('stream'):
+                    METRICS.inc('rss_bytes_downloaded_total', self.config_key, len(response.content))
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    return response
+                wait = retry_after_seconds(response)
+                if wait is None:
+                    wait = self.backoff(attempt)
+                if wait > MAX_RETRY_WAIT_SECONDS or not self.take_retry(attempt, max_retries):
+                    breaker.record_failure()
+                    return response
+                logger.warning(f"Got {response.status_code} for {url}; retrying in {wait:.1f}s")
+                response.close()
+            METRICS.inc('rss_fetch_retries_total', self.config_key)
+            with self.span('retry'):
+                time.sleep(wait)
+            attempt += 1
+
+    def read_body(self, response):
+        """Download the body, cutting the connection when the request (or feed) deadline passes.
+
+        The deadline is enforced by a watchdog rather than between chunks, so a server that
+        trickles bytes cannot hold the read open past it.
+        """
+        budget = self.timeouts['request']
+        if self.feed_deadline is not None:
+            budget = min(budget, self.feed_deadline - time.monotonic())
+        lock = threading.Lock()
+        state = {'done': False, 'expired': False}
+
+        def expire():
+            with lock:
+                if state['done']:
+                    return
+                state['expired'] = True
+            abort_response(response)
+
+        watchdog = threading.Timer(max(budget, 0.0), expire)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            response.content  # downloads and caches the body
+        except Exception as e:
+            if not state['expired']:
+                raise
+            failure = e
+        else:
+            failure = None
+        finally:
+            watchdog.cancel()
+            with lock:
+                state['done'] = True
+        # A body without Content-Length or chunked framing ends at EOF, so one cut at the deadline looks complete.
+        framed = 'Content-Length' in response.headers or 'chunked' in response.headers.get('Transfer-Encoding', '')
+        if failure is not None or (state['expired'] and not framed):
+            response.close()
+            METRICS.inc('rss_request_deadline_exceeded_total', self.config_key)
+            raise RequestDeadlineExceeded(f"{response.url} still downloading after {budget:.1f}s") from failure
+
+    def out_of_time(self):
+        """True once the per-feed deadline has passed; the first call logs it and counts the overrun."""
+        if self.feed_deadline is None or time.monotonic() < self.feed_deadline:
+            return False
+        if not self.deadline_hit:
+            self.deadline_hit = True
+            METRICS.inc('rss_feed_deadline_exceeded_total', self.config_key)
+            logger.warning(f"{self.config_key} hit its {self.timeouts['feed']}s deadline; keeping the articles scraped so far")
+        return True
+
+    @staticmethod
+    def retryable(error):
+        # A response that ran past its request deadline has used its whole budget; trying again would too.
+        return (isinstance(error, (requests.ConnectionError, requests.Timeout))
+                and not isinstance(error, RequestDeadlineExceeded))
+
+    def take_retry(self, attempt, max_retries):
+        if attempt >= max_retries or self.retries_left <= 0 or self.out_of_time():
+            return False
+        self.retries_left -= 1
+        return True
+
+    def backoff(self, attempt):
+        return min(RETRY_BACKOFF_SECONDS * 2 ** attempt, MAX_RETRY_WAIT_SECONDS) * random.uniform(0.5, 1.0)
+
+    def host_available(self, url):
+        """False while the circuit breaker for url's host is open, so loops can stop early."""
+        host = urlparse(url).netloc
+        if get_breaker(host).is_open():
+            logger.warning(f"Circuit open for {host}; skipping its remaining articles")
+            return False
+        return True
+
+    def parse(self, markup):
+        with self.span('parse', 'rss_parse_seconds'):
+            return make_soup(markup)
+
+    def is_cached(self, url):
+        with self.span('db'), self.db() as conn:
+            return conn.execute('SELECT 1 FROM articles WHERE feed_key = ? AND url = ?',
+                                (self.config_key, url)).fetchone() is not None
 
     def get_cached_articles(self):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute('SELECT title, url, description, pub_date FROM articles WHERE scraped_at > datetime("now", "-7 days")')
+        with self.span('db'), self.db() as conn:
+            cursor = conn.execute("SELECT title, url, description, pub_date FROM articles WHERE feed_key = ? AND scraped_at > datetime('now', ?)",
+                                  (self.config_key, f'-{FEED_WINDOW_DAYS} days'))
             articles = [{'title': row[0], 'url': row[1], 'description': row[2], 'pub_date': row[3]} for row in cursor.fetchall()]
             filtered = [a for a in articles if self.domain in a['url']]
             logger.info(f"Retrieved {len(filtered)} cached articles for domain {self.domain} from {self.db_path}")
             return filtered
 
+    def iter_recent_articles(self, limit):
+        return iter_recent_articles(self.db(), self.config_key, limit, self.feed_title)
+
     def detect_blog_type(self, soup):
         try:
-            if soup.find('meta', {'name': 'generator', 'content': lambda x: x and 'WordPress' in x}):
-                return 'wordpress'
-            elif soup.find('meta', {'name': 'blogger-template'}):
-                return 'blogger'
-            elif 'medium.com' in self.base_url or soup.find('meta', {'property': 'al:android:app_name', 'content': 'Medium'}):
-                return 'medium'
-            elif soup.find('meta', {'name': 'generator', 'content': lambda x: x and 'Ghost' in x}):
-                return 'ghost'
-            return 'generic'
+            return detect_blog_type(soup, self.base_url)
         except Exception as e:
             logger.error(f"Error detecting blog type: {e}")
             return 'generic'
 
     def clean_text(self, text):
-        return re.sub(r'\s+', ' ', text.strip()) if text else ''
+        return clean_text(text)
 
-    def parse_article_date(self, article_soup):
-        selectors = self.site_config['date_selectors']
-        try:
-            for selector in selectors:
-                date_elem = article_soup.select_one(selector)
-                if date_elem:
-                    date_str = date_elem.get('datetime') or date_elem.get('content') or date_elem.text
-                    if date_str:
-                        return parse_date(date_str, fuzzy=True).strftime('%a, %d %b %Y %H:%M:%S GMT')
+    def strip_html(self, text):
+        return self.clean_text(html.unescape(re.sub(r'<[^>]+>', ' ', text or '')))
+
+    def format_pub_date(self, date_str):
+        with self.span('date_parse'):
+            try:
+                if date_str:
+                    return parse_date(date_str, fuzzy=True).strftime('%a, %d %b %Y %H:%M:%S GMT')
+            except Exception as e:
+                logger.warning(f"Failed to parse date {date_str!r}: {e}")
             return datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S GMT')
+
+    def discover_native_feeds(self, headers):
+        """Return (kind, url) candidates for feeds or APIs the site already publishes, best first."""
+        try:
+            response = self.fetch(self.base_url, headers, allow_redirects=True)
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Native feed discovery could not fetch {self.base_url}: {e}")
+            return []
+        soup = self.parse(response.text)
+        blog_type = self.detect_blog_type(soup)
+        logger.info(f"Detected blog type: {blog_type}")
+        parsed = urlparse(response.url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+
+        candidates = []
+        with self.span('selector'):
+            for link in soup.find_all('link', href=True):
+                rel = [r.lower() for r in (link.get('rel') or [])]
+                link_type = (link.get('type') or '').lower()
+                if 'alternate' in rel and link_type in ('application/rss+xml', 'application/atom+xml'):
+                    href = urljoin(response.url, link['href'])
+                    # Skip per-post comment feeds advertised next to the main feed.
+                    if '/comments/' not in href:
+                        candidates.append(('rss', href))
+                elif 'https://api.w.org/' in rel:
+                    blog_type = 'wordpress'
+        if blog_type == 'wordpress':
+            candidates.append(('wordpress', f"{origin}/wp-json/wp/v2/posts?per_page=50&_fields=link,title,excerpt,date_gmt"))
+        ghost_key = self.setting('ghost_content_api_key')
+        if ghost_key:
+            candidates.append(('ghost', f"{origin}/ghost/api/content/posts/?key={ghost_key}&limit=50&fields=title,url,custom_excerpt,excerpt,published_at"))
+        candidates.append(('sitemap', f"{origin}/sitemap.xml"))
+        return candidates
+
+    def parse_feed_items(self, content):
+        # Handles RSS 2.0, RSS 1.0 (RDF), Atom and Google News sitemaps; namespaces are ignored.
+        with self.span('parse'):
+            root = ET.fromstring(content)
+        items = []
+        for elem in root.iter():
+            tag = elem.tag.rsplit('}', 1)[-1]
+            if tag not in ('item', 'entry', 'url'):
+                continue
+            fields = {}
+            for child in elem.iter():
+                if child is elem:
+                    continue
+                name = child.tag.rsplit('}', 1)[-1]
+                if name == 'link' and child.get('href'):
+                    if child.get('rel', 'alternate') == 'alternate':
+                        fields.setdefault('link', child.get('href'))
+                elif child.text and child.text.strip():
+                    fields.setdefault(name, child.text.strip())
+            if tag == 'url':
+                # Plain sitemaps carry no titles, so only news sitemaps count as a feed.
+                if 'title' not in fields:
+                    continue
+                fields.setdefault('link', fields.get('loc'))
+            url = fields.get('link')
+            if not url:
+                continue
+            items.append({
+                'title': self.strip_html(fields.get('title')) or 'Untitled',
+                'url': url,
+                'description': self.strip_html(fields.get('description') or fields.get('summary') or fields.get('content'))[:500],
+                'pub_date': self.format_pub_date(fields.get('pubDate') or fields.get('published') or fields.get('updated')
+                                                 or fields.get('date') or fields.get('publication_date')),
+            })
+        return items
+
+    def in_section(self, url):
+        """True if url is under base_url's path; a feed for a whole site (no path) contains every URL."""
+        section = urlparse(self.base_url)
+        if not section.path.strip('/'):
+            return True
+        parsed = urlparse(url)
+        prefix = section.path.rstrip('/') + '/'
+        return parsed.netloc == section.netloc and (parsed.path + '/').startswith(prefix)
+
+    def fetch_native_items(self, kind, url, headers):
+        """Items from a native source; site-wide sources only yield the ones in this feed's section."""
+        items = self.read_native_items(kind, url, headers)
+        if kind in SITE_WIDE_NATIVE_KINDS and not self.setting('native_feed_site_wide', False):
+            scoped = [item for item in items if self.in_section(item['url'])]
+            if len(scoped) < len(items):
+                logger.info(f"Native {kind} source {url}: {len(scoped)} of {len(items)} items are under {self.base_url}")
+            items = scoped
+        return items
+
+    def read_native_items(self, kind, url, headers):
+        request_headers = dict(headers)
+        if kind in ('wordpress', 'ghost'):
+            request_headers['Accept'] = 'application/json'
+        else:
+            request_headers['Accept'] = 'application/rss+xml, application/atom+xml, application/xml;q=0.9, text/xml;q=0.8'
+        try:
+            response = self.fetch(url, request_headers, allow_redirects=True)
+            response.raise_for_status()
+            if kind == 'wordpress':
+                return [{
+                    'title': self.strip_html(post.get('title', {}).get('rendered')) or 'Untitled',
+                    'url': post['link'],
+                    'description': self.strip_html(post.get('excerpt', {}).get('rendered'))[:500],
+                    'pub_date': self.format_pub_date(post.get('date_gmt') and post['date_gmt'] + 'Z'),
+                } for post in response.json() if post.get('link')]
+            if kind == 'ghost':
+                return [{
+                    'title': self.strip_html(post.get('title')) or 'Untitled',
+                    'url': post['url'],
+                    'description': self.strip_html(post.get('custom_excerpt') or post.get('excerpt'))[:500],
+                    'pub_date': self.format_pub_date(post.get('published_at')),
+                } for post in response.json().get('posts', []) if post.get('url')]
+            return self.parse_feed_items(response.content)
+        except Exception as e:
+            logger.info(f"Native {kind} source {url} not usable: {e}")
+            return []
+
+    def ingest_native_items(self, items, seen_urls):
+        include_patterns = [re.compile(p) for p in self.site_config['url_filters'].get('include_patterns', [])]
+        exclude_patterns = [re.compile(p) for p in self.site_config['url_filters'].get('exclude_patterns', [])]
+        new_articles = []
+        for item in items:
+            url = item['url']
+            if url in seen_urls or any(p.search(url) for p in exclude_patterns):
+                continue
+            if include_patterns and not any(p.search(url) for p in include_patterns):
+                continue
+            seen_urls.add(url)
+            new_articles.append(item)
+        if new_articles:
+            self.cache_articles(new_articles)
+            METRICS.inc('rss_articles_added_total', self.config_key, len(new_articles))
+        logger.info(f"Ingested {len(new_articles)} new articles out of {len(items)} native feed items")
+        return new_articles
+
+    def parse_lastmod(self, value):
+        if not value:
+            return None
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            try:
+                parsed = parse_date(value)
+            except Exception:
+                return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+    def iter_sitemap(self, sitemap_url, headers, since=None):
+        """Stream (url, lastmod_timestamp) pairs from a sitemap or sitemap index in constant memory.
+
+        Child sitemaps whose <lastmod> is not newer than `since` are skipped.
+        """
+        pending = [sitemap_url]
+        visited = 0
+        while pending and visited < MAX_SITEMAPS_PER_RUN:
+            url = pending.pop(0)
+            visited += 1
+            try:
+                response = self.fetch(url, headers, stream=True, allow_redirects=True)
+                response.raise_for_status()
+            except Exception as e:
+                logger.error(f"Failed to fetch sitemap {url}: {e}")
+                raise
+            # Parse time is only counted while this generator runs, not while the caller holds a URL.
+            parse_seconds = 0.0
+            parse_started = time.monotonic()
+            try:
+                response.raw.decode_content = True
+                source = response.raw
+                if url.endswith('.gz') or 'gzip' in response.headers.get('Content-Type', ''):
+                    source = gzip.GzipFile(fileobj=source)
+                root = None
+                for event, elem in ET.iterparse(source, events=('start', 'end')):
+                    if root is None:
+                        root = elem
+                        continue
+                    tag = elem.tag.rsplit('}', 1)[-1]
+                    if event != 'end' or tag not in ('url', 'sitemap'):
+                        continue
+                    loc = lastmod = None
+                    for child in elem:
+                        name = child.tag.rsplit('}', 1)[-1]
+                        if name == 'loc':
+                            loc = (child.text or '').strip()
+                        elif name == 'lastmod':
+                            lastmod = self.parse_lastmod((child.text or '').strip())
+                    # Drop parsed entries so memory stays flat on huge sitemaps.
+                    root.clear()
+                    if not loc:
+                        continue
+                    if tag == 'sitemap':
+                        if since is None or lastmod is None or lastmod > since:
+                            pending.append(loc)
+                        continue
+                    parse_seconds += time.monotonic() - parse_started
+                    yield loc, lastmod
+                    parse_started = time.monotonic()
+            finally:
+                parse_seconds += time.monotonic() - parse_started
+                self.phase_times['parse'] = self.phase_times.get('parse', 0.0) + parse_seconds
+                METRICS.observe('rss_parse_seconds', self.config_key, parse_seconds)
+                METRICS.inc('rss_bytes_downloaded_total', self.config_key, response.raw.tell())
+                response.close()
+        if pending:
+            logger.warning(f"Stopped after {MAX_SITEMAPS_PER_RUN} sitemaps; {len(pending)} left unread")
+
+    def scrape_sitemap(self, headers, seen_urls):
+        parsed = urlparse(self.base_url)
+        sitemap_url = self.setting('sitemap_url') or f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"
+        max_urls = self.setting('sitemap_max_urls', 100)
+        include_patterns = [re.compile(p) for p in self.site_config['url_filters'].get('include_patterns', [])]
+        exclude_patterns = [re.compile(p) for p in self.site_config['url_filters'].get('exclude_patterns', [])]
+        since = self.get_state('sitemap_last_success')
+        run_started = time.time()
+
+        # Keep only the newest max_urls candidates; a bounded heap keeps memory flat.
+        candidates = []
+        scanned = 0
+        complete = True
+        try:
+            for url, lastmod in self.iter_sitemap(sitemap_url, headers, since):
+                if self.out_of_time():
+                    complete = False
+                    break
+                scanned += 1
+                if url in seen_urls or any(p.search(url) for p in exclude_patterns):
+                    continue
+                if include_patterns and not any(p.search(url) for p in include_patterns):
+                    continue
+                if not self.allowed(url):
+                    continue
+                if since is not None:
+                    if lastmod is not None and lastmod <= since:
+                        continue
+                    if lastmod is None and self.is_cached(url):
+                        continue
+                entry = (lastmod or 0.0, url)
+                if len(candidates) < max_urls:
+                    heapq.heappush(candidates, entry)
+                elif entry > candidates[0]:
+                    heapq.heapreplace(candidates, entry)
+        except Exception as e:
+            # Scrape what was collected, but keep the old watermark so the rest is retried.
+            logger.error(f"Sitemap crawl of {sitemap_url} failed: {e}")
+            complete = False
+
+        logger.info(f"Sitemap {sitemap_url}: scanned {scanned} URLs, {len(candidates)} new or updated since last run")
+        new_articles, finished = self.scrape_articles([url for _, url in sorted(candidates, reverse=True)],
+                                                      headers, seen_urls)
+        if complete and finished:
+            self.set_state('sitemap_last_success', run_started)
+        return new_articles
+
+    def scrape_native_feed(self, headers, seen_urls):
+        """Ingest articles from a native feed or API if the site has one; None means fall back to HTML scraping."""
+        if self.setting('native_feed', True) is False:
+            return None
+        source = self.get_state('native_feed')
+        if source:
+            kind, url = source
+            items = self.fetch_native_items(kind, url, headers)
+            if items:
+                return self.ingest_native_items(items, seen_urls)
+            logger.warning(f"Native {kind} feed {url} returned nothing; rediscovering")
+            self.set_state('native_feed', None)
+        elif time.time() - self.get_state('native_feed_checked_at', 0) < NATIVE_FEED_RECHECK_SECONDS:
+            return None
+
+        self.set_state('native_feed_checked_at', time.time())
+        for kind, url in self.discover_native_feeds(headers):
+            items = self.fetch_native_items(kind, url, headers)
+            if items:
+                logger.info(f"Using native {kind} feed {url} for {self.base_url} ({len(items)} items)")
+                self.set_state('native_feed', [kind, url])
+                return self.ingest_native_items(items, seen_urls)
+        logger.info(f"No native feed found for {self.base_url}; scraping HTML")
+        return None
+
+    def find_article_date(self, article_soup):
+        try:
+            return find_date(article_soup, self.site_config['date_selectors'])
         except Exception as e:
             logger.warning(f"Failed to parse date: {e}")
-            return datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S GMT')
+            return None
 
-    def scrape_article_details(self, url, headers):
+    def fetch_article(self, url, headers):
+        """Fetch an article page; returns (markup, encoding, page_hash, cached) or None if it failed or is unchanged.
+
+        Unchanged pages are not parsed again; their cached rows are collected in self.unchanged_articles.
+        """
         try:
             logger.info(f"Fetching article {url} with requests")
             headers.update({
                 'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
                 'Accept-Language': 'en-US,en;q=0.9'
             })
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.fetch(url, headers)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'lxml')
+        except Exception as e:
+            logger.error(f"Failed to scrape article {url}: {e}")
+            return None
+        page_hash = hashlib.sha1(response.content).hexdigest()
+        cached = self.get_fingerprint(url)
+        if cached and cached[0] == page_hash:
+            METRICS.inc('rss_articles_unchanged_total', self.config_key)
+            logger.info(f"Article {url} unchanged since last scrape, skipping")
+            article = self.get_cached_article(url)
+            if article:
+                self.unchanged_articles.append(article)
+            return None
+        return response.content, response_encoding(response), page_hash, cached
 
-            title_elem = soup.select_one(self.site_config['title_selector']) or soup.find('h1') or soup.title
-            logger.debug(f"Title element found: {title_elem}")  # Debug log
-            if not title_elem:
-                html_path = os.path.join(self.site_log_dir, f"{self.domain}_{url.split('/')[-1]}_debug.html")
-                with open(html_path, 'w', encoding='utf-8') as f:
-                    f.write(str(soup))
-                logger.warning(f"No title found for {url}. Saved debug HTML to {html_path}")
-            title = self.clean_text(title_elem.text if title_elem else 'Untitled')
-
-            desc_elems = self.site_config['desc_selectors']
-            description = ''
-            for selector in desc_elems:
-                desc_elem = soup.select_one(selector)
-                if desc_elem:
-                    description = self.clean_text(desc_elem.get('content') or desc_elem.text)
-                    if len(description) > 20:
-                        break
+    def parse_article(self, fetched):
+        markup, encoding = fetched[:2]
+        return run_parse(extract_article, markup, encoding, self.site_config['title_selector'],
+                         self.site_config['desc_selectors'], self.site_config['date_selectors'])
 
-            pub_date = self.parse_article_date(soup)
+    def record_timings(self, timings):
+        for phase, seconds in timings.items():
+            self.phase_times[phase] = self.phase_times.get(phase, 0.0) + seconds
+        METRICS.observe('rss_parse_seconds', self.config_key, timings['parse'])
 
-            return {
-                'title': title,
-                'url': url,
-                'description': description[:500],
-                'pub_date': pub_date
-            }
+    def finish_article(self, url, fetched, job):
+        markup, _, page_hash, cached = fetched
+        try:
+            title, description, pub_date, timings = job.result()
         except Exception as e:
             logger.error(f"Failed to scrape article {url}: {e}")
             return None
+        self.record_timings(timings)
+        if title is None:
+            html_path = os.path.join(self.site_log_dir, f"{self.domain}_{url.split('/')[-1]}_debug.html")
+            with open(html_path, 'wb') as f:
+                f.write(markup)
+            logger.warning(f"No title found for {url}. Saved debug HTML to {html_path}")
+            title = 'Untitled'
+
+        # Without a date on the page, keep the one from the first scrape so the
+        # content hash (and the feed entry) stays stable across re-scrapes.
+        pub_date = pub_date or (cached and cached[1]) or datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S GMT')
+
+        return {
+            'title': title,
+            'url': url,
+            'description': description,
+            'pub_date': pub_date,
+            'page_hash': page_hash
+        }
+
+    def scrape_article_details(self, url, headers):
+        fetched = self.fetch_article(url, headers)
+        if not fetched:
+            return None
+        return self.finish_article(url, fetched, self.parse_article(fetched))
+
+    def scrape_articles(self, urls, headers, seen_urls):
+        """Fetch urls in order and parse each in the parse pool while the next one downloads.
+
+        Returns (new articles, finished); finished is False if the deadline or a
+        circuit breaker cut the list short.
+        """
+        new_articles = []
+        pending = []
+        queued = set()
+        finished = True
+
+        def collect(block):
+            while pending and (block or pending[0][2].done()):
+                url, fetched, job = pending.pop(0)
+                article = self.finish_article(url, fetched, job)
+                if article:
+                    new_articles.append(article)
+                    seen_urls.add(url)
+                    self.cache_article(article)
+                    METRICS.inc('rss_articles_added_total', self.config_key)
+                    logger.info(f"Added article: {article['title']}")
+
+        for url in urls:
+            if url in seen_urls or url in queued or not self.allowed(url):
+                continue
+            if self.out_of_time() or not self.host_available(url):
+                finished = False
+                break
+            queued.add(url)
+            fetched = self.fetch_article(url, headers)
+            if fetched:
+                pending.append((url, fetched, self.parse_article(fetched)))
+            collect(block=False)
+        collect(block=True)
+        return new_articles, finished
 
     def auto_detect_articles(self, soup):
-        article_links = soup.find_all('a', href=True)
-        articles = []
         include_patterns = [re.compile(p) for p in self.site_config['url_filters'].get('include_patterns', [])]
         exclude_patterns = [re.compile(p) for p in self.site_config['url_filters'].get('exclude_patterns', [])]
-
-        logger.info(f"Auto-detecting articles: found {len(article_links)} links")
-        for link in article_links:
-            href = link.get('href', '')
-            matches_include = not include_patterns or any(p.search(href) for p in include_patterns)
-            matches_exclude = any(p.search(href) for p in exclude_patterns)
-            full_url = urljoin(self.base_url, href)
-            if matches_include and not matches_exclude:
-                logger.debug(f"Included article link: {full_url}")
-                if full_url not in articles:
-                    articles.append(link)
-            else:
-                logger.debug(f"Excluded link: {full_url} (include={matches_include}, exclude={matches_exclude})")
+        with self.span('selector'):
+            articles = auto_detect_links(soup, include_patterns, exclude_patterns)
         logger.info(f"Auto-detected {len(articles)} article links")
         return articles
 
     def scrape(self, update_only=False, cache_first=False):
+        self.last_new_count = 0
+        self.unchanged_articles = []
+        self.phase_times = {}
+        self.retries_left = self.setting('retry_budget', 10)
+        self.feed_deadline = time.monotonic() + self.timeouts['feed']
+        self.deadline_hit = False
         if cache_first:
             articles = self.get_cached_articles()
             if articles:
@@ -218,13 +1645,24 @@ class BlogScraper:
         seen_urls = {a['url'] for a in articles}
         new_articles = []
         headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
+            'User-Agent': USER_AGENT,
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Referer': 'https://www.google.com/',
             'Accept-Language': 'en-US,en;q=0.9'
         }
 
-        if self.site_config.get('use_selenium', False):
+        native_articles = self.scrape_native_feed(headers, seen_urls)
+        if native_articles is not None:
+            new_articles.extend(native_articles)
+        elif self.setting('use_sitemap', False) or self.site_config.get('sitemap_url'):
+            new_articles.extend(self.scrape_sitemap(headers, seen_urls))
+        elif self.site_config.get('use_selenium', False):
+            from selenium import webdriver
+            from selenium.webdriver.common.by import By
+            from selenium.webdriver.support.ui import WebDriverWait
+            from selenium.webdriver.support import expected_conditions as EC
+            from selenium_stealth import stealth
+
             options = webdriver.ChromeOptions()
             options.add_argument('--headless')
             options.add_argument('--no-sandbox')
@@ -234,6 +1672,7 @@ class BlogScraper:
             options.add_experimental_option("excludeSwitches", ["enable-automation"])
             options.add_experimental_option('useAutomationExtension', False)
 
+            selenium_started = time.monotonic()
             driver = webdriver.Chrome(options=options)
             stealth(driver,
                     languages=["en-US", "en"],
@@ -263,7 +1702,7 @@ class BlogScraper:
 
                 max_loads = self.site_config.get('selenium_max_loads', float('inf'))
                 load_count = 0
-                while load_count < max_loads:
+                while load_count < max_loads and not self.out_of_time():
                     try:
                         load_more = WebDriverWait(driver, 10).until(
                             EC.element_to_be_clickable((By.XPATH, "//button[@data-testid='variants'] | //button[contains(text(), 'More Articles')]"))
@@ -276,7 +1715,10 @@ class BlogScraper:
                         logger.info("No more 'Load More' buttons found")
                         break
 
-                soup = BeautifulSoup(driver.page_source, 'lxml')
+                selenium_elapsed = time.monotonic() - selenium_started
+                self.phase_times['selenium'] = self.phase_times.get('selenium', 0.0) + selenium_elapsed
+                METRICS.observe('rss_selenium_seconds', self.config_key, selenium_elapsed)
+                soup = self.parse(driver.page_source)
                 html_path = os.path.join(self.site_log_dir, f"{self.domain}_full.html")
                 with open(html_path, 'w', encoding='utf-8') as f:
                     f.write(driver.page_source)
@@ -287,9 +1729,9 @@ class BlogScraper:
                     driver.quit()
                     try:
                         logger.info(f"Fetching {self.base_url} with requests as fallback")
-                        response = requests.get(self.base_url, headers=headers, timeout=10)
+                        response = self.fetch(self.base_url, headers)
                         response.raise_for_status()
-                        soup = BeautifulSoup(response.text, 'lxml')
+                        soup = self.parse(response.text)
                         html_path = os.path.join(self.site_log_dir, f"{self.domain}_fallback.html")
                         with open(html_path, 'w', encoding='utf-8') as f:
                             f.write(response.text)
@@ -299,21 +1741,23 @@ class BlogScraper:
                         return articles
                 else:
                     section_selector = self.site_config.get('section_selector')
-                    if section_selector:
-                        section = soup.select_one(section_selector)
-                        if section:
-                            article_links = section.select(self.site_config['article_selector'])
+                    with self.span('selector'):
+                        if section_selector:
+                            section = soup.select_one(section_selector)
+                            if section:
+                                article_links = section.select(self.site_config['article_selector'])
+                            else:
+                                logger.warning(f"Section {section_selector} not found")
+                                article_links = soup.select(self.site_config['article_selector'])
                         else:
-                            logger.warning(f"Section {section_selector} not found")
                             article_links = soup.select(self.site_config['article_selector'])
-                    else:
-                        article_links = soup.select(self.site_config['article_selector'])
 
                     if not article_links:
                         article_links = self.auto_detect_articles(soup)
                         logger.info("Using auto-detected article links")
 
                     exclude_patterns = [re.compile(p) for p in self.site_config['url_filters'].get('exclude_patterns', [])]
+                    article_urls = []
                     for link in article_links:
                         href = link.get('href')
                         if not href:
@@ -321,23 +1765,24 @@ class BlogScraper:
                         full_url = urljoin(self.base_url, href)
                         if any(p.search(full_url) for p in exclude_patterns):
                             continue
+                        if self.out_of_time() or not self.host_available(full_url):
+                            break
                         if full_url in seen_urls:
                             cached_article = next((a for a in articles if a['url'] == full_url), None)
                             if cached_article and (not cached_article.get('title') or cached_article.get('title') == 'Untitled'):
+                                if not self.title_retry_due(full_url):
+                                    continue
                                 logger.info(f"Re-scraping {full_url} due to missing title")
                                 article = self.scrape_article_details(full_url, headers)
                                 if article:
                                     new_articles.append(article)
                                     self.cache_article(article)
                                     logger.info(f"Updated article: {article['title']}")
+                                if not article or article['title'] == 'Untitled':
+                                    self.schedule_title_retry(full_url)
                             continue
-                        article = self.scrape_article_details(full_url, headers)
-                        if article:
-                            new_articles.append(article)
-                            seen_urls.add(full_url)
-                            self.cache_article(article)
-                            logger.info(f"Added article: {article['title']}")
-                        time.sleep(self.delay)
+                        article_urls.append(full_url)
+                    new_articles.extend(self.scrape_articles(article_urls, headers, seen_urls)[0])
 
             finally:
                 if 'driver' in locals():
@@ -357,13 +1802,12 @@ class BlogScraper:
                     f"{self.base_url}?p={page_num}",
                 ]
 
-                soup = None
+                response = None
                 for pattern in pagination_patterns:
                     try:
                         logger.info(f"Fetching {pattern} with requests")
-                        response = requests.get(pattern, headers=headers, timeout=10, allow_redirects=True)
+                        response = self.fetch(pattern, headers, allow_redirects=True)
                         if response.status_code == 200:
-                            soup = BeautifulSoup(response.text, 'lxml')
                             url = pattern
                             html_path = os.path.join(self.site_log_dir, f"{self.domain}_page_{page_num}.html")
                             with open(html_path, 'w', encoding='utf-8') as f:
@@ -372,85 +1816,292 @@ class BlogScraper:
                             break
                         else:
                             logger.warning(f"Failed to fetch {pattern}: Status code {response.status_code}")
+                        response = None
                     except Exception as e:
                         logger.error(f"Error fetching {pattern}: {e}")
                         continue
 
-                if not soup:
+                if response is None:
                     logger.warning(f"No valid page found for page {page_num}. Stopping.")
                     break
 
                 logger.info(f"Scraping page {page_num}: {url}")
-                blog_type = self.detect_blog_type(soup)
+                url_filters = self.site_config['url_filters']
+                try:
+                    blog_type, article_urls, has_next_page, auto_detected, timings = run_parse(
+                        extract_listing, response.content, response_encoding(response), self.base_url,
+                        self.site_config['article_selector'], self.site_config['next_page_selector'],
+                        url_filters.get('include_patterns', []), url_filters.get('exclude_patterns', [])).result()
+                except Exception as e:
+                    logger.error(f"Failed to parse page {page_num}: {e}")
+                    break
+                self.record_timings(timings)
                 logger.info(f"Detected blog type: {blog_type}")
-
-                article_selector = self.site_config['article_selector']
-                article_links = soup.select(article_selector)
-                if not article_links:
-                    article_links = self.auto_detect_articles(soup)
-                    logger.info("Using auto-detected article links.")
-
-                if not article_links:
+                if auto_detected:
+                    logger.info(f"Using {len(article_urls)} auto-detected article links.")
+                if not article_urls:
                     logger.warning(f"No articles found on page {page_num}.")
 
-                exclude_patterns = [re.compile(p) for p in self.site_config['url_filters'].get('exclude_patterns', [])]
-                for link in article_links:
-                    href = link.get('href')
-                    if not href:
-                        continue
-                    full_url = urljoin(self.base_url, href)
+                exclude_patterns = [re.compile(p) for p in url_filters.get('exclude_patterns', [])]
+                wanted = []
+                for full_url in article_urls:
                     if any(p.search(full_url) for p in exclude_patterns):
                         logger.info(f"Skipping unwanted link: {full_url}")
                         continue
-                    if full_url in seen_urls:
-                        continue
+                    wanted.append(full_url)
+                page_articles, finished = self.scrape_articles(wanted, headers, seen_urls)
+                new_articles.extend(page_articles)
+                logger.info(f"Next page found: {has_next_page}")
 
-                    article = self.scrape_article_details(full_url, headers)
-                    if article:
-                        new_articles.append(article)
-                        seen_urls.add(full_url)
-                        self.cache_article(article)
-                        logger.info(f"Added article: {article['title']}")
-
-                    time.sleep(self.delay)
-
-                next_page = soup.select_one(self.site_config['next_page_selector'])
-                logger.info(f"Next page element: {next_page}")
-
-                if not next_page or (self.max_pages and page_num >= self.max_pages):
+                if not finished:
+                    break
+                if not has_next_page or (self.max_pages and page_num >= self.max_pages):
                     logger.info("No more pages to scrape.")
                     break
+                if self.out_of_time():
+                    break
                 page_num += 1
-                time.sleep(self.delay)
 
         articles.extend(new_articles)
+        # An --update-only run starts from nothing, so pages that have not changed since the
+        # last scrape still belong in the result.
+        known_urls = {a['url'] for a in articles}
+        articles.extend(a for a in self.unchanged_articles if a['url'] not in known_urls)
+        self.last_new_count = len(new_articles)
+        try:
+            self.apply_retention()
+        except sqlite3.Error as e:
+            logger.error(f"Retention pass failed for {self.config_key}: {e}")
         logger.info(f"Total articles scraped: {len(articles)}")
         return articles
 
     def generate_rss(self):
-        fg = FeedGenerator()
-        fg.title(self.feed_title)
-        fg.link(href=self.base_url, rel='alternate')
-        fg.description(self.feed_description)
-        fg.language='en'
+        from feedgen.feed import FeedGenerator
 
         articles = self.get_cached_articles()
-        # Sort articles by publication date (oldest first)
-        articles.sort(key=lambda x: parse_date(x['pub_date']), reverse=False)
-
-        for article in articles:
-            fe = fg.add_entry()
-            fe.title(article['title'])
-            fe.link(href=article['url'])
-            fe.guid(article['url'], permalink=True)
-            fe.description(article['description'] or 'No description available.')
-            fe.pubDate(article['pub_date'])
-
-        output_file = os.path.join(self.output_dir, f"{self.config_key.replace('/', '-').replace('.', '-')}-rss.xml")
-        fg.rss_file(output_file, pretty=True)
+        with self.span('feed_render', 'rss_feed_render_seconds'):
+            fg = FeedGenerator()
+            fg.title(self.feed_title)
+            fg.link(href=self.base_url, rel='alternate')
+            fg.description(self.feed_description)
+            fg.language='en'
+
+            # Sort articles by publication date (oldest first)
+            articles.sort(key=lambda x: parse_date(x['pub_date']), reverse=False)
+
+            for article in articles:
+                fe = fg.add_entry()
+                fe.title(article['title'])
+                fe.link(href=article['url'])
+                fe.guid(article['url'], permalink=True)
+                fe.description(article['description'] or 'No description available.')
+                fe.pubDate(article['pub_date'])
+
+            output_file = os.path.join(self.output_dir, f"{self.config_key.replace('/', '-').replace('.', '-')}-rss.xml")
+            fg.rss_file(output_file, pretty=True)
         logger.info(f"Generated feed with {len(articles)} articles: {output_file}")
         return output_file, fg
 
+class FeedScheduler:
+    """Keeps one warm BlogScraper per feed and refreshes each feed on its own adaptive interval."""
+
+    def __init__(self, args, stop_event):
+        self.args = args
+        self.stop_event = stop_event
+        self.scrapers = {}
+        self.feeds = {}
+        self.queue = []
+        self.due = {}
+        self.seq = itertools.count()
+        self.sources_mtime = None
+
+    def sources_changed(self):
+        config_path = self.args.config or os.path.join(BASE_DIR, 'config.json')
+        mtimes = []
+        for path in (os.path.join(BASE_DIR, 'feeds.json'), config_path):
+            try:
+                mtimes.append(os.path.getmtime(path))
+            except OSError:
+                mtimes.append(None)
+        if mtimes == self.sources_mtime:
+            return False
+        self.sources_mtime = mtimes
+        return True
+
+    def sync_feeds(self):
+        """Reload feeds.json and config.json when they change, keeping scrapers for unchanged feeds."""
+        if not self.sources_changed():
+            return
+        config_path = self.args.config or os.path.join(BASE_DIR, 'config.json')
+        try:
+            with open(config_path, 'r') as f:
+                allowed_config_keys = set(json.load(f).keys()) - {'default'}
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not reload config file {config_path}: {e}")
+            return
+
+        feeds = {}
+        for feed in load_feeds():
+            config_key = feed.get('config_key')
+            if not feed.get('enabled', True):
+                continue
+            if config_key not in allowed_config_keys:
+                logger.info(f"Skipping {feed['url']} as its config_key '{config_key}' is not defined in config.json.")
+                continue
+            feeds[config_key] = feed
+
+        # Config may have changed, so rebuild every scraper on its next run.
+        self.scrapers = {}
+        for config_key in set(self.feeds) - set(feeds):
+            self.due.pop(config_key, None)
+            logger.info(f"Feed {config_key} removed from schedule")
+        added = set(feeds) - set(self.feeds)
+        self.feeds = feeds
+        for config_key in added:
+            self.schedule(config_key, self.initial_due(config_key))
+        logger.info(f"Scheduling {len(self.feeds)} feeds ({len(added)} new)")
+
+    def schedule(self, config_key, due):
+        self.due[config_key] = due
+        heapq.heappush(self.queue, (due, next(self.seq), config_key))
+
+    def get_scraper(self, config_key):
+        scraper = self.scrapers.get(config_key)
+        if scraper is None:
+            feed = self.feeds[config_key]
+            scraper = BlogScraper(
+                feed['url'],
+                config_key,
+                self.args.output_dir,
+                feed.get('max_pages', self.args.max_pages),
+                self.args.delay,
+                self.args.config,
+                feed_title=feed['title'],
+                feed_description=feed['description'],
+                min_delay=self.args.min_delay
+            )
+            self.scrapers[config_key] = scraper
+        return scraper
+
+    def initial_due(self, config_key):
+        now = time.time()
+        # Spread the first round out so a restart does not hit every site at once.
+        stagger = random.uniform(0, min(60.0, self.args.min_interval))
+        try:
+            scraper = self.get_scraper(config_key)
+        except ValueError:
+            return now + stagger
+        next_refresh = scraper.get_state('next_refresh')
+        if next_refresh and next_refresh > now:
+            return next_refresh
+        return now + stagger
+
+    def next_interval(self, scraper, feed, new_count, failed):
+        base = scraper.get_state('refresh_interval', feed.get('refresh_interval', self.args.interval))
+        if failed:
+            failures = scraper.get_state('consecutive_failures', 0) + 1
+            scraper.set_state('consecutive_failures', failures)
+            interval = base * (2 ** min(failures, 10))
+        else:
+            scraper.set_state('consecutive_failures', 0)
+            # Poll busy feeds more often and quiet feeds less often.
+            if new_count > 0:
+                base = base / 2
+            else:
+                base = base * 1.5
+            base = max(self.args.min_interval, min(self.args.max_interval, base))
+            scraper.set_state('refresh_interval', base)
+            interval = base
+        interval = max(self.args.min_interval, min(self.args.max_interval, interval))
+        return interval * random.uniform(0.9, 1.1)
+
+    def run_feed(self, config_key):
+        feed = self.feeds[config_key]
+        try:
+            scraper = self.get_scraper(config_key)
+        except ValueError as e:
+            logger.error(f"Failed to initialize scraper for {feed['url']}: {e}")
+            return None
+
+        failed = False
+        try:
+            articles = scraper.scrape(self.args.update_only)
+            if articles:
+                output_file, _ = scraper.generate_rss()
+                logger.info(f"Generated feed with {len(articles)} articles: {output_file}")
+            elif scraper.get_cached_articles():
+                # Nothing new or changed, but the feed still has its cached articles: a quiet feed, not a failure.
+                logger.info(f"No changes for {feed['url']}")
+            else:
+                logger.warning(f"No articles found for {feed['url']}")
+                failed = True
+        except Exception as e:
+            logger.error(f"Scrape of {feed['url']} failed: {e}")
+            failed = True
+
+        new_count = getattr(scraper, 'last_new_count', 0)
+        interval = self.next_interval(scraper, feed, new_count, failed)
+        due = time.time() + interval
+        scraper.set_state('next_refresh', due)
+        logger.info(f"Next refresh of {config_key} in {interval / 60:.1f} minutes ({new_count} new articles)")
+        return due
+
+    def run_forever(self):
+        self.sync_feeds()
+        while not self.stop_event.is_set():
+            self.sync_feeds()
+            if not self.queue:
+                self.stop_event.wait(self.args.min_interval)
+                continue
+            due, _, config_key = self.queue[0]
+            wait = due - time.time()
+            if wait > 0:
+                # Wake up periodically to notice feeds.json edits.
+                self.stop_event.wait(min(wait, 60))
+                continue
+            heapq.heappop(self.queue)
+            if self.due.get(config_key) != due:
+                # Stale entry for a feed that was removed or rescheduled.
+                continue
+            del self.due[config_key]
+            due = self.run_feed(config_key)
+            if due is not None:
+                self.schedule(config_key, due)
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval and counts collapsed stacks (flamegraph.pl format)."""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                key = ';'.join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def write_collapsed(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+
 class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
         if self.path == '/' or self.path == '/index.html':
@@ -503,8 +2154,9 @@ class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
 def check_auth(username, password):
     return username == FLASK_USERNAME and password == FLASK_PASSWORD
 
-@app.route('/generate-feed')
 def rss_generator():
+    from flask import request, Response
+
     target_url = request.args.get('url')
     if not target_url:
         return "Please provide a URL parameter", 400
@@ -519,8 +2171,9 @@ def rss_generator():
     except Exception as e:
         return f"Error generating feed: {str(e)}", 500
 
-@app.route('/add-feed', methods=['POST'])
 def add_feed():
+    from flask import request, abort
+
     auth = request.authorization
     if not auth or not check_auth(auth.username, auth.password):
         abort(401)
@@ -535,7 +2188,7 @@ def add_feed():
     except FileNotFoundError:
         feeds = []
 
-    if any(feed['url'] == data['url'] for feed in feeds):
+    if any(feed.get('url') == data['url'] for feed in feeds):
         return "Feed already exists", 400
 
     config_key = data['url'].replace('https://', '').replace('http://', '').rstrip('/')
@@ -552,8 +2205,9 @@ def add_feed():
 
     return "Feed added successfully", 200
 
-@app.route('/remove-feed', methods=['POST'])
 def remove_feed():
+    from flask import request, abort
+
     auth = request.authorization
     if not auth or not check_auth(auth.username, auth.password):
         abort(401)
@@ -568,14 +2222,15 @@ def remove_feed():
     except FileNotFoundError:
         return "No feeds configured", 404
 
-    feeds = [feed for feed in feeds if feed['url'] != data['url']]
+    feeds = [feed for feed in feeds if feed.get('url') != data['url']]
     with open(feed_config_path, 'w') as f:
         json.dump(feeds, f, indent=4)
 
     return "Feed removed successfully", 200
 
-@app.route('/generate-opml')
 def generate_opml():
+    from flask import Response
+
     feed_config_path = os.path.join(BASE_DIR, 'feeds.json')
     try:
         with open(feed_config_path, 'r') as f:
@@ -591,7 +2246,7 @@ def generate_opml():
     opml += '  <body>\n'
 
     for feed in feeds:
-        if not feed.get('enabled', True):
+        if not feed.get('enabled', True) or 'bundle' in feed:
             continue
         config_key = feed['config_key']
         xml_url = f"http://{BIND_ADDRESS}/rss/{config_key.replace('/', '-').replace('.', '-')}-rss.xml"
@@ -602,10 +2257,96 @@ def generate_opml():
 
     return Response(opml, mimetype='application/xml')
 
-def run_flask(bind_address='0.0.0.0'):
+def metrics():
+    from flask import Response
+
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+def aggregate_feed():
+    from flask import request, Response, current_app
+
+    bundle_name = request.args.get('bundle')
+    if bundle_name:
+        bundle = load_bundles().get(bundle_name)
+        if not bundle:
+            return f"Unknown bundle: {bundle_name}", 404
+        config_keys = bundle.get('keys', [])
+        title = bundle.get('title', bundle_name)
+        description = bundle.get('description', f"Combined feed for {bundle_name}")
+    else:
+        config_keys = [key.strip() for key in request.args.get('keys', '').split(',') if key.strip()]
+        title = f"Combined feed: {', '.join(config_keys)}"
+        description = f"Newest articles from {', '.join(config_keys)}"
+    if not config_keys:
+        return "Please provide a keys or bundle parameter", 400
+    try:
+        limit = min(max(1, int(request.args.get('limit', AGGREGATE_DEFAULT_LIMIT))), AGGREGATE_MAX_LIMIT)
+    except ValueError:
+        return "limit must be an integer", 400
+    try:
+        rss = render_aggregate_feed(title, description, request.url, config_keys, limit,
+                                    current_app.config['OUTPUT_DIR'], current_app.config['SCRAPER_CONFIG'])
+    except ValueError as e:
+        return f"Error generating feed: {str(e)}", 404
+    return Response(rss, mimetype='application/rss+xml')
+
+def search():
+    from flask import request, jsonify, current_app
+
+    text = request.args.get('q', '').strip()
+    if not text:
+        return "Please provide a q parameter", 400
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(max(1, int(request.args.get('per_page', 20))), SEARCH_MAX_PER_PAGE)
+    except ValueError:
+        return "page and per_page must be integers", 400
+    started = time.perf_counter()
+    results, has_more = get_search_index(current_app.config['OUTPUT_DIR']).search(text, page, per_page, request.args.get('feed'))
+    return jsonify({
+        'query': text,
+        'page': page,
+        'per_page': per_page,
+        'has_more': has_more,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2),
+        'results': results,
+    })
+
+def create_app(output_dir='rss_feeds', config_file=None):
+    """Build the Flask app serving feeds from output_dir with the site config in config_file.
+
+    WSGI servers can load `rss_generator:create_app()`, or `rss_generator:app` for the defaults.
+    """
+    from flask import Flask
+
+    app = Flask(__name__)
+    app.config['OUTPUT_DIR'] = output_dir
+    app.config['SCRAPER_CONFIG'] = config_file
+    app.add_url_rule('/generate-feed', view_func=rss_generator)
+    app.add_url_rule('/add-feed', view_func=add_feed, methods=['POST'])
+    app.add_url_rule('/remove-feed', view_func=remove_feed, methods=['POST'])
+    app.add_url_rule('/generate-opml', view_func=generate_opml)
+    app.add_url_rule('/metrics', view_func=metrics)
+    app.add_url_rule('/search', view_func=search)
+    app.add_url_rule('/aggregate-feed', view_func=aggregate_feed)
+    return app
+
+APP_LOCK = threading.Lock()
+
+def __getattr__(name):
+    # `app` is built on first access, so importing the module for a scrape never loads Flask.
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with APP_LOCK:
+        if 'app' not in globals():
+            globals()['app'] = create_app()
+    return globals()['app']
+
+def run_flask(bind_address='0.0.0.0', output_dir='rss_feeds', config_file=None):
+    app = create_app(output_dir, config_file)
     app.run(host=bind_address, port=5001, debug=False)
 
-def load_feeds():
+def load_feed_entries():
     feed_config_path = os.path.join(BASE_DIR, 'feeds.json')
     try:
         with open(feed_config_path, 'r') as f:
@@ -614,26 +2355,220 @@ def load_feeds():
         logger.error("feeds.json not found. Please create it with a list of feeds.")
         return []
 
+def load_feeds():
+    return [entry for entry in load_feed_entries() if 'bundle' not in entry]
+
+def load_bundles():
+    return {entry['bundle']: entry for entry in load_feed_entries() if 'bundle' in entry}
+
+AGGREGATE_CACHE = {}
+AGGREGATE_CACHE_LOCK = threading.Lock()
+
+def merge_feeds(members, limit):
+    """k-way merge of the members' date-ordered cursors; reads at most limit rows from each.
+
+    members are (connection, config_key, feed_title) tuples.
+    """
+    cursors = [iter_recent_articles(conn, config_key, limit, feed_title) for conn, config_key, feed_title in members]
+    return list(itertools.islice(heapq.merge(*cursors, key=lambda a: a['pub_ts'], reverse=True), limit))
+
+def aggregate_members(config_keys, output_dir, config_file):
+    """(connection, config_key, feed_title) for each member, read straight from the feed databases."""
+    config_path = config_file or os.path.join(BASE_DIR, 'config.json')
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    feeds = {feed.get('config_key'): feed for feed in load_feeds()}
+    output_dir = os.path.join(BASE_DIR, output_dir)
+    members = []
+    for config_key in config_keys:
+        site_config = config.get(config_key)
+        if not site_config:
+            raise ValueError(f"No configuration found for {config_key}")
+        db_path = feed_db_path(output_dir, config_key, config)
+        if not os.path.exists(db_path):
+            continue  # never scraped, so nothing to merge
+        feed_title = feeds.get(config_key, {}).get('title') or site_config.get('feed_title', f"{config_key} Feed")
+        members.append((get_connection(db_path), config_key, feed_title))
+    return members
+
+def render_aggregate_feed(title, description, link, config_keys, limit, output_dir='rss_feeds', config_file=None):
+    """RSS for the newest limit articles across config_keys, cached until the merged articles change."""
+    from feedgen.feed import FeedGenerator
+
+    # The merge is a few indexed reads; rendering is what the cache saves. Keying on the merged
+    # rows catches a rewrite that a count or timestamp would miss when it lands in the same second.
+    articles = merge_feeds(aggregate_members(config_keys, output_dir, config_file), limit)
+    cache_key = (title, link, tuple(config_keys), limit)
+    signature = hashlib.sha1(json.dumps(
+        [[a['url'], a['title'], a['description'], a['pub_date'], a['feed_title']] for a in articles]
+    ).encode('utf-8')).hexdigest()
+    with AGGREGATE_CACHE_LOCK:
+        cached = AGGREGATE_CACHE.get(cache_key)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    started = time.monotonic()
+    fg = FeedGenerator()
+    fg.title(title)
+    fg.link(href=link, rel='self')
+    fg.description(description)
+    for article in articles:
+        fe = fg.add_entry(order='append')
+        fe.title(f"{article['title']} ({article['feed_title']})")
+        fe.link(href=article['url'])
+        fe.guid(article['url'], permalink=True)
+        fe.description(article['description'] or 'No description available.')
+        fe.pubDate(article['pub_date'])
+    rss = fg.rss_str(pretty=True)
+    METRICS.observe('rss_feed_render_seconds', 'aggregate', time.monotonic() - started)
+
+    with AGGREGATE_CACHE_LOCK:
+        AGGREGATE_CACHE.pop(cache_key, None)
+        AGGREGATE_CACHE[cache_key] = (signature, rss)
+        while len(AGGREGATE_CACHE) > AGGREGATE_CACHE_SIZE:
+            AGGREGATE_CACHE.pop(next(iter(AGGREGATE_CACHE)))
+    return rss
+
+def serve_feeds(bind_address, http_port, output_dir):
+    Handler = functools.partial(CustomHTTPRequestHandler, directory=os.path.join(BASE_DIR, output_dir))
+    for port in [http_port, 8080, 8081]:
+        try:
+            with socketserver.TCPServer((bind_address, port), Handler) as httpd:
+                httpd.allow_reuse_address = True
+                httpd.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                logger.info(f"Serving RSS feeds at http://{bind_address}:{port}")
+                httpd.serve_forever()
+            break
+        except OSError as e:
+            logger.warning(f"Port {port} failed: {e}")
+            if port == 8081:
+                raise Exception("All ports failed")
+
+def run_daemon(args):
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info(f"Received signal {signum}, stopping scheduler.")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    os.makedirs(os.path.join(BASE_DIR, args.output_dir), exist_ok=True)
+    server_thread = threading.Thread(target=serve_feeds, args=(args.bind_address, args.http_port, args.output_dir), daemon=True)
+    server_thread.start()
+    logger.info(f"Starting feed scheduler (interval {args.min_interval:.0f}-{args.max_interval:.0f}s)")
+    FeedScheduler(args, stop_event).run_forever()
+
+def print_phase_breakdown(phase_times, wall):
+    print(f"\nPhase breakdown ({wall:.2f}s wall):")
+    accounted = 0.0
+    for phase in ['network', 'selenium', 'parse', 'selector', 'date_parse', 'db', 'feed_render', 'delay']:
+        seconds = phase_times.get(phase, 0.0)
+        accounted += seconds
+        print(f"  {phase:<12} {seconds:8.3f}s {100 * seconds / wall if wall else 0:6.1f}%")
+    other = max(wall - accounted, 0.0)
+    print(f"  {'other':<12} {other:8.3f}s {100 * other / wall if wall else 0:6.1f}%")
+
+def run_profile(args):
+    feed = next((f for f in load_feeds() if f.get('config_key') == args.profile), None)
+    if not feed:
+        logger.error(f"No feed with config_key '{args.profile}' in feeds.json.")
+        return
+
+    scraper = BlogScraper(
+        feed['url'],
+        args.profile,
+        args.output_dir,
+        feed.get('max_pages', args.max_pages),
+        args.delay,
+        args.config,
+        feed_title=feed['title'],
+        feed_description=feed['description'],
+        min_delay=args.min_delay
+    )
+
+    profile_dir = os.path.join(LOGS_DIR, 'profile')
+    os.makedirs(profile_dir, exist_ok=True)
+    stem = f"{args.profile.replace('/', '-').replace('.', '-')}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+
+    def run_once():
+        articles = scraper.scrape(args.update_only)
+        if articles:
+            scraper.generate_rss()
+        return articles
+
+    started = time.monotonic()
+    if args.profiler == 'sampling':
+        output_path = args.profile_output or os.path.join(profile_dir, f"{stem}.collapsed")
+        sampler = SamplingProfiler(threading.get_ident())
+        sampler.start()
+        try:
+            articles = run_once()
+        finally:
+            sampler.stop()
+        sampler.write_collapsed(output_path)
+        print(f"Wrote {sum(sampler.stacks.values())} samples to {output_path}")
+    else:
+        import cProfile
+        import pstats
+
+        output_path = args.profile_output or os.path.join(profile_dir, f"{stem}.pstats")
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            articles = run_once()
+        finally:
+            profiler.disable()
+        profiler.dump_stats(output_path)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+        print(f"Wrote profile to {output_path}")
+    wall = time.monotonic() - started
+
+    print(f"Scraped {len(articles or [])} articles ({scraper.last_new_count} new) for {args.profile}")
+    print_phase_breakdown(scraper.phase_times, wall)
+
 def main():
     parser = argparse.ArgumentParser(description="Generate and serve RSS feeds from blogs.")
     parser.add_argument('--output-dir', default='rss_feeds', help="Directory to save RSS files")
     parser.add_argument('--http-port', type=int, default=8080, help="Port for HTTP server")
     parser.add_argument('--max-pages', type=int, help="Maximum pages to scrape (optional, overridden by feeds.json)")
-    parser.add_argument('--delay', type=float, default=1.0, help="Delay between requests (seconds)")
+    parser.add_argument('--delay', type=float, default=1.0, help="Delay between requests to a host whose robots.txt cannot be read (seconds)")
+    parser.add_argument('--min-delay', type=float, default=0.5, help="Shortest delay between requests to one host, used when robots.txt sets no Crawl-delay (seconds)")
     parser.add_argument('--config', help="Path to JSON config file")
     parser.add_argument('--update-only', action='store_true', help="Only scrape new articles")
     parser.add_argument('--cache-first', action='store_true', help="Use cached articles if available")
     parser.add_argument('--no-flask', action='store_true', help="Disable Flask web interface")
     parser.add_argument('--bind-address', default=BIND_ADDRESS, help="IP address to bind servers")
+    parser.add_argument('--daemon', action='store_true', help="Keep running and refresh each feed on its own schedule")
+    parser.add_argument('--interval', type=float, default=3600, help="Initial refresh interval per feed in daemon mode (seconds)")
+    parser.add_argument('--min-interval', type=float, default=900, help="Shortest refresh interval in daemon mode (seconds)")
+    parser.add_argument('--max-interval', type=float, default=86400, help="Longest refresh interval in daemon mode (seconds)")
+    parser.add_argument('--profile', metavar='CONFIG_KEY', help="Scrape a single feed under a profiler and print a phase breakdown")
+    parser.add_argument('--profiler', choices=['cprofile', 'sampling'], default='cprofile', help="Profiler used by --profile")
+    parser.add_argument('--profile-output', help="Where --profile writes its pstats/collapsed-stack file (default: logs/profile/)")
+    parser.add_argument('--rebuild-search-index', action='store_true', help="Re-index every cached article for /search and exit")
+    parser.add_argument('--parse-workers', type=int, default=0, help="Processes used to parse HTML (0 parses in the scraping thread)")
     args = parser.parse_args()
+    configure_parse_pool(args.parse_workers)
+
+    if args.profile:
+        run_profile(args)
+        return
+
+    if args.rebuild_search_index:
+        rebuild_search_index(args.output_dir)
+        return
 
     try:
         if not args.no_flask:
-            flask_thread = threading.Thread(target=run_flask, args=(args.bind_address,), daemon=True)
+            flask_thread = threading.Thread(target=run_flask, args=(args.bind_address, args.output_dir, args.config), daemon=True)
             flask_thread.start()
             logger.info(f"Flask server running at http://{args.bind_address}:5001")
             time.sleep(3)
 
+        if args.daemon:
+            run_daemon(args)
+            return
+
         feeds = [feed for feed in load_feeds() if feed.get('enabled', True)]
         if not feeds:
             logger.error("No enabled feeds to process. Exiting.")
@@ -666,7 +2601,8 @@ def main():
                     args.delay,
                     args.config,
                     feed_title=feed['title'],
-                    feed_description=feed['description']
+                    feed_description=feed['description'],
+                    min_delay=args.min_delay
                 )
                 articles = scraper.scrape(args.update_only, args.cache_first)
                 if articles:
@@ -678,20 +2614,7 @@ def main():
                 logger.error(f"Failed to initialize scraper for {feed['url']}: {e}")
                 continue
 
-        os.chdir(os.path.join(BASE_DIR, args.output_dir))
-        Handler = CustomHTTPRequestHandler
-        for port in [args.http_port, 8080, 8081]:
-            try:
-                with socketserver.TCPServer((args.bind_address, port), Handler) as httpd:
-                    httpd.allow_reuse_address = True
-                    httpd.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                    logger.info(f"Serving RSS feeds at http://{args.bind_address}:{port}")
-                    httpd.serve_forever()
-                break
-            except OSError as e:
-                logger.warning(f"Port {port} failed: {e}")
-                if port == 8081:
-                    raise Exception("All ports failed")
+        serve_feeds(args.bind_address, args.http_port, args.output_dir)
 
     except KeyboardInterrupt:
         logger.info("Stopped by user.")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Benchmark article parsing in-process versus the --parse-workers process pool.
+
+Parses the same set of article pages with extract_article once per worker
+count and reports throughput and speedup over in-process parsing (0 workers):
+
+    python scripts/bench_parse_pool.py --workers 0,1,2,4,8
+    python scripts/bench_parse_pool.py --archive bench/replay.zip --json bench/parse_pool.json
+
+Pages come from the HTML bodies of a replay_bench archive when --archive is
+given, otherwise from synthetic article pages of roughly --page-kb each.
+Pool start-up is excluded from the timings; speedup is bounded by the number
+of cores on the machine, which is printed with the results.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+import zipfile
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_DIR)
+
+import rss_generator  # noqa: E402
+
+WORDS = ('model data agent inference training latency token vector graph cache '
+         'pipeline scale benchmark research update release open source feature').split()
+
+
+def synthetic_page(index, page_kb, rng):
+    paragraphs = []
+    size = 0
+    while size < page_kb * 1024:
+        text = ' '.join(rng.choices(WORDS, k=80))
+        paragraphs.append(f'<div class="block"><p class="body">{text} <a href="/tag/{rng.choice(WORDS)}">tag</a></p></div>')
+        size += len(paragraphs[-1])
+    nav = ''.join(f'<li><a href="/blog/post-{i}">Related {i}</a></li>' for i in range(50))
+    return f"""<!DOCTYPE html><html><head><title>Post {index}</title>
+<meta name="description" content="Synthetic article {index} used to benchmark the parse pool.">
+<meta property="article:published_time" content="2026-10-{index % 28 + 1:02d}T10:00:00Z"></head>
+<body><nav><ul>{nav}</ul></nav><article><h1 class="post-title">Synthetic post {index}</h1>
+<time datetime="2026-10-{index % 28 + 1:02d}T10:00:00Z">October</time>{''.join(paragraphs)}</article></body></html>""".encode('utf-8')
+
+
+def archive_pages(path):
+    with zipfile.ZipFile(path) as archive:
+        index = json.loads(archive.read('index.json'))
+        pages = []
+        for entry in index['exchanges'].values():
+            content_type = next((v for k, v in entry['headers'].items() if k.lower() == 'content-type'), '')
+            if entry['status'] == 200 and 'html' in content_type:
+                pages.append(archive.read(entry['body']))
+    return pages, index['config'].get('default', {})
+
+
+def run(pages, site_config, workers):
+    rss_generator.configure_parse_pool(workers)
+    args = (site_config['title_selector'], site_config['desc_selectors'], site_config['date_selectors'])
+    # Start every worker process before timing so spawn cost is not counted.
+    for job in [rss_generator.run_parse(rss_generator.extract_article, pages[0], None, *args) for _ in range(max(workers, 1))]:
+        job.result()
+    started = time.perf_counter()
+    jobs = [rss_generator.run_parse(rss_generator.extract_article, page, None, *args) for page in pages]
+    results = [job.result() for job in jobs]
+    elapsed = time.perf_counter() - started
+    rss_generator.configure_parse_pool(0)
+    untitled = sum(1 for result in results if result[0] is None)
+    return {'workers': workers, 'seconds': elapsed, 'pages_per_second': len(pages) / elapsed, 'untitled': untitled}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark in-process versus process-pool HTML parsing.")
+    parser.add_argument('--workers', default='0,1,2,4,8', help="Comma-separated worker counts to compare")
+    parser.add_argument('--archive', help="Use the HTML bodies of a replay_bench archive instead of synthetic pages")
+    parser.add_argument('--pages', type=int, default=200, help="Number of synthetic pages")
+    parser.add_argument('--page-kb', type=int, default=120, help="Approximate size of each synthetic page")
+    parser.add_argument('--json', help="Write the report as JSON to this path")
+    args = parser.parse_args()
+    rss_generator.logger.setLevel(logging.WARNING)
+
+    if args.archive:
+        pages, site_config = archive_pages(args.archive)
+    else:
+        rng = random.Random(0)
+        pages = [synthetic_page(i, args.page_kb, rng) for i in range(args.pages)]
+        with open(os.path.join(PROJECT_DIR, 'config.json')) as f:
+            site_config = json.load(f)['default']
+    if not pages:
+        print("No HTML pages to parse.")
+        return 1
+
+    total_kb = sum(len(page) for page in pages) / 1024
+    print(f"{len(pages)} pages, {total_kb:.0f} KiB total, {os.cpu_count()} CPUs")
+    report = {'pages': len(pages), 'kib': total_kb, 'cpus': os.cpu_count(), 'runs': []}
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(',')]:
+        result = run(pages, site_config, workers)
+        baseline = baseline or result['seconds']
+        result['speedup'] = baseline / result['seconds']
+        report['runs'].append(result)
+        print(f"workers={workers:<2} {result['seconds']:7.2f}s  {result['pages_per_second']:7.1f} pages/s  "
+              f"speedup {result['speedup']:.2f}x")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
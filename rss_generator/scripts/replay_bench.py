@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""Offline replay benchmark for BlogScraper.
+
+Record the HTTP exchanges of a set of feeds into a fixture archive once:
+
+    python scripts/replay_bench.py record --archive bench/replay.zip www.forbes.com/ai
+
+then replay them through a local HTTP server as often as needed, with no
+network access:
+
+    python scripts/replay_bench.py replay --archive bench/replay.zip --json bench/latest.json
+    python scripts/replay_bench.py replay --archive bench/replay.zip --baseline bench/baseline.json
+
+Replay runs BlogScraper.scrape and generate_rss end to end against a fresh
+database. It reports throughput (articles/sec), peak traced memory and the
+per-phase timings collected by BlogScraper.span. With --baseline it exits
+non-zero when throughput or memory regress by more than --tolerance.
+
+Selenium-driven feeds cannot be replayed and are skipped.
+"""
+import argparse
+import hashlib
+import http.server
+import json
+import logging
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zipfile
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_DIR)
+
+import rss_generator  # noqa: E402
+
+# Headers that describe the original transfer rather than the body we store.
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Transport adapter that stores every response it sees in self.exchanges."""
+
+    def __init__(self, exchanges, **kwargs):
+        super().__init__(**kwargs)
+        self.exchanges = exchanges
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if request.method == 'GET':
+            headers = {k: v for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS}
+            # Store redirects as absolute URLs so replay follows them back through the adapter.
+            for key in headers:
+                if key.lower() == 'location':
+                    headers[key] = urljoin(request.url, headers[key])
+            self.exchanges[request.url] = {
+                'status': response.status_code,
+                'headers': headers,
+                'body': response.content,
+            }
+        return response
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Transport adapter that sends every request to the local replay server instead."""
+
+    def __init__(self, server_url, **kwargs):
+        super().__init__(**kwargs)
+        self.server_url = server_url
+
+    def send(self, request, **kwargs):
+        original_url = request.url
+        parts = urlsplit(original_url)
+        path = f"/{parts.scheme}/{parts.netloc}{parts.path or '/'}"
+        if parts.query:
+            path += f"?{parts.query}"
+        request.url = self.server_url + path
+        response = super().send(request, **kwargs)
+        # The scraper resolves relative links against response.url, so report the URL it asked for.
+        request.url = response.url = original_url
+        return response
+
+
+def make_replay_handler(exchanges):
+    class ReplayHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            scheme, _, rest = self.path.lstrip('/').partition('/')
+            exchange = exchanges.get(f"{scheme}://{rest}")
+            if exchange is None:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = exchange['body']
+            self.send_response(exchange['status'])
+            for key, value in exchange['headers'].items():
+                self.send_header(key, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ReplayHandler
+
+
+def load_archive(path):
+    with zipfile.ZipFile(path) as archive:
+        index = json.loads(archive.read('index.json'))
+        exchanges = {}
+        for url, entry in index['exchanges'].items():
+            exchanges[url] = dict(entry, body=archive.read(entry['body']))
+    return index, exchanges
+
+
+def write_archive(path, feeds, site_configs, exchanges):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    index = {'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'feeds': feeds,
+             'config': site_configs, 'exchanges': {}}
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for url, exchange in exchanges.items():
+            body_name = f"bodies/{hashlib.sha1(url.encode('utf-8')).hexdigest()}"
+            archive.writestr(body_name, exchange['body'])
+            index['exchanges'][url] = {'status': exchange['status'], 'headers': exchange['headers'], 'body': body_name}
+        archive.writestr('index.json', json.dumps(index, indent=2))
+
+
+def record(args):
+    config_path = args.config or os.path.join(PROJECT_DIR, 'config.json')
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    feeds = [f for f in rss_generator.load_feeds() if f.get('enabled', True) and f.get('config_key') in config]
+    if args.feeds:
+        feeds = [f for f in feeds if f['config_key'] in args.feeds]
+    feeds = [dict(f, max_pages=f.get('max_pages', args.max_pages)) for f in feeds
+             if not config[f['config_key']].get('use_selenium', False)]
+    if not feeds:
+        print("No replayable feeds selected (check feeds.json, config.json and use_selenium).")
+        return 1
+
+    exchanges = {}
+    session = requests.Session()
+    adapter = RecordingAdapter(exchanges)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    workdir = tempfile.mkdtemp(prefix='rss-record-')
+    try:
+        for feed in feeds:
+            scraper = rss_generator.BlogScraper(
+                feed['url'], feed['config_key'], workdir, feed['max_pages'], args.delay,
+                config_path, feed_title=feed['title'], feed_description=feed['description'], session=session)
+            articles = scraper.scrape(update_only=True)
+            print(f"Recorded {feed['config_key']}: {len(articles)} articles, {len(exchanges)} exchanges so far")
+    finally:
+        rss_generator.close_connections()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    site_configs = {key: config[key] for key in {f['config_key'] for f in feeds} | {'default'} if key in config}
+    write_archive(args.archive, feeds, site_configs, exchanges)
+    print(f"Wrote {len(exchanges)} exchanges for {len(feeds)} feeds to {args.archive}")
+    return 0
+
+
+def run_feeds(index, session, config_path, trace_memory):
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='rss-replay-')
+    try:
+        for feed in index['feeds']:
+            scraper = rss_generator.BlogScraper(
+                feed['url'], feed['config_key'], workdir, feed.get('max_pages'), 0, config_path,
+                feed_title=feed['title'], feed_description=feed['description'], session=session)
+            if trace_memory:
+                tracemalloc.start()
+            started = time.perf_counter()
+            articles = scraper.scrape(update_only=True)
+            if articles:
+                scraper.generate_rss()
+            elapsed = time.perf_counter() - started
+            peak = None
+            if trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            results[feed['config_key']] = {
+                'articles': len(articles),
+                'seconds': elapsed,
+                'phases': dict(scraper.phase_times),
+                'peak_bytes': peak,
+            }
+    finally:
+        rss_generator.close_connections()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def summarize(runs, memory_run):
+    feeds = {}
+    for key in runs[0]:
+        best = min(runs, key=lambda r: r[key]['seconds'])[key]
+        feeds[key] = {
+            'articles': best['articles'],
+            'seconds': best['seconds'],
+            'articles_per_sec': best['articles'] / best['seconds'] if best['seconds'] else 0.0,
+            'phases': best['phases'],
+            'peak_bytes': memory_run[key]['peak_bytes'],
+        }
+    articles = sum(f['articles'] for f in feeds.values())
+    seconds = sum(f['seconds'] for f in feeds.values())
+    phases = {}
+    for feed in feeds.values():
+        for phase, value in feed['phases'].items():
+            phases[phase] = phases.get(phase, 0.0) + value
+    return {
+        'feeds': feeds,
+        'total': {
+            'articles': articles,
+            'seconds': seconds,
+            'articles_per_sec': articles / seconds if seconds else 0.0,
+            'peak_bytes': max((f['peak_bytes'] or 0) for f in feeds.values()) if feeds else 0,
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'phases': phases,
+        },
+    }
+
+
+def print_report(report):
+    print(f"{'feed':<40} {'articles':>8} {'seconds':>8} {'art/s':>8} {'peak MiB':>9}")
+    for key, feed in sorted(report['feeds'].items()):
+        peak = (feed['peak_bytes'] or 0) / (1024 * 1024)
+        print(f"{key:<40} {feed['articles']:>8} {feed['seconds']:>8.3f} {feed['articles_per_sec']:>8.1f} {peak:>9.2f}")
+    total = report['total']
+    print(f"{'TOTAL':<40} {total['articles']:>8} {total['seconds']:>8.3f} {total['articles_per_sec']:>8.1f} "
+          f"{total['peak_bytes'] / (1024 * 1024):>9.2f}")
+    print(f"max RSS: {total['max_rss_kb'] / 1024:.1f} MiB")
+    print("phases:")
+    for phase, seconds in sorted(total['phases'].items(), key=lambda item: -item[1]):
+        print(f"  {phase:<12} {seconds:8.3f}s")
+
+
+def compare(report, baseline, tolerance):
+    failures = []
+    old, new = baseline['total'], report['total']
+    if old['articles_per_sec'] and new['articles_per_sec'] < old['articles_per_sec'] * (1 - tolerance):
+        failures.append(f"throughput {new['articles_per_sec']:.1f} art/s vs baseline {old['articles_per_sec']:.1f}")
+    if old['peak_bytes'] and new['peak_bytes'] > old['peak_bytes'] * (1 + tolerance):
+        failures.append(f"peak memory {new['peak_bytes']} B vs baseline {old['peak_bytes']} B")
+    if new['articles'] != old['articles']:
+        failures.append(f"article count {new['articles']} vs baseline {old['articles']}")
+    return failures
+
+
+def replay(args):
+    index, exchanges = load_archive(args.archive)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), make_replay_handler(exchanges))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    session = requests.Session()
+    adapter = ReplayAdapter(server_url)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    config_fd, config_path = tempfile.mkstemp(prefix='rss-replay-config-', suffix='.json')
+    try:
+        with os.fdopen(config_fd, 'w') as f:
+            json.dump(index['config'], f)
+        runs = [run_feeds(index, session, config_path, trace_memory=False) for _ in range(args.repeat)]
+        # tracemalloc slows everything down, so peak memory gets its own run.
+        memory_run = run_feeds(index, session, config_path, trace_memory=True)
+    finally:
+        os.unlink(config_path)
+        server.shutdown()
+
+    report = summarize(runs, memory_run)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        failures = compare(report, baseline, args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION: {failure}")
+        if failures:
+            return 1
+        print(f"OK: within {args.tolerance:.0%} of baseline")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and replay scraper HTTP traffic for offline benchmarking.")
+    parser.add_argument('--verbose', action='store_true', help="Keep rss_generator INFO logging")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help="Scrape live feeds and store their HTTP exchanges")
+    record_parser.add_argument('feeds', nargs='*', help="config_keys to record (default: all enabled feeds)")
+    record_parser.add_argument('--archive', default='bench/replay.zip', help="Fixture archive to write")
+    record_parser.add_argument('--config', help="Path to JSON config file")
+    record_parser.add_argument('--max-pages', type=int, default=2, help="Pages per feed unless feeds.json sets max_pages")
+    record_parser.add_argument('--delay', type=float, default=1.0, help="Delay between live requests (seconds)")
+
+    replay_parser = subparsers.add_parser('replay', help="Replay a fixture archive through a local HTTP server")
+    replay_parser.add_argument('--archive', default='bench/replay.zip', help="Fixture archive to replay")
+    replay_parser.add_argument('--repeat', type=int, default=3, help="Timed runs per feed (best run counts)")
+    replay_parser.add_argument('--json', help="Write the report as JSON to this path")
+    replay_parser.add_argument('--baseline', help="JSON report to compare against")
+    replay_parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed regression vs baseline (fraction)")
+
+    args = parser.parse_args()
+    if not args.verbose:
+        rss_generator.logger.setLevel(logging.WARNING)
+    if args.command == 'record':
+        return record(args)
+    return replay(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""Shared setup for tests that drive BlogScraper without touching the network.
+
+Imports rss_generator from the project directory, builds scrapers against a
+throwaway config and output directory, and provides FakeSession, a stand-in
+for requests.Session that serves canned responses.
+"""
+import io
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_DIR)
+import rss_generator  # noqa: E402
+
+rss_generator.logger.setLevel(logging.WARNING)
+
+SITE_CONFIG = {
+    'article_selector': 'a.post',
+    'title_selector': 'h1',
+    'date_selectors': ['time[datetime]'],
+    'desc_selectors': ['meta[name="description"]', 'p'],
+    'next_page_selector': 'a.next',
+    'url_filters': {'exclude_patterns': ['/category/']},
+}
+
+
+def make_response(url, status=200, body=b'', headers=None):
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers or {})
+    response.raw = io.BytesIO(body.encode('utf-8') if isinstance(body, str) else body)
+    return response
+
+
+class FakeSession:
+    """Serves canned responses by URL and records every URL requested.
+
+    A route is a list of outcomes used in turn, the last one repeating; an outcome is
+    a status code, a (status, body) or (status, body, headers) tuple, or an exception
+    to raise. Unknown URLs get a 404.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = {}
+        self.requested = []
+        for url, outcomes in (routes or {}).items():
+            self.route(url, outcomes)
+
+    def route(self, url, outcomes):
+        self.routes[url] = list(outcomes) if isinstance(outcomes, list) else [outcomes]
+
+    def get(self, url, headers=None, **kwargs):
+        self.requested.append(url)
+        outcomes = self.routes.get(url) or [404]
+        outcome = outcomes.pop(0) if len(outcomes) > 1 else outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, int):
+            outcome = (outcome,)
+        return make_response(url, *outcome)
+
+
+def reset_shared_state():
+    """Forget the per-host breakers, pacing slots and cached indexes that scrapers share."""
+    rss_generator.BREAKERS.clear()
+    rss_generator.HOST_NEXT_REQUEST.clear()
+    rss_generator.SEARCH_INDEXES.clear()
+    rss_generator.AGGREGATE_CACHE.clear()
+    rss_generator.close_connections()
+
+
+class ScraperTestCase(unittest.TestCase):
+    """Gives each test a fresh output directory and config file; make_scraper builds scrapers against them."""
+
+    def setUp(self):
+        reset_shared_state()
+        self.directory = tempfile.mkdtemp(prefix='rss-tests-')
+        self.output_dir = os.path.join(self.directory, 'rss_feeds')
+        self.config_path = os.path.join(self.directory, 'config.json')
+        self.config = {'default': dict(SITE_CONFIG)}
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.addCleanup(reset_shared_state)
+
+    def write_config(self):
+        with open(self.config_path, 'w') as f:
+            json.dump(self.config, f)
+
+    def make_scraper(self, base_url, config_key=None, session=None, site_config=None, **kwargs):
+        """A BlogScraper for base_url; site_config is merged over SITE_CONFIG as the feed's config entry."""
+        config_key = config_key or base_url.split('://', 1)[-1].rstrip('/')
+        self.config[config_key] = {**SITE_CONFIG, **(site_config or {})}
+        self.write_config()
+        kwargs.setdefault('delay', 0)
+        kwargs.setdefault('min_delay', 0)
+        return rss_generator.BlogScraper(base_url, config_key, self.output_dir, config_file=self.config_path,
+                                         session=session or FakeSession(), **kwargs)
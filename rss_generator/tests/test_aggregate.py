@@ -0,0 +1,112 @@
+"""/aggregate-feed through the Flask test client: merge order, limits, bundles and the render cache."""
+import unittest
+import xml.etree.ElementTree as ET
+from unittest import mock
+
+from scraper_env import ScraperTestCase, rss_generator
+
+ALPHA = 'https://alpha.example.com'
+BETA = 'https://beta.example.com'
+
+
+def article(site, day, title=None):
+    return {'title': title or f"{site.split('//')[1].split('.')[0]} day {day}", 'url': f"{site}/day-{day}",
+            'description': f"Posted on day {day}", 'pub_date': f"{day:02d} May 2024 10:00:00 GMT"}
+
+
+class AggregateFeedTest(ScraperTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alpha = self.make_scraper(ALPHA)
+        self.beta = self.make_scraper(BETA)
+        self.alpha.cache_articles([article(ALPHA, day) for day in (1, 4, 5, 9)])
+        self.beta.cache_articles([article(BETA, day) for day in (2, 3, 7)])
+        self.config['gamma.example.com'] = dict(self.config['alpha.example.com'])
+        self.write_config()
+        feeds = mock.patch.object(rss_generator, 'load_feed_entries', return_value=[
+            {'url': ALPHA, 'config_key': 'alpha.example.com', 'title': 'Alpha', 'description': ''},
+            {'url': BETA, 'config_key': 'beta.example.com', 'title': 'Beta', 'description': ''},
+            {'bundle': 'tech', 'title': 'Tech', 'keys': ['alpha.example.com', 'beta.example.com']},
+        ])
+        feeds.start()
+        self.addCleanup(feeds.stop)
+        self.client = rss_generator.create_app(self.output_dir, self.config_path).test_client()
+
+    def get(self, **params):
+        response = self.client.get('/aggregate-feed', query_string=params)
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        self.assertEqual(response.mimetype, 'application/rss+xml')
+        return response.data
+
+    def items(self, **params):
+        channel = ET.fromstring(self.get(**params)).find('channel')
+        return channel, [(item.findtext('title'), item.findtext('link')) for item in channel.findall('item')]
+
+    def test_members_are_merged_newest_first(self):
+        _, items = self.items(keys='alpha.example.com,beta.example.com')
+        self.assertEqual([link.rsplit('-', 1)[1] for _, link in items], ['9', '7', '5', '4', '3', '2', '1'])
+        self.assertEqual(items[0], ('alpha day 9 (Alpha)', f"{ALPHA}/day-9"))
+        self.assertEqual(items[1], ('beta day 7 (Beta)', f"{BETA}/day-7"))
+
+    def test_limit(self):
+        _, items = self.items(keys='alpha.example.com,beta.example.com', limit=3)
+        self.assertEqual([link for _, link in items], [f"{ALPHA}/day-9", f"{BETA}/day-7", f"{ALPHA}/day-5"])
+
+    def test_merge_reads_at_most_limit_rows_per_member(self):
+        members = rss_generator.aggregate_members(['alpha.example.com', 'beta.example.com'], self.output_dir,
+                                                  self.config_path)
+        read = []
+        original = rss_generator.iter_recent_articles
+
+        def counting(*args):
+            for row in original(*args):
+                read.append(row['url'])
+                yield row
+
+        with mock.patch.object(rss_generator, 'iter_recent_articles', counting):
+            merged = rss_generator.merge_feeds(members, 2)
+        self.assertEqual([a['url'] for a in merged], [f"{ALPHA}/day-9", f"{BETA}/day-7"])
+        self.assertLessEqual(len(read), 4)
+
+    def test_bundle(self):
+        channel, items = self.items(bundle='tech')
+        self.assertEqual(channel.findtext('title'), 'Tech')
+        self.assertEqual(len(items), 7)
+
+    def test_member_never_scraped_is_skipped(self):
+        _, items = self.items(keys='alpha.example.com,gamma.example.com')
+        self.assertEqual(len(items), 4)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get('/aggregate-feed').status_code, 400)
+        self.assertEqual(self.client.get('/aggregate-feed?keys=alpha.example.com&limit=lots').status_code, 400)
+        self.assertEqual(self.client.get('/aggregate-feed?keys=unknown.example.com').status_code, 404)
+        self.assertEqual(self.client.get('/aggregate-feed?bundle=missing').status_code, 404)
+
+    def test_rendered_feed_is_cached_until_a_member_changes(self):
+        first = self.get(keys='alpha.example.com,beta.example.com')
+        with mock.patch('feedgen.feed.FeedGenerator', side_effect=AssertionError("re-rendered")):
+            self.assertEqual(self.get(keys='alpha.example.com,beta.example.com'), first)
+
+        self.beta.cache_articles([article(BETA, 12)])
+        _, items = self.items(keys='alpha.example.com,beta.example.com')
+        self.assertEqual(items[0][1], f"{BETA}/day-12")
+
+    def test_rewritten_article_invalidates_the_cache(self):
+        self.get(keys='alpha.example.com,beta.example.com')
+        self.alpha.cache_articles([article(ALPHA, 9, title='Corrected headline')])
+        _, items = self.items(keys='alpha.example.com,beta.example.com')
+        self.assertEqual(items[0][0], 'Corrected headline (Alpha)')
+
+    def test_pruned_article_invalidates_the_cache(self):
+        self.get(keys='alpha.example.com,beta.example.com')
+        with self.alpha.db() as conn:
+            conn.execute("UPDATE articles SET scraped_at = datetime('now', '-400 days') WHERE url = ?",
+                         (f"{ALPHA}/day-9",))
+        self.alpha.apply_retention()
+        _, items = self.items(keys='alpha.example.com,beta.example.com')
+        self.assertEqual(items[0][1], f"{BETA}/day-7")
+
+
+if __name__ == '__main__':
+    unittest.main()
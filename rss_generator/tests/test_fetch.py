@@ -0,0 +1,224 @@
+"""BlogScraper.fetch: retries, backoff and the per-host circuit breaker through a fake session, and
+request and feed deadlines against a real slow-drip server."""
+import http.server
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest import mock
+
+import requests
+
+from scraper_env import FakeSession, ScraperTestCase, rss_generator
+
+HOST = 'https://flaky.example.com'
+
+BODY = b'x' * 200
+
+
+class DripHandler(http.server.BaseHTTPRequestHandler):
+    """/drip sends BODY a byte at a time every 50 ms; /drip-eof does the same without Content-Length;
+    /quick sends it in a few bursts well inside a second."""
+
+    def do_GET(self):
+        gap, step = {'/drip': (0.05, 1), '/drip-eof': (0.05, 1), '/quick': (0.02, 50)}[self.path]
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        if self.path == '/drip-eof':
+            self.send_header('Connection', 'close')
+        else:
+            self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        try:
+            for offset in range(0, len(BODY), step):
+                self.wfile.write(BODY[offset:offset + step])
+                self.wfile.flush()
+                time.sleep(gap)
+        except OSError:
+            pass  # the client gave up
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FetchDeadlineTest(ScraperTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), DripHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def scraper(self, **timeouts):
+        scraper = self.make_scraper(self.base_url, session=requests.Session(), site_config={
+            'timeouts': {'read': 5, **timeouts}, 'respect_robots': False, 'max_retries': 0})
+        self.addCleanup(scraper.session.close)
+        return scraper
+
+    def assertCutOff(self, scraper, path, seconds):
+        started = time.monotonic()
+        with self.assertRaises(rss_generator.RequestDeadlineExceeded):
+            scraper.fetch(f"{self.base_url}{path}", {}, pace=False)
+        elapsed = time.monotonic() - started
+        self.assertGreaterEqual(elapsed, seconds * 0.9)
+        self.assertLess(elapsed, seconds + 1.5, "the deadline was only noticed after the read returned")
+
+    def test_slow_drip_is_cut_off_at_the_request_deadline(self):
+        # Each gap is far below the 5 s read timeout and the body would take 10 s.
+        self.assertCutOff(self.scraper(request=1), '/drip', 1)
+
+    def test_body_without_length_is_cut_off_too(self):
+        self.assertCutOff(self.scraper(request=1), '/drip-eof', 1)
+
+    def test_feed_deadline_caps_the_request(self):
+        scraper = self.scraper(request=30)
+        scraper.feed_deadline = time.monotonic() + 1
+        self.assertCutOff(scraper, '/drip', 1)
+
+    def test_body_that_arrives_in_time_is_kept(self):
+        response = self.scraper(request=2).fetch(f"{self.base_url}/quick", {}, pace=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, BODY)
+
+
+class RetryTest(ScraperTestCase):
+    def setUp(self):
+        super().setUp()
+        self.session = FakeSession()
+        sleep = mock.patch.object(rss_generator.time, 'sleep')
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def scraper(self, **site_config):
+        return self.make_scraper(HOST, session=self.session, site_config={'respect_robots': False, **site_config})
+
+    def waits(self):
+        return [call.args[0] for call in self.sleep.call_args_list]
+
+    def test_transient_statuses_are_retried_with_exponential_backoff(self):
+        self.session.route(f"{HOST}/a", [503, 502, 500, (200, 'ok')])
+        response = self.scraper().fetch(f"{HOST}/a", {})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, 'ok')
+        self.assertEqual(len(self.session.requested), 4)
+        for attempt, wait in enumerate(self.waits()):
+            full = rss_generator.RETRY_BACKOFF_SECONDS * 2 ** attempt
+            self.assertTrue(full / 2 <= wait <= full, f"retry {attempt} waited {wait}")
+
+    def test_connection_errors_and_timeouts_are_retried(self):
+        self.session.route(f"{HOST}/a", [requests.ConnectionError('reset'), requests.ReadTimeout('slow'),
+                                         requests.ConnectTimeout('unreachable'), (200, 'ok')])
+        self.assertEqual(self.scraper().fetch(f"{HOST}/a", {}).status_code, 200)
+        self.assertEqual(len(self.session.requested), 4)
+
+    def test_other_errors_are_not_retried(self):
+        self.session.route(f"{HOST}/a", [requests.TooManyRedirects('loop'), (200, 'ok')])
+        with self.assertRaises(requests.TooManyRedirects):
+            self.scraper().fetch(f"{HOST}/a", {})
+        self.assertEqual(len(self.session.requested), 1)
+
+    def test_retry_after_seconds_is_honored(self):
+        self.session.route(f"{HOST}/a", [(429, '', {'Retry-After': '7'}), 200])
+        self.assertEqual(self.scraper().fetch(f"{HOST}/a", {}).status_code, 200)
+        self.assertEqual(self.waits(), [7.0])
+
+    def test_retry_after_http_date_is_honored(self):
+        when = datetime.now(timezone.utc) + timedelta(seconds=20)
+        self.session.route(f"{HOST}/a", [(503, '', {'Retry-After': format_datetime(when, usegmt=True)}), 200])
+        self.scraper().fetch(f"{HOST}/a", {})
+        self.assertEqual(len(self.waits()), 1)
+        self.assertAlmostEqual(self.waits()[0], 20, delta=2)
+
+    def test_retry_after_beyond_the_cap_returns_the_response(self):
+        self.session.route(f"{HOST}/a", [(429, '', {'Retry-After': '3600'}), 200])
+        self.assertEqual(self.scraper().fetch(f"{HOST}/a", {}).status_code, 429)
+        self.assertEqual(self.waits(), [])
+
+    def test_max_retries_per_url(self):
+        self.session.route(f"{HOST}/a", [503])
+        self.assertEqual(self.scraper(max_retries=2).fetch(f"{HOST}/a", {}).status_code, 503)
+        self.assertEqual(len(self.session.requested), 3)
+
+    def test_retry_budget_is_shared_by_the_whole_scrape(self):
+        self.session.route(f"{HOST}/a", [503])
+        self.session.route(f"{HOST}/b", [503])
+        scraper = self.scraper(max_retries=3, retry_budget=4)
+        scraper.fetch(f"{HOST}/a", {})
+        scraper.fetch(f"{HOST}/b", {})
+        self.assertEqual(self.session.requested.count(f"{HOST}/a"), 4)
+        self.assertEqual(self.session.requested.count(f"{HOST}/b"), 2)
+
+
+class CircuitBreakerTest(ScraperTestCase):
+    def setUp(self):
+        super().setUp()
+        self.session = FakeSession()
+        sleep = mock.patch.object(rss_generator.time, 'sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+        self.scraper = self.make_scraper(HOST, session=self.session,
+                                         site_config={'respect_robots': False, 'max_retries': 3, 'retry_budget': 100})
+        self.breaker = rss_generator.get_breaker('flaky.example.com')
+
+    def fail_urls(self, count):
+        for i in range(count):
+            self.session.route(f"{HOST}/{i}", [requests.ConnectionError('refused')])
+            with self.assertRaises(requests.ConnectionError):
+                self.scraper.fetch(f"{HOST}/{i}", {})
+
+    def cool_down(self):
+        self.breaker.opened_at -= self.breaker.cooldown
+
+    def test_each_url_counts_once_after_its_retries(self):
+        self.fail_urls(rss_generator.CIRCUIT_FAILURE_THRESHOLD - 1)
+        self.assertEqual(len(self.session.requested), 4 * (rss_generator.CIRCUIT_FAILURE_THRESHOLD - 1))
+        self.assertEqual(self.breaker.failures, rss_generator.CIRCUIT_FAILURE_THRESHOLD - 1)
+        self.assertFalse(self.breaker.is_open())
+
+    def test_opens_after_the_threshold_and_rejects_without_a_request(self):
+        self.fail_urls(rss_generator.CIRCUIT_FAILURE_THRESHOLD)
+        self.assertTrue(self.breaker.is_open())
+        requested = len(self.session.requested)
+        with self.assertRaises(rss_generator.CircuitOpenError):
+            self.scraper.fetch(f"{HOST}/next", {})
+        self.assertEqual(len(self.session.requested), requested)
+        self.assertFalse(self.scraper.host_available(f"{HOST}/next"))
+
+    def test_success_resets_the_count(self):
+        self.fail_urls(rss_generator.CIRCUIT_FAILURE_THRESHOLD - 1)
+        self.session.route(f"{HOST}/ok", [200])
+        self.scraper.fetch(f"{HOST}/ok", {})
+        self.fail_urls(rss_generator.CIRCUIT_FAILURE_THRESHOLD - 1)
+        self.assertFalse(self.breaker.is_open())
+
+    def test_half_open_allows_one_probe_that_closes_it(self):
+        self.fail_urls(rss_generator.CIRCUIT_FAILURE_THRESHOLD)
+        self.cool_down()
+        self.assertTrue(self.breaker.allow(), "the first caller after the cooldown probes")
+        self.assertFalse(self.breaker.allow(), "everyone else waits for the probe")
+        self.assertTrue(self.breaker.is_open())
+        self.breaker.record_success()
+        self.assertFalse(self.breaker.is_open())
+        self.session.route(f"{HOST}/ok", [200])
+        self.assertEqual(self.scraper.fetch(f"{HOST}/ok", {}).status_code, 200)
+
+    def test_failed_probe_reopens_it(self):
+        self.fail_urls(rss_generator.CIRCUIT_FAILURE_THRESHOLD)
+        self.cool_down()
+        self.session.route(f"{HOST}/probe", [(503, 'down')])
+        self.assertEqual(self.scraper.fetch(f"{HOST}/probe", {}).status_code, 503)
+        self.assertEqual(self.session.requested.count(f"{HOST}/probe"), 4, "the probe gets its retries")
+        self.assertTrue(self.breaker.is_open())
+        with self.assertRaises(rss_generator.CircuitOpenError):
+            self.scraper.fetch(f"{HOST}/later", {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Native feed ingestion for a section of a site whose WordPress API and sitemap cover every section."""
+import json
+import unittest
+
+from scraper_env import FakeSession, ScraperTestCase
+
+SITE = 'https://blog.example.com'
+WP_API = f"{SITE}/wp-json/wp/v2/posts?per_page=50&_fields=link,title,excerpt,date_gmt"
+HEADERS = {'User-Agent': 'test'}
+
+
+def listing(feed_link=''):
+    return f'''<html><head>
+        <meta name="generator" content="WordPress 6.5">
+        <link rel="https://api.w.org/" href="{SITE}/wp-json/">
+        {feed_link}
+    </head><body><a class="post" href="/ai/first">First</a></body></html>'''
+
+
+def wp_posts(*paths):
+    return json.dumps([{
+        'link': f"{SITE}{path}",
+        'title': {'rendered': f"Post {path}"},
+        'excerpt': {'rendered': '<p>Excerpt</p>'},
+        'date_gmt': '2024-05-01T10:00:00',
+    } for path in paths])
+
+
+def news_sitemap(*paths):
+    urls = ''.join(f'''<url><loc>{SITE}{path}</loc><news:news><news:title>Story {path}</news:title>
+        <news:publication_date>2024-05-01T10:00:00Z</news:publication_date></news:news></url>''' for path in paths)
+    return (f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+            f'xmlns:news="http://www.google.com/schemas/sitemap-news/0.9">{urls}</urlset>')
+
+
+RSS = f'''<rss version="2.0"><channel><title>AI</title>
+    <item><title>Feed item</title><link>{SITE}/ai/from-feed</link><pubDate>Wed, 01 May 2024 10:00:00 GMT</pubDate></item>
+</channel></rss>'''
+
+
+class SectionFeedTest(ScraperTestCase):
+    def scraper(self, base_url=f"{SITE}/ai", routes=None, **site_config):
+        self.session = FakeSession({
+            f"{SITE}/ai": (200, listing()),
+            SITE: (200, listing()),
+            WP_API: (200, wp_posts('/ai/first', '/ai/second', '/sports/match')),
+            f"{SITE}/sitemap.xml": (200, news_sitemap('/sports/final')),
+            **(routes or {}),
+        })
+        return self.make_scraper(base_url, session=self.session, site_config=site_config)
+
+    def ingest(self, scraper):
+        articles = scraper.scrape_native_feed(dict(HEADERS), set())
+        return None if articles is None else sorted(a['url'] for a in articles)
+
+    def test_site_wide_api_only_yields_the_section(self):
+        scraper = self.scraper()
+        self.assertEqual(self.ingest(scraper), [f"{SITE}/ai/first", f"{SITE}/ai/second"])
+        self.assertEqual(scraper.get_state('native_feed'), ['wordpress', WP_API])
+
+    def test_falls_back_to_html_when_nothing_is_in_the_section(self):
+        scraper = self.scraper(routes={WP_API: (200, wp_posts('/sports/match', '/ai-news/x'))})
+        self.assertIsNone(self.ingest(scraper))
+        self.assertIn(f"{SITE}/sitemap.xml", self.session.requested)
+        self.assertIsNone(scraper.get_state('native_feed'))
+
+    def test_remembered_source_is_scoped_too(self):
+        scraper = self.scraper()
+        scraper.set_state('native_feed', ['sitemap', f"{SITE}/sitemap.xml"])
+        self.session.route(f"{SITE}/sitemap.xml", (200, news_sitemap('/ai/story', '/sports/final')))
+        self.assertEqual(self.ingest(scraper), [f"{SITE}/ai/story"])
+        self.assertNotIn(f"{SITE}/ai", self.session.requested, "a usable remembered source skips discovery")
+
+    def test_feed_advertised_by_the_section_page_is_used_as_is(self):
+        link = '<link rel="alternate" type="application/rss+xml" href="/ai/feed">'
+        scraper = self.scraper(routes={f"{SITE}/ai": (200, listing(link)), f"{SITE}/ai/feed": (200, RSS)})
+        self.assertEqual(self.ingest(scraper), [f"{SITE}/ai/from-feed"])
+        self.assertEqual(scraper.get_state('native_feed'), ['rss', f"{SITE}/ai/feed"])
+
+    def test_site_wide_sources_can_be_opted_into(self):
+        scraper = self.scraper(native_feed_site_wide=True)
+        self.assertEqual(len(self.ingest(scraper)), 3)
+
+    def test_feed_for_the_whole_site_takes_every_item(self):
+        scraper = self.scraper(base_url=SITE)
+        self.assertEqual(len(self.ingest(scraper)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""robots.txt handling and per-host pacing: disallow rules, Crawl-delay, Request-rate and the delay floors."""
+import unittest
+from unittest import mock
+
+import requests
+
+from scraper_env import FakeSession, ScraperTestCase, rss_generator
+
+HOST = 'https://polite.example.com'
+ROBOTS = f"{HOST}/robots.txt"
+
+
+class RobotsRulesTest(unittest.TestCase):
+    def parse(self, text):
+        rules = rss_generator.RobotsRules()
+        rules.parse(text.splitlines())
+        return rules
+
+    def test_fractional_crawl_delay_is_kept(self):
+        rules = self.parse("User-agent: *\nCrawl-delay: 0.5\n")
+        self.assertEqual(rules.crawl_delay(rss_generator.ROBOTS_AGENT), 0.5)
+
+    def test_each_group_keeps_its_own_delay(self):
+        rules = self.parse(
+            "User-agent: rss-generator\nCrawl-delay: 1.5 # ours\nDisallow: /private/\n\n"
+            "User-agent: *\nCrawl-delay: 10\n")
+        self.assertEqual(rules.crawl_delay(rss_generator.ROBOTS_AGENT), 1.5)
+        self.assertEqual(rules.crawl_delay('otherbot'), 10.0)
+
+    def test_unusable_delays_are_ignored(self):
+        for value in ('soon', '-1', '172800'):
+            rules = self.parse(f"User-agent: *\nCrawl-delay: {value}\n")
+            self.assertIsNone(rules.crawl_delay(rss_generator.ROBOTS_AGENT), value)
+
+
+class RobotsPolicyTest(ScraperTestCase):
+    def scraper(self, robots, delay=3.0, min_delay=0.5, **site_config):
+        self.session = FakeSession({ROBOTS: robots})
+        return self.make_scraper(HOST, session=self.session, delay=delay, min_delay=min_delay,
+                                 site_config={'max_retries': 0, **site_config})
+
+    def test_disallowed_urls_are_skipped(self):
+        scraper = self.scraper((200, "User-agent: *\nDisallow: /private/\n"))
+        self.assertTrue(scraper.allowed(f"{HOST}/posts/1"))
+        self.assertFalse(scraper.allowed(f"{HOST}/private/1"))
+
+    def test_disallowed_urls_are_never_fetched_by_a_scrape(self):
+        scraper = self.scraper((200, "User-agent: *\nDisallow: /private/\n"))
+        scraper.scrape_articles([f"{HOST}/private/1"], {}, set())
+        self.assertEqual(self.session.requested, [ROBOTS])
+
+    def test_respect_robots_false_ignores_them(self):
+        scraper = self.scraper((200, "User-agent: *\nDisallow: /\nCrawl-delay: 30\n"), respect_robots=False)
+        self.assertTrue(scraper.allowed(f"{HOST}/private/1"))
+        self.assertEqual(scraper.host_delay(f"{HOST}/x"), 3.0)
+        self.assertEqual(self.session.requested, [])
+
+    def test_forbidden_robots_disallows_everything(self):
+        self.assertFalse(self.scraper(403).allowed(f"{HOST}/posts/1"))
+
+    def test_missing_robots_allows_everything_at_min_delay(self):
+        scraper = self.scraper(404)
+        self.assertTrue(scraper.allowed(f"{HOST}/posts/1"))
+        self.assertEqual(scraper.host_delay(f"{HOST}/x"), 0.5)
+
+    def test_fractional_crawl_delay_sets_the_pace(self):
+        self.assertEqual(self.scraper((200, "User-agent: *\nCrawl-delay: 1.25\n")).host_delay(f"{HOST}/x"), 1.25)
+
+    def test_request_rate_sets_the_pace(self):
+        scraper = self.scraper((200, "User-agent: *\nRequest-rate: 1/4\n"))
+        self.assertEqual(scraper.host_delay(f"{HOST}/x"), 4.0)
+
+    def test_slower_of_crawl_delay_and_request_rate_wins(self):
+        scraper = self.scraper((200, "User-agent: *\nCrawl-delay: 2\nRequest-rate: 3/3\n"))
+        self.assertEqual(scraper.host_delay(f"{HOST}/x"), 2.0)
+
+    def test_min_delay_is_a_floor(self):
+        scraper = self.scraper((200, "User-agent: *\nCrawl-delay: 0.1\n"), min_delay=0.75)
+        self.assertEqual(scraper.host_delay(f"{HOST}/x"), 0.75)
+
+    def test_unreachable_robots_falls_back_to_delay(self):
+        scraper = self.scraper(requests.ConnectionError('refused'))
+        self.assertTrue(scraper.allowed(f"{HOST}/posts/1"))
+        self.assertEqual(scraper.host_delay(f"{HOST}/x"), 3.0)
+
+    def test_server_error_robots_falls_back_to_delay(self):
+        self.assertEqual(self.scraper(503).host_delay(f"{HOST}/x"), 3.0)
+
+    def test_robots_is_fetched_once_and_shared_through_the_feed_state(self):
+        scraper = self.scraper((200, "User-agent: *\nCrawl-delay: 2\n"))
+        scraper.host_delay(f"{HOST}/a")
+        scraper.allowed(f"{HOST}/b")
+        self.assertEqual(self.session.requested, [ROBOTS])
+        again = self.make_scraper(HOST, session=self.session, min_delay=0.5)
+        self.assertEqual(again.host_delay(f"{HOST}/c"), 2.0)
+        self.assertEqual(self.session.requested, [ROBOTS])
+
+    def test_throttle_spaces_requests_per_host_across_scrapers(self):
+        first = self.scraper((200, "User-agent: *\nCrawl-delay: 2\n"))
+        second = self.make_scraper(HOST, config_key='polite-2', session=self.session, min_delay=0.5)
+        other = self.make_scraper('https://other.example.com', session=FakeSession(), min_delay=0)
+        waits = []
+        with mock.patch.object(rss_generator.BlogScraper, 'pause', lambda self, seconds: waits.append(seconds)):
+            first.throttle(f"{HOST}/1")
+            second.throttle(f"{HOST}/2")
+            first.throttle(f"{HOST}/3")
+            other.throttle('https://other.example.com/1')
+        self.assertEqual(len(waits), 2, "the first request to each host goes out at once")
+        self.assertAlmostEqual(waits[0], 2.0, delta=0.1)
+        self.assertAlmostEqual(waits[1], 4.0, delta=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
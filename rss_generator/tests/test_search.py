@@ -0,0 +1,98 @@
+"""/search through the Flask test client: bm25 ranking, prefix queries, feed filtering and paging."""
+import unittest
+
+from scraper_env import ScraperTestCase, rss_generator
+
+
+def article(site, slug, title, description='Nothing to see in this one.'):
+    return {'title': title, 'url': f"{site}/{slug}", 'description': description,
+            'pub_date': 'Wed, 01 May 2024 10:00:00 GMT'}
+
+
+class SearchTest(ScraperTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alpha = self.make_scraper('https://alpha.example.com')
+        self.beta = self.make_scraper('https://beta.example.com')
+        self.alpha.cache_articles([
+            article('https://alpha.example.com', 'title-hit', 'Quantum computers reach a milestone'),
+            article('https://alpha.example.com', 'body-hit', 'Weekly roundup',
+                    'Also this week: quantum sensing, quantum networks and quantum dots.'),
+            article('https://alpha.example.com', 'languages', 'Large language models explained'),
+        ])
+        self.beta.cache_articles([
+            article('https://beta.example.com', f"robots-{i}", f"Robots part {i}", 'Quantum robotics, briefly.')
+            for i in range(5)
+        ])
+        self.client = rss_generator.create_app(self.output_dir, self.config_path).test_client()
+
+    def search(self, **params):
+        response = self.client.get('/search', query_string=params)
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        return response.get_json()
+
+    def urls(self, **params):
+        return [result['url'] for result in self.search(**params)['results']]
+
+    def test_title_matches_outrank_description_matches(self):
+        results = self.search(q='quantum', feed='alpha.example.com')['results']
+        self.assertEqual([r['url'] for r in results],
+                         ['https://alpha.example.com/title-hit', 'https://alpha.example.com/body-hit'])
+        self.assertGreater(results[0]['score'], results[1]['score'])
+        self.assertEqual(results[0]['feed_key'], 'alpha.example.com')
+        self.assertEqual(results[0]['title'], 'Quantum computers reach a milestone')
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.urls(q='quantum milestone'), ['https://alpha.example.com/title-hit'])
+
+    def test_prefix_queries(self):
+        self.assertEqual(self.urls(q='lang*'), ['https://alpha.example.com/languages'])
+        self.assertEqual(self.urls(q='lang'), [], "without the star the word has to match whole")
+
+    def test_stemming(self):
+        self.assertEqual(self.urls(q='explaining'), ['https://alpha.example.com/languages'])
+
+    def test_feed_filter(self):
+        self.assertEqual(len(self.urls(q='quantum', per_page=100)), 7)
+        self.assertEqual({url.split('/')[2] for url in self.urls(q='quantum', feed='beta.example.com')},
+                         {'beta.example.com'})
+        self.assertEqual(self.urls(q='quantum', feed='missing.example.com'), [])
+
+    def test_pages_do_not_overlap_and_has_more_stops_at_the_end(self):
+        seen = []
+        for page in (1, 2, 3):
+            body = self.search(q='robots', feed='beta.example.com', page=page, per_page=2)
+            self.assertEqual(body['page'], page)
+            self.assertEqual(body['has_more'], page < 3)
+            seen += [r['url'] for r in body['results']]
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+        self.assertEqual(self.search(q='robots', page=4, per_page=2)['results'], [])
+
+    def test_per_page_is_capped(self):
+        self.assertEqual(self.search(q='quantum', per_page=10_000)['per_page'], rss_generator.SEARCH_MAX_PER_PAGE)
+
+    def test_query_syntax_is_not_passed_through(self):
+        for q in ('"unbalanced', 'quantum OR', 'NEAR(', 'title:quantum', '*'):
+            self.search(q=q)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get('/search').status_code, 400)
+        self.assertEqual(self.client.get('/search?q=quantum&page=two').status_code, 400)
+
+    def test_app_reads_the_index_in_its_own_output_dir(self):
+        other = rss_generator.create_app(f"{self.directory}/elsewhere", self.config_path).test_client()
+        self.assertEqual(other.get('/search?q=quantum').get_json()['results'], [])
+
+    def test_index_follows_rewrites_and_retention(self):
+        self.alpha.cache_articles([article('https://alpha.example.com', 'title-hit', 'Classical computers win')])
+        self.assertNotIn('https://alpha.example.com/title-hit', self.urls(q='quantum'))
+        self.assertEqual(self.urls(q='classical'), ['https://alpha.example.com/title-hit'])
+        with self.beta.db() as conn:
+            conn.execute("UPDATE articles SET scraped_at = datetime('now', '-400 days')")
+        self.beta.apply_retention()
+        self.assertEqual(self.urls(q='robots'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
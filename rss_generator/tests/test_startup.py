@@ -0,0 +1,82 @@
+"""Startup budget for `import rss_generator`, measured with `python -X importtime`.
+
+Fails if the import takes longer than the budget (best of several fresh
+interpreters) or pulls in a dependency that should only load on the code
+path that needs it. STARTUP_BUDGET_MS overrides the 200 ms budget on slow
+machines.
+"""
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+BUDGET_MS = float(os.getenv('STARTUP_BUDGET_MS', '200'))
+RUNS = 5
+
+# Modules that must stay off the import path of a plain `import rss_generator`.
+LAZY_MODULES = ['bs4', 'dateutil', 'feedgen', 'flask', 'selenium', 'selenium_stealth']
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+
+def measure():
+    """Run one fresh interpreter and return (cumulative_ms, imported module names)."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import rss_generator'],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = None
+    modules = set()
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        modules.add(name)
+        if name == 'rss_generator':
+            total = int(match.group(2)) / 1000.0
+    if total is None:
+        raise RuntimeError("rss_generator did not show up in -X importtime output")
+    return total, modules
+
+
+class StartupTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.timings = []
+        cls.imported = set()
+        for _ in range(RUNS):
+            total, modules = measure()
+            cls.timings.append(total)
+            cls.imported |= modules
+
+    def test_import_within_budget(self):
+        best = min(self.timings)
+        self.assertLessEqual(best, BUDGET_MS, f"import rss_generator took {best:.1f} ms (best of {RUNS} runs), "
+                                              f"budget is {BUDGET_MS:.0f} ms")
+
+    def test_heavy_dependencies_load_lazily(self):
+        eager = sorted(m for m in LAZY_MODULES if m in self.imported)
+        self.assertEqual(eager, [], f"imported at module load: {', '.join(eager)}")
+
+    def test_wsgi_app_is_built_on_first_access(self):
+        # What a WSGI server does with `rss_generator:app`.
+        script = ("import sys, rss_generator\n"
+                  "assert 'flask' not in sys.modules\n"
+                  "app = rss_generator.app\n"
+                  "assert app is rss_generator.app\n"
+                  "print(type(app).__name__, sorted(rule.rule for rule in app.url_map.iter_rules()))")
+        result = subprocess.run([sys.executable, '-c', script], cwd=PROJECT_DIR, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Flask", result.stdout)
+        self.assertIn("'/search'", result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+"""Feed databases: migrating old files, the shared database, retention and the search index rebuild."""
+import os
+import sqlite3
+import unittest
+
+from scraper_env import ScraperTestCase, rss_generator
+
+SITE = 'https://blog.example.com'
+CONFIG_KEY = 'blog.example.com'
+
+# The articles table as the first release created it, before feed_key and the fingerprint columns.
+OLD_SCHEMA = '''
+    CREATE TABLE articles (
+        url TEXT PRIMARY KEY,
+        title TEXT,
+        description TEXT,
+        pub_date TEXT,
+        scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+def article(slug, title=None, description='A description long enough to keep.'):
+    return {'title': title or f"Article {slug}", 'url': f"{SITE}/{slug}", 'description': description,
+            'pub_date': 'Wed, 01 May 2024 10:00:00 GMT'}
+
+
+class StorageTestCase(ScraperTestCase):
+    def create_old_db(self, name, slugs):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, name)
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.execute(OLD_SCHEMA)
+            conn.executemany('INSERT INTO articles (url, title, description, pub_date) VALUES (?, ?, ?, ?)',
+                             [(f"{SITE}/{slug}", f"Old {slug}", 'From the old database', 'Wed, 01 May 2024 10:00:00 GMT')
+                              for slug in slugs])
+        conn.close()
+        return path
+
+    def rows(self, db_path, sql, params=()):
+        conn = sqlite3.connect(db_path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def traced(self, db_path):
+        """Record the statements run on this thread's cached connection to db_path."""
+        statements = []
+        rss_generator.get_connection(db_path).set_trace_callback(statements.append)
+        return statements
+
+
+class MigrationTest(StorageTestCase):
+    def test_old_per_feed_database_is_migrated(self):
+        path = self.create_old_db('blog-example-com.db', ['one', 'two'])
+        scraper = self.make_scraper(SITE)
+        self.assertEqual(scraper.db_path, path)
+        self.assertEqual(self.rows(path, 'PRAGMA auto_vacuum'), [(2,)])
+        columns = {row[1]: row[5] for row in self.rows(path, 'PRAGMA table_info(articles)')}
+        self.assertEqual(columns['feed_key'], 1, "feed_key leads the primary key")
+        self.assertEqual(columns['url'], 2)
+        self.assertLessEqual({'content_hash', 'page_hash', 'retry_count', 'next_retry_at', 'pub_ts'}, set(columns))
+        self.assertEqual(self.rows(path, 'SELECT feed_key, url, title, pub_ts FROM articles ORDER BY url'), [
+            (CONFIG_KEY, f"{SITE}/one", 'Old one', 1714557600.0),
+            (CONFIG_KEY, f"{SITE}/two", 'Old two', 1714557600.0),
+        ])
+        self.assertTrue(scraper.get_state('pub_ts_backfilled'))
+
+    def test_migration_runs_once(self):
+        path = self.create_old_db('blog-example-com.db', ['one'])
+        self.make_scraper(SITE)
+        statements = self.traced(path)
+        self.make_scraper(SITE)
+        self.assertNotIn('VACUUM', statements)
+        self.assertFalse([s for s in statements if 'articles_migrated' in s])
+        self.assertFalse([s for s in statements if s.startswith('UPDATE articles SET pub_ts')])
+
+
+class SharedDatabaseTest(StorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.config['default']['shared_db'] = True
+        self.shared_path = os.path.join(self.output_dir, rss_generator.SHARED_DB_NAME)
+
+    def test_old_databases_are_imported_once(self):
+        self.create_old_db('blog-example-com.db', ['one', 'two'])
+        self.create_old_db('other-example-com.db', ['three'])
+        blog = self.make_scraper(SITE)
+        other = self.make_scraper('https://other.example.com')
+        self.assertEqual(blog.db_path, self.shared_path)
+        self.assertEqual(other.db_path, self.shared_path)
+        self.assertEqual(self.rows(self.shared_path, 'SELECT feed_key, COUNT(*) FROM articles GROUP BY feed_key'),
+                         [(CONFIG_KEY, 2), ('other.example.com', 1)])
+        self.assertEqual(len(blog.get_cached_articles()), 2)
+
+        with rss_generator.get_connection(self.shared_path) as conn:
+            conn.execute('DELETE FROM articles WHERE feed_key = ?', (CONFIG_KEY,))
+        self.make_scraper(SITE)
+        self.assertEqual(self.rows(self.shared_path, 'SELECT COUNT(*) FROM articles WHERE feed_key = ?', (CONFIG_KEY,)),
+                         [(0,)], "an imported database is not imported again")
+
+    def test_feed_named_like_the_shared_database_gets_its_own_file(self):
+        for config_key in ('articles', 'search'):
+            scraper = self.make_scraper(f"https://{config_key}", config_key=config_key,
+                                        site_config={'shared_db': False})
+            self.assertEqual(os.path.basename(scraper.db_path), f"{config_key}-feed.db")
+        shared = self.make_scraper(SITE)
+        self.assertEqual(shared.db_path, self.shared_path)
+
+    def test_rebuild_skips_imported_per_feed_files(self):
+        # The feed ran on its own database first, then moved to the shared one, and one article was pruned since.
+        self.config['default']['shared_db'] = False
+        self.make_scraper(SITE).cache_articles([article('kept'), article('stale', title='Stale story')])
+        self.config['default']['shared_db'] = True
+        shared = self.make_scraper(SITE)
+        with shared.db() as conn:
+            conn.execute('DELETE FROM articles WHERE url = ?', (f"{SITE}/stale",))
+        self.make_scraper('https://other.example.com').cache_articles([article('elsewhere')])
+
+        self.assertEqual(rss_generator.rebuild_search_index(self.output_dir), 2)
+        index = rss_generator.get_search_index(self.output_dir)
+        self.assertEqual(index.search('stale'), ([], False))
+        self.assertEqual(len(index.search('article')[0]), 2)
+
+
+class RetentionTest(StorageTestCase):
+    def scraper_with(self, ages_in_days, **site_config):
+        scraper = self.make_scraper(SITE, site_config=site_config)
+        scraper.cache_articles([article(f"day-{age}") for age in ages_in_days])
+        with scraper.db() as conn:
+            conn.executemany("UPDATE articles SET scraped_at = datetime('now', ?) WHERE url = ?",
+                             [(f'-{age} days', f"{SITE}/day-{age}") for age in ages_in_days])
+        return scraper
+
+    def remaining(self, scraper):
+        return sorted(int(url.rsplit('-', 1)[1]) for url, in self.rows(scraper.db_path, 'SELECT url FROM articles'))
+
+    def test_articles_past_retention_days_are_pruned(self):
+        scraper = self.scraper_with([0, 10, 40, 100], retention_days=30)
+        scraper.apply_retention()
+        self.assertEqual(self.remaining(scraper), [0, 10])
+        urls = {result['url'] for result in rss_generator.get_search_index(self.output_dir).search('article')[0]}
+        self.assertEqual(urls, {f"{SITE}/day-0", f"{SITE}/day-10"})
+
+    def test_retention_never_cuts_into_the_feed_window(self):
+        scraper = self.scraper_with([0, 3, 8], retention_days=1)
+        scraper.apply_retention()
+        self.assertEqual(self.remaining(scraper), [0, 3])
+
+    def test_retention_max_rows_keeps_the_newest(self):
+        scraper = self.scraper_with([0, 1, 2, 3, 4], retention_max_rows=2)
+        scraper.apply_retention()
+        self.assertEqual(self.remaining(scraper), [0, 1])
+
+    def test_free_pages_are_reclaimed_about_once_a_day(self):
+        scraper = self.make_scraper(SITE, site_config={'retention_days': 30, 'search_index': False})
+        filler = 'x' * 4000
+
+        def add_and_expire(prefix):
+            scraper.cache_articles([article(f"{prefix}-{i}", description=filler) for i in range(100)])
+            with scraper.db() as conn:
+                conn.execute("UPDATE articles SET scraped_at = datetime('now', '-60 days') WHERE url LIKE ?",
+                             (f"{SITE}/{prefix}-%",))
+            scraper.apply_retention()
+            return scraper.db().execute('PRAGMA freelist_count').fetchone()[0]
+
+        self.assertEqual(add_and_expire('first'), 0)
+        self.assertIsNotNone(scraper.get_state('last_vacuum_at'))
+        self.assertGreater(add_and_expire('second'), 0, "a second pass on the same day leaves the pages for tomorrow")
+
+
+if __name__ == '__main__':
+    unittest.main()